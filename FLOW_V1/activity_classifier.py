@@ -0,0 +1,254 @@
+# activity_classifier.py (v1.3 - Watcher Survives Bad Configs)
+
+# --- Imports ---
+import time            # Reason: The config watcher's polling interval.
+import threading       # Reason: The config watcher runs in the background.
+import config_manager  # Reason: Reads config.json (the keyword lists and rules)
+import ai_classifier   # Reason: To get AI predictions on window titles
+import rule_engine     # Reason: Compiles the keyword lists into one fast matcher
+
+# --- Constants ---
+CONFIG_CHECK_INTERVAL_SECONDS = 2.0 # How often the watcher looks at config.json
+
+# --- Core Logic: Load config from JSON ---
+# This reads config.json on startup. The keyword lists are compiled into
+# one read-only snapshot; reload_config() "hot-reloads" it by building a
+# new snapshot and swapping ONE reference, so a classifier call always
+# sees either the old rules or the new ones, never a mix.
+try:
+    current_rules = rule_engine.compile_rules(config_manager.load_config(), config_manager.get_config_stamp())
+except ValueError as e:
+    print(f"ERROR: {config_manager.CONFIG_FILE} has invalid rules ({e}). Loading defaults.")
+    current_rules = rule_engine.compile_rules(config_manager.get_default_config())
+# The config the current rules came from (the snapshot's own copy, e.g.
+# for the Settings window). Read-only: build a new dict to change it.
+current_config = current_rules.config
+
+# --- Global Classifier "State" Variables ---
+# The GUI (main.py) and the headless daemon (flow_daemon.py) both set these.
+is_studying = False            # True if Study Mode is on
+prompt_is_showing = False      # True if the "Start Study?" popup is active
+snoozed_lecture_title = None   # Stores the title of a snoozed lecture
+ai_enabled = True              # False: keyword rules only (the AI model is never loaded)
+
+_reload_listeners = []         # Called after every reload (e.g. re-check the current window)
+_watch_thread = None
+
+# --- Utility Function ---
+def reload_config(new_config, stamp=None):
+    """
+    Utility: Compiles 'new_config' and swaps it in. 'stamp' is
+    config.json's get_config_stamp() for this config, so the watcher
+    doesn't load the same file again. A config that can't be compiled
+    raises ValueError and the current rules stay in use.
+    """
+    global current_config, current_rules
+    new_rules = rule_engine.compile_rules(new_config, stamp)
+    current_rules = new_rules # The one swap the classifiers see
+    current_config = new_rules.config
+    for callback in _reload_listeners:
+        try:
+            callback()
+        except Exception as e:
+            print(f"Error in config reload listener: {e}")
+
+def add_reload_listener(callback):
+    """
+    Utility: Registers callback(), called after every config reload.
+    """
+    if callback not in _reload_listeners:
+        _reload_listeners.append(callback)
+
+def _watch_config_file():
+    """
+    Utility: The watcher thread. Reloads the rules whenever config.json
+    changes on disk (Settings, or any other tool that writes it).
+    A file that can't be read or compiled (half-written, bad JSON, a
+    rule with the wrong type) is reported once and not retried until it
+    changes again; the current rules stay in use meanwhile.
+    """
+    failed_stamp = None
+    while True:
+        time.sleep(CONFIG_CHECK_INTERVAL_SECONDS)
+        stamp = config_manager.get_config_stamp()
+        if stamp is None or stamp == current_rules.stamp or stamp == failed_stamp:
+            continue
+        try:
+            reload_config(config_manager.read_config_file(), stamp)
+        except Exception as e:
+            print(f"Config file changed but couldn't be used ({e}); keeping the current rules.")
+            failed_stamp = stamp
+            continue
+        failed_stamp = None
+        print(f"Config reloaded from {config_manager.CONFIG_FILE} ({current_rules.keyword_count} keywords).")
+
+def start_config_watcher():
+    """
+    Core Logic: Starts watching config.json (only once).
+    """
+    global _watch_thread
+    if _watch_thread is None:
+        _watch_thread = threading.Thread(target=_watch_config_file, name="flow-config-watcher", daemon=True)
+        _watch_thread.start()
+
+def _process_rule_category(rules, process_name):
+    """
+    Utility: The category PROCESS_RULES gives 'process_name', or None if
+    there is no rule (or the rule is "Check-Title").
+    """
+    category = rules.process_rules.get(process_name)
+    if category is None or category == "Check-Title":
+        return None
+    if category == "Distraction-Low" and is_studying:
+        return "Neutral"
+    return category
+
+# --- Core Logic: 'classify_by_title_only' (The "Fast" Classifier) ---
+def classify_by_title_only(window_title, process_name=None):
+    """
+    Core Logic: This is the "Quick-Check" classifier.
+    It's FAST because it *only* looks at the window title (plus the
+    process name when it is already cached, see process_resolver.peek).
+    It now uses the AI model as a fallback.
+    """
+    # Use one compiled snapshot of the rules for this whole call
+    rules = current_rules
+
+    # --- Snooze Fix: Only check for empty title ---
+    if not window_title:
+        return "Idle"
+
+    title_low = window_title.lower()
+    
+    # 1. Check Ignore List (e.g., "task switching")
+    if title_low in rules.ignore_titles:
+        return "Neutral"
+
+    # 2. Check Process Rules, if we already know the process (no slow lookup)
+    if process_name is not None:
+        category = _process_rule_category(rules, process_name)
+        if category is not None:
+            return category
+
+    # Find every keyword class in the title in ONE pass.
+    # 'strict' uses word boundaries for short keywords ('os', 'ai', etc.)
+    # so "videOS" doesn't match "os".
+    loose, strict = rules.match_title(title_low)
+
+    # --- SAFETY CHECK: High-Severity Distractions First ---
+    # This prevents 'adult videos' from matching 'os' (study) or AI false positives
+    if rule_engine.DIST_HIGH in loose:
+        return "Distraction-High"
+
+    # --- Classification Logic ---
+    # 3. Check Productive Keywords (Using Word Boundaries for short ones)
+    if rule_engine.PRODUCTIVE in strict:
+        return "Productive"
+
+    # 4. Check Study Keywords (Using Word Boundaries for 'os', 'ai', etc.)
+    if rule_engine.STUDY in strict:
+        return "Studying"
+
+    # 5. Check Medium Distractions (e.g., YouTube)
+    if rule_engine.DIST_MEDIUM in loose:
+        if is_studying:
+            return "Distraction-Medium"
+        else:
+            # Re-check Study words with boundaries for prompt
+            is_lecture = rule_engine.STUDY in strict
+            
+            if is_lecture:
+                if not prompt_is_showing and window_title != snoozed_lecture_title:
+                    return "Prompt-Study-Mode"
+                else:
+                    return "Neutral"
+            else:
+                return "Distraction-Medium"
+
+    # 6. Check Low Distractions
+    if rule_engine.DIST_LOW in loose:
+        return "Distraction-Low"
+
+    # 7. Final Rule Check: If in Study Mode, all else is a distraction
+    if is_studying:
+        return "Distraction-Low"
+        
+    # --- # AI FIX v2 (INTELLIGENT GATING) ---
+    # 8. Only ask the AI if title is substantial (> 5 chars)
+    if ai_enabled and len(title_low.strip()) > 5:
+        ai_prediction = ai_classifier.predict_category(window_title)
+        
+        if ai_prediction == 1:
+            print(f"AI classified '{window_title}' as Productive.")
+            return "Productive"
+        elif ai_prediction == 0:
+            print(f"AI classified '{window_title}' as Distraction.")
+            return "Distraction-Low"
+        elif ai_prediction == 2:
+            # New Neutral class from AI
+            return "Neutral"
+
+    # 9. Default: It's just a neutral app
+    return "Neutral"
+
+# --- Core Logic: 'classify_activity' (The "Slow" Classifier) ---
+def classify_activity(process_name, window_title):
+    """
+    Core Logic: This is the "Full, Accurate" classifier.
+    It's SLOW because it uses the 'process_name' (from psutil)
+    in addition to the 'window_title'.
+    It now also uses the AI as a final fallback for logging.
+    """
+    # Use one compiled snapshot of the rules for this whole call
+    rules = current_rules
+
+    # 1. Handle idle state
+    if process_name is None and window_title is None: return "Idle"
+    
+    # 2. Check Process Rules (Most reliable)
+    # Returns the category immediately if it's definitive
+    # ("Check-Title" tells logic to check the title).
+    category = _process_rule_category(rules, process_name)
+    if category is not None:
+        return category
+
+    # 3. Handle missing title (but we have a process name)
+    if not window_title:
+        return "Neutral" if not is_studying else "Distraction-Low"
+
+    # 4. Check Title Keywords (plain substring matches, one pass)
+    title_low = window_title.lower()
+    loose, _ = rules.match_title(title_low)
+    if rule_engine.PRODUCTIVE in loose: return "Productive"
+    
+    # --- # NEW FIX: Check STUDY_KEYWORDS here too ---
+    if rule_engine.STUDY in loose:
+        return "Studying"
+        
+    if rule_engine.DIST_MEDIUM in loose:
+        if is_studying:
+            # We already checked for "Studying"
+            return "Distraction-Medium"
+        else:
+            # Score Fix: Log lectures as "Neutral" when not in study mode
+            # We already checked for "Studying", so this is redundant,
+            # but safe to leave.
+            if rule_engine.STUDY in loose: return "Neutral"
+            return "Distraction-Medium"
+            
+    if rule_engine.DIST_HIGH in loose: return "Distraction-High"
+    if rule_engine.DIST_LOW in loose: return "Distraction-Low"
+
+    # 5. Check Study Mode
+    if is_studying: return "Distraction-Low"
+    
+    # 6. AI Classification (for logging)
+    # If no rules matched, ask the AI.
+    ai_prediction = ai_classifier.predict_category(window_title) if ai_enabled else None
+    if ai_prediction == 1:
+        return "Productive (AI)" # Log this as AI-found
+    elif ai_prediction == 0:
+        return "Distraction-Low (AI)" # Log this as AI-found
+
+    # 7. Default
+    return "Neutral"
@@ -1,9 +1,14 @@
-# ai_classifier.py (v1.1 - The "Packager" Fix)
+# ai_classifier.py (v1.9 - No Retry Loop on Bad Models)
 
 # --- Imports ---
-import joblib  # Reason: To load the pre-trained .joblib model file.
 import os      # Reason: To check if the model file exists.
+import re      # Reason: To split titles into words like the TF-IDF vectorizer.
 import sys     # Reason: To check if we are in "packaged" mode.
+import time    # Reason: To rate-limit checks of the model file.
+import threading  # Reason: Loads the model in the background; shared cache.
+from collections import OrderedDict  # Reason: Keeps the cache in LRU order.
+import model_registry  # Reason: Finds the active (versioned) model file.
+import instrumentation  # Reason: The 'ai_predict' timing histogram.
 
 # --- Core Logic: Helper Function for PyInstaller ---
 def resource_path(relative_path):
@@ -22,49 +27,437 @@ def resource_path(relative_path):
     # Join the base path with our file name to get the full, correct path
     return os.path.join(base_path, relative_path)
 
+# --- Core Logic: Linear Scorer ---
+class LinearTextScorer:
+    """
+    Core Logic: Runs the exported TF-IDF + LinearSVC model with plain NumPy.
+    ai_trainer.py saves the vocabulary, IDF weights and SVM coefficients to
+    'ai_model.npz'; scoring a title is then a small sparse dot product, and
+    scikit-learn is never imported at runtime.
+    It has the same predict()/decision_function() methods as the pipeline.
+    """
+
+    def __init__(self, path):
+        import numpy as np # Reason: Only needed once a model is loaded.
+        self.np = np
+        with np.load(path, allow_pickle=False) as data:
+            terms = data['terms'].tolist()
+            self.idf = data['idf']
+            self.coef = data['coef']
+            self.intercept = data['intercept']
+            self.classes = data['classes']
+            self.min_n, self.max_n = (int(n) for n in data['ngram_range'])
+            self.token_re = re.compile(str(data['token_pattern']))
+            self.sublinear_tf = bool(data['sublinear_tf'])
+            self.norm = str(data['norm'])
+        # The vocabulary "hash table": n-gram -> feature column.
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+
+    def _features(self, title):
+        """
+        Utility: The TF-IDF vector of one title, as (columns, values).
+        Mirrors TfidfVectorizer: lower-case, word tokens, 1..n-grams.
+        """
+        np = self.np
+        tokens = self.token_re.findall(title.lower())
+        counts = {}
+        for n in range(self.min_n, self.max_n + 1):
+            for i in range(len(tokens) - n + 1):
+                col = self.vocabulary.get(" ".join(tokens[i:i + n]))
+                if col is not None:
+                    counts[col] = counts.get(col, 0) + 1
+
+        cols = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        if self.sublinear_tf:
+            values = 1.0 + np.log(values)
+        values = values * self.idf[cols]
+        if self.norm == 'l2':
+            length = np.sqrt(np.dot(values, values))
+        elif self.norm == 'l1':
+            length = np.abs(values).sum()
+        else:
+            length = 0.0
+        if length > 0:
+            values = values / length
+        return cols, values
+
+    def decision_function(self, titles):
+        """
+        Core Logic: Raw SVM scores, shaped like sklearn's decision_function.
+        """
+        np = self.np
+        # Build one sparse (row, column, value) list for all titles, then
+        # score them all with a single vectorized multiply-and-add.
+        rows, cols, values = [], [], []
+        for row, title in enumerate(titles):
+            title_cols, title_values = self._features(title)
+            rows.append(np.full(len(title_cols), row, dtype=np.intp))
+            cols.append(title_cols)
+            values.append(title_values)
+        scores = np.tile(self.intercept, (len(titles), 1))
+        if titles:
+            rows = np.concatenate(rows)
+            cols = np.concatenate(cols)
+            values = np.concatenate(values)
+            np.add.at(scores, rows, (self.coef[:, cols] * values).T)
+        if self.coef.shape[0] == 1:
+            return scores[:, 0] # Binary model: one score per title
+        return scores
+
+    def predict(self, titles):
+        """
+        Core Logic: Predicted class for each title.
+        """
+        scores = self.decision_function(titles)
+        if scores.ndim == 1:
+            return self.classes[(scores > 0).astype(int)]
+        return self.classes[scores.argmax(axis=1)]
+
 # --- Core Logic: Load the Model ---
-# Use the new helper function to find the model
+# Use the new helper function to find the model.
+# The active version in the model registry (models/registry.json) comes
+# first. Without a registry, the NumPy export is preferred and the joblib
+# pipeline is the fallback (it needs scikit-learn installed).
+LINEAR_MODEL_FILE = resource_path('ai_model.npz')
 MODEL_FILE = resource_path('ai_model.joblib')
 
-def load_model():
+def get_model_source():
+    """
+    Utility: Returns (path, registry entry or None) for the model file
+    that should be loaded right now.
+    """
+    entry = model_registry.get_active_entry()
+    if entry is not None:
+        return entry["path"], entry
+    if os.path.exists(LINEAR_MODEL_FILE):
+        return LINEAR_MODEL_FILE, None
+    return MODEL_FILE, None
+
+def get_model_path():
+    """
+    Utility: The model file that will be loaded.
+    """
+    return get_model_source()[0]
+
+def load_model(path=None):
     """
     Utility: Loads the pre-trained model file from disk.
     """
+    if path is None:
+        path = get_model_path()
+
     # 1. Check if the model file exists at the path.
-    if not os.path.exists(MODEL_FILE):
-        print(f"FATAL ERROR: '{MODEL_FILE}' not found at {MODEL_FILE}.")
+    if not os.path.exists(path):
+        print(f"FATAL ERROR: '{path}' not found at {path}.")
         print("Please run 'python ai_trainer.py' first to create the model.")
         return None
     
     try:
         # 2. Load the file from disk into memory.
-        model = joblib.load(MODEL_FILE)
+        if path.endswith('.npz'):
+            model = LinearTextScorer(path)
+        else:
+            # joblib (and scikit-learn with it) is imported here, not at the
+            # top, because it is slow and the GUI shouldn't wait for it.
+            print("NumPy model export not found; loading the scikit-learn pipeline.")
+            print("Re-run 'python ai_trainer.py' to create 'ai_model.npz'.")
+            import joblib
+            model = joblib.load(path)
         print("AI text classification model loaded successfully.")
         return model
     except Exception as e:
         print(f"Error loading AI model: {e}")
         return None
 
-# Load the model *once* when the app starts.
-ai_model = load_model()
+# The model is loaded on a background thread (see start_background_load).
+# Until it is ready, predict_category returns None and the classifiers
+# fall back to their keyword rules only.
+ai_model = None                   # The model predictions use (may be wrapped)
+base_model = None                 # The model exactly as loaded from disk
+model_ready = threading.Event()   # Set once a load attempt has finished
+model_load_seconds = None         # How long the last load took
+_load_lock = threading.Lock()
+_load_thread = None
+_swap_lock = threading.Lock()     # Held while base_model/ai_model change
+_model_wrapper = None             # See set_model_wrapper
+_watch_thread = None
+model_info = {}                   # Where the loaded model came from (see get_model_info)
+
+def _background_load():
+    """
+    Utility: The loader thread. Loads the model file and swaps it in.
+    """
+    global base_model, _model_path, _model_mtime, _last_failed, model_info, model_load_seconds
+    started = time.perf_counter()
+    path, mtime, entry = _get_model_stamp()
+    new_model = load_model(path)
+    model_load_seconds = time.perf_counter() - started
+    if new_model is None:
+        # Don't retry this file until it changes (the watcher checks this).
+        _last_failed = (path, mtime)
+    else:
+        _last_failed = None
+        with _swap_lock:
+            base_model = new_model
+            _model_path = path
+            _model_mtime = mtime
+            model_info = dict(entry or {}, path=path)
+            if _model_wrapper is not None:
+                new_model = _model_wrapper(new_model, mtime)
+            swap_model(new_model)
+    model_ready.set()
+    label = f"AI model {model_info['version']}" if model_info.get("version") else "AI model"
+    print(f"{label} load took {model_load_seconds * 1000:.0f} ms (background thread).")
+
+def start_background_load():
+    """
+    Core Logic: Starts loading (or re-loading) the model on a background
+    thread. Does nothing if a load is already running.
+    Also starts the file watcher the first time.
+    """
+    global _load_thread, _watch_thread
+    with _load_lock:
+        if _watch_thread is None:
+            _watch_thread = threading.Thread(target=_watch_model_files, name="flow-model-watcher", daemon=True)
+            _watch_thread.start()
+        if _load_thread is not None and _load_thread.is_alive():
+            return
+        _load_thread = threading.Thread(target=_background_load, name="flow-model-loader", daemon=True)
+        _load_thread.start()
+
+def swap_model(model):
+    """
+    Core Logic: Makes 'model' the one predictions use. A single reference
+    assignment, so a prediction already running finishes on the old model
+    and the next one uses the new model. Cached answers are dropped.
+    """
+    global ai_model
+    ai_model = model
+    clear_cache()
+
+def set_model_wrapper(wrapper):
+    """
+    Utility: Registers wrapper(base_model, model_mtime) -> model. It is
+    applied to every model loaded from disk before it is swapped in (the
+    online learner uses this to add its corrections). If a model is
+    already loaded, it is wrapped and swapped in right away.
+    """
+    global _model_wrapper
+    with _swap_lock:
+        _model_wrapper = wrapper
+        if base_model is not None:
+            swap_model(wrapper(base_model, _model_mtime))
+
+def is_model_ready():
+    """
+    Utility: True once a model has been loaded and can make predictions.
+    """
+    return ai_model is not None
+
+# --- Core Logic: Prediction Cache ---
+# Both tracker threads ask about the same window title over and over
+# (about twice a second for as long as a tab stays open), so we remember
+# the last CACHE_SIZE answers. The cache is emptied whenever a new
+# model is swapped in (e.g. after running ai_trainer.py).
+CACHE_SIZE = 2048
+MODEL_CHECK_INTERVAL_SECONDS = 2.0 # How often the watcher looks at the model files
+
+_cache = OrderedDict()          # normalized title -> prediction, oldest first
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+def _get_model_stamp():
+    """
+    Utility: Returns (path, modification time or None, registry entry)
+    for the model file that should be loaded.
+    """
+    path, entry = get_model_source()
+    try:
+        return path, os.path.getmtime(path), entry
+    except OSError:
+        return path, None, entry
+
+_model_path = None   # The file the current model came from
+_model_mtime = None  # ...and its mtime when it was loaded
+_last_failed = None  # (path, mtime) of the last file that failed to load
+
+def normalize_title(title):
+    """
+    Utility: The cache key for a title. The model lower-cases text and
+    ignores extra whitespace, so these titles always get the same answer.
+    """
+    return " ".join(title.lower().split())
+
+def clear_cache():
+    """
+    Utility: Forgets every cached prediction.
+    """
+    with _cache_lock:
+        _cache.clear()
+        _cache_stats["invalidations"] += 1
+
+def get_cache_stats():
+    """
+    Utility: Returns the cache counters (hits, misses, evictions, size...).
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["size"] = len(_cache)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+def get_model_info():
+    """
+    Utility: Returns where the loaded model came from: 'path', plus the
+    registry metadata ('version', 'created_at', 'training_size',
+    'cv_accuracy', 'feedback_max_id') if it is a registered version.
+    """
+    return dict(model_info)
+
+def _watch_model_files():
+    """
+    Utility: The watcher thread. Every MODEL_CHECK_INTERVAL_SECONDS it
+    checks if a new version was registered, the active version changed
+    (rollback), or the model file was rewritten. If so, it reloads in
+    the background; the old model keeps answering until the new one is
+    swapped in, so the tracker threads never wait for a reload.
+    """
+    while True:
+        time.sleep(MODEL_CHECK_INTERVAL_SECONDS)
+        if not model_ready.is_set():
+            continue # The first load is still running
+        try:
+            path, mtime, entry = _get_model_stamp()
+        except Exception as e:
+            print(f"Error checking the model files: {e}")
+            continue
+        if mtime is None or (path == _model_path and mtime == _model_mtime):
+            continue
+        if (path, mtime) == _last_failed:
+            continue # Already failed to load; wait until the file changes
+        start_background_load()
 
 # --- Core Logic: Predict Category ---
+def _current_model():
+    """
+    Utility: Returns the model to use right now, or None if it isn't
+    ready. Starts the first load (and the watcher) if needed.
+    """
+    if _load_thread is None:
+        start_background_load()
+    return ai_model
+
 def predict_category(title):
     """
     Core Logic: Predicts if a title is productive (1) or distracting (0).
     This is called by the "fast" classifier in main.py.
     """
-    # 1. Make sure the model loaded correctly.
-    if ai_model is None:
-        return None # Model failed to load, so we can't predict
+    # 1. Get the model (loads it on first use; may still be loading).
+    model = _current_model()
+    if model is None:
+        return None # Not ready (or failed to load), so rules only
+
+    # 2. Answer from the cache if we've seen this title before.
+    key = normalize_title(title)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return _cache[key]
+        _cache_stats["misses"] += 1
 
     try:
-        # 2. 'model.predict()' is extremely fast (no lag).
-        prediction = ai_model.predict([title])
+        # 3. Run the model (outside the lock, so the other thread isn't blocked).
+        with instrumentation.timed("ai_predict"):
+            prediction = model.predict([title])
         
-        # 3. The result is an array, so we get the first item.
-        return prediction[0]
+        # 4. The result is an array, so we get the first item.
+        result = prediction[0]
         
     except Exception as e:
         print(f"AI prediction error: {e}")
-        return None
\ No newline at end of file
+        return None
+
+    # 5. Remember the answer, dropping the least recently used one if full.
+    with _cache_lock:
+        if model is ai_model: # Don't cache answers from a model we just replaced
+            _cache[key] = result
+            if len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+                _cache_stats["evictions"] += 1
+    return result
+
+# --- Core Logic: Batch Predictions ---
+def predict_category_batch(titles):
+    """
+    Core Logic: Like predict_category, but for many titles at once
+    (re-classifying history, bulk imports, a classify endpoint).
+    Cached titles are answered from the cache; all the others are scored
+    in ONE model.predict call. Returns a list in the same order as
+    'titles' (all None if the model isn't ready).
+    """
+    model = _current_model()
+    if model is None:
+        return [None] * len(titles)
+
+    keys = [normalize_title(title) for title in titles]
+    results = {}
+    with _cache_lock:
+        for key in keys:
+            if key in results:
+                continue
+            if key in _cache:
+                _cache.move_to_end(key)
+                _cache_stats["hits"] += 1
+                results[key] = _cache[key]
+        # Each distinct unseen title is scored once.
+        missing = [key for key in dict.fromkeys(keys) if key not in results]
+        _cache_stats["misses"] += len(missing)
+
+    if missing:
+        try:
+            with instrumentation.timed("ai_predict_batch"):
+                predictions = model.predict(missing)
+        except Exception as e:
+            print(f"AI batch prediction error: {e}")
+            return [results.get(key) for key in keys]
+
+        with _cache_lock:
+            for key, prediction in zip(missing, predictions):
+                results[key] = prediction
+                if model is ai_model:
+                    _cache[key] = prediction
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+                _cache_stats["evictions"] += 1
+
+    return [results[key] for key in keys]
+
+def decision_scores_batch(titles):
+    """
+    Core Logic: Raw model scores for many titles in one call, as an array
+    of shape (len(titles), n_classes) (or (len(titles),) for a binary
+    model). Column order is get_model_classes(). Returns None if the
+    model isn't ready. Scores are not cached.
+    """
+    model = _current_model()
+    if model is None:
+        return None
+    try:
+        return model.decision_function([normalize_title(title) for title in titles])
+    except Exception as e:
+        print(f"AI batch scoring error: {e}")
+        return None
+
+def get_model_classes():
+    """
+    Utility: The class labels of the loaded model (e.g. [0, 1, 2]), or None.
+    """
+    model = ai_model
+    if model is None:
+        return None
+    if hasattr(model, 'classes'):
+        return list(model.classes)
+    return list(model.classes_)
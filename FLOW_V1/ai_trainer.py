@@ -1,4 +1,4 @@
-# ai_trainer.py (v1.3 - 80/20 Train-Test Split & Better Data)
+# ai_trainer.py (v1.6 - Checked NumPy Export)
 
 # --- Imports ---
 import joblib  # To save the model
@@ -9,14 +9,69 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.svm import LinearSVC
 from sklearn.pipeline import make_pipeline
 from sklearn.model_selection import cross_val_score # To test the model
-from data_manager import get_ai_feedback # Import feedback function
+from data_manager import get_ai_feedback_since # Import feedback function
 import os
+from ai_classifier import LinearTextScorer # To check the NumPy export
+import model_registry # To publish the new model as a version
 
-print("Starting AI model training...")
+# --- Utility: Export for the NumPy runtime ---
+def export_linear_model(model, filename):
+    """
+    Utility: Saves everything the runtime needs to score titles without
+    scikit-learn: vocabulary, IDF weights, SVM coefficients and the
+    vectorizer settings. See ai_classifier.LinearTextScorer.
+    """
+    vectorizer = model.named_steps['tfidfvectorizer']
+    svm = model.named_steps['linearsvc']
+
+    # Terms ordered by their feature column.
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, col in vectorizer.vocabulary_.items():
+        terms[col] = term
+
+    np.savez(
+        filename,
+        terms=np.array(terms, dtype=str),
+        idf=vectorizer.idf_.astype(np.float64),
+        coef=np.asarray(svm.coef_, dtype=np.float64),
+        intercept=np.asarray(svm.intercept_, dtype=np.float64),
+        classes=np.asarray(svm.classes_),
+        ngram_range=np.array(vectorizer.ngram_range),
+        token_pattern=np.array(vectorizer.token_pattern),
+        sublinear_tf=np.array(vectorizer.sublinear_tf),
+        norm=np.array(vectorizer.norm or ''),
+    )
+
+def export_checked_linear_model(model, filename, titles):
+    """
+    Utility: Exports 'model' with export_linear_model and checks that the
+    NumPy scorer gives the same predictions and decision scores as the
+    pipeline on 'titles'. If it doesn't, the export is deleted (the app
+    then falls back to the joblib pipeline) and a warning is printed.
+    Returns True if the export was kept.
+    """
+    export_linear_model(model, filename)
+    scorer = LinearTextScorer(filename)
+    expected = model.predict(titles)
+    actual = scorer.predict(titles)
+    matches = int(np.sum(expected == actual))
+    print(f"{matches}/{len(titles)} predictions match the scikit-learn pipeline.")
+    scores_match = np.allclose(scorer.decision_function(titles), model.decision_function(titles),
+                               rtol=1e-9, atol=1e-9)
+    if matches == len(titles) and scores_match:
+        return True
+
+    # Never ship an export that disagrees.
+    os.remove(filename)
+    mismatched = [title for title, e, a in zip(titles, expected, actual) if e != a]
+    print(f"WARNING: NumPy export parity check failed ({len(mismatched)} predictions differ, "
+          f"decision scores {'match' if scores_match else 'differ'}; e.g. {mismatched[:3]}). "
+          f"{filename} was deleted; the app will use the slower joblib pipeline.")
+    return False
 
 # --- 1. Core Logic: Training Data ---
 # This dataset is now much larger to fix the bugs you found.
-train_data = [
+TRAIN_DATA = [
     # --- Productive (1) ---
     ("Python tutorial for beginners", 1),
     ("GeeksforGeeks Data Structures", 1),
@@ -159,77 +214,105 @@ train_data = [
     ("Search", 2),
 ]
 
-# --- 1b. Load User Feedback ---
-print("Checking for user feedback in database...")
-try:
-    feedback_data = get_ai_feedback()
-    if feedback_data:
-        print(f"Adding {len(feedback_data)} pieces of user feedback to training set.")
-        for title, cat_str in feedback_data:
-            # Map "Productive" -> 1, "Distraction" -> 0, "Neutral" -> 2
-            if cat_str == "Productive": label = 1
-            elif cat_str == "Distraction": label = 0
-            else: label = 2
-            train_data.append((title, label))
-    else:
-        print("No user feedback found yet.")
-except Exception as e:
-    print(f"Could not load feedback: {e}")
-
-# --- 1c. Add specific edge cases for 'alakh pandey' etc.
-train_data.extend([
-    ("alakh pandey physics lectures", 1),
-    ("physics wallah alakh pandey", 1),
-    ("alakh pandey chemistry", 1),
-    ("coding ninja tutorials", 1),
-    ("whiteboard coding practice", 1),
-    ("LeetCode - Problem Solving", 1),
-    ("YouTube - MrBeast burger", 0),
-    ("Minecraft parkour", 0),
-    ("Roblox gameplay", 0),
-    ("adult videos porn", 0),
-    ("porn videos", 0),
-    ("sexy adult clips", 0),
-    ("Minecraft hardcore tutorial", 0),
-    ("Minecraft lecture", 0),
-    ("COD tips and tricks", 0),
-    ("Valo gameplay hacks", 0),
-    ("Cooking tutorial", 0),
-    ("Movie recap video", 0),
-    ("GTA 5 funny moments", 0),
-])
-
-# --- 2. Core Logic: Data Preparation ---
-# Separate the data into titles (X) and labels (y)
-X = [item[0] for item in train_data]
-y = [item[1] for item in train_data]
-
-# --- 3. Core Logic: Model Creation ---
-# Word-level features are better for meaning.
-model = make_pipeline(
-    TfidfVectorizer(analyzer='word', ngram_range=(1, 3)),
-    LinearSVC(dual=False)
-)
-
-# --- 4. Core Logic: Cross-Validation Test ---
-print("\n--- AI CROSS-VALIDATION TEST ---")
-print(f"Testing model on {len(X)} examples using 5-fold validation...")
-
-# This automatically does the 80/20 split 5 times and gives us the average
-scores = cross_val_score(model, X, y, cv=5, n_jobs=-1) # n_jobs=-1 uses all CPU cores
-
-print("\n--- TEST RESULTS ---")
-print(f"Scores on each of the 5 tests: {scores}")
-print(f"Average Accuracy: {np.mean(scores) * 100:.2f}%")
-print("--------------------")
-
-# --- 5. Core Logic: Final Model Training ---
-print("\n--- FINAL MODEL TRAINING ---")
-print("Re-training model on 100% of the data...")
-model.fit(X, y) # Train on ALL X and y
-
-# 6. Save the final, fully-trained model to a file
-model_filename = 'ai_model.joblib'
-joblib.dump(model, model_filename)
-
-print(f"Final, fully-trained model saved to {model_filename}!")
+def main():
+    """
+    Core Logic: Trains the model on TRAIN_DATA plus the user's feedback,
+    saves it, and publishes the NumPy export as a new registry version.
+    """
+    print("Starting AI model training...")
+    train_data = list(TRAIN_DATA)
+
+    # --- 1b. Load User Feedback ---
+    print("Checking for user feedback in database...")
+    feedback_max_id = 0 # Newest feedback row this model learns from
+    try:
+        feedback_data = get_ai_feedback_since(0)
+        if feedback_data:
+            print(f"Adding {len(feedback_data)} pieces of user feedback to training set.")
+            for feedback_id, title, cat_str in feedback_data:
+                feedback_max_id = max(feedback_max_id, feedback_id)
+                # Map "Productive" -> 1, "Distraction" -> 0, "Neutral" -> 2
+                if cat_str == "Productive": label = 1
+                elif cat_str == "Distraction": label = 0
+                else: label = 2
+                train_data.append((title, label))
+        else:
+            print("No user feedback found yet.")
+    except Exception as e:
+        print(f"Could not load feedback: {e}")
+
+    # --- 1c. Add specific edge cases for 'alakh pandey' etc.
+    train_data.extend([
+        ("alakh pandey physics lectures", 1),
+        ("physics wallah alakh pandey", 1),
+        ("alakh pandey chemistry", 1),
+        ("coding ninja tutorials", 1),
+        ("whiteboard coding practice", 1),
+        ("LeetCode - Problem Solving", 1),
+        ("YouTube - MrBeast burger", 0),
+        ("Minecraft parkour", 0),
+        ("Roblox gameplay", 0),
+        ("adult videos porn", 0),
+        ("porn videos", 0),
+        ("sexy adult clips", 0),
+        ("Minecraft hardcore tutorial", 0),
+        ("Minecraft lecture", 0),
+        ("COD tips and tricks", 0),
+        ("Valo gameplay hacks", 0),
+        ("Cooking tutorial", 0),
+        ("Movie recap video", 0),
+        ("GTA 5 funny moments", 0),
+    ])
+
+    # --- 2. Core Logic: Data Preparation ---
+    # Separate the data into titles (X) and labels (y)
+    X = [item[0] for item in train_data]
+    y = [item[1] for item in train_data]
+
+    # --- 3. Core Logic: Model Creation ---
+    # Word-level features are better for meaning.
+    model = make_pipeline(
+        TfidfVectorizer(analyzer='word', ngram_range=(1, 3)),
+        LinearSVC(dual=False)
+    )
+
+    # --- 4. Core Logic: Cross-Validation Test ---
+    print("\n--- AI CROSS-VALIDATION TEST ---")
+    print(f"Testing model on {len(X)} examples using 5-fold validation...")
+
+    # This automatically does the 80/20 split 5 times and gives us the average
+    scores = cross_val_score(model, X, y, cv=5, n_jobs=-1) # n_jobs=-1 uses all CPU cores
+
+    print("\n--- TEST RESULTS ---")
+    print(f"Scores on each of the 5 tests: {scores}")
+    print(f"Average Accuracy: {np.mean(scores) * 100:.2f}%")
+    print("--------------------")
+
+    # --- 5. Core Logic: Final Model Training ---
+    print("\n--- FINAL MODEL TRAINING ---")
+    print("Re-training model on 100% of the data...")
+    model.fit(X, y) # Train on ALL X and y
+
+    # 6. Save the final, fully-trained model to a file
+    model_filename = 'ai_model.joblib'
+    joblib.dump(model, model_filename)
+
+    print(f"Final, fully-trained model saved to {model_filename}!")
+
+    # 7. Export the NumPy version the app actually uses, and check that it
+    # gives exactly the same answers as the pipeline on the training set.
+    linear_filename = 'ai_model.npz'
+
+    print("\n--- NUMPY EXPORT PARITY CHECK ---")
+    if export_checked_linear_model(model, linear_filename, X):
+        print(f"NumPy model saved to {linear_filename}!")
+        # 8. Publish it as a new registry version. Running apps load it in the
+        # background within a few seconds ('python model_registry.py rollback'
+        # switches back to the previous version).
+        model_registry.register_model(linear_filename, training_size=len(X),
+                                      cv_accuracy=float(np.mean(scores)),
+                                      feedback_max_id=feedback_max_id)
+
+# Run 'python ai_trainer.py' to train (importing it only defines things).
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+# benchmark.py (v1.1 - App-Relative Model, Missing Metrics)
+
+# --- Imports ---
+import os         # Reason: Scratch database files.
+import sys        # Reason: Exit codes and the Python version.
+import json       # Reason: Results are saved as JSON.
+import time       # Reason: perf_counter timings.
+import random     # Reason: Seeded synthetic titles, keywords and activity.
+import argparse   # Reason: Command-line options.
+import platform   # Reason: Recorded with the results.
+import tempfile   # Reason: Benchmarks never touch flow_data.db.
+import statistics # Reason: Medians.
+from datetime import datetime, timedelta  # Reason: Synthetic timestamps.
+import data_manager        # Reason: log_event and the database schema
+import focus_engine        # Reason: The stats being measured
+import activity_classifier # Reason: The classifiers being measured
+import ai_classifier       # Reason: predict_category
+import model_registry      # Reason: Where registered model versions live
+import config_manager      # Reason: The default config the keyword lists grow from
+
+# --- Constants ---
+# The app's files are found from this script, not the working directory,
+# so the benchmark measures the same model wherever it is started from.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+KEYWORD_COUNTS = [10, 100, 1000, 10000]
+DB_DAYS = [1, 30, 365]
+ACTIVE_HOURS_PER_DAY = 8 # Synthetic days have this many hours of 5-second samples
+SEED = 42
+
+# Per-metric direction for compare: names ending in "_per_s" are rates
+# (higher is better); "_us", "_ms" and "_s" are times (lower is better).
+DEFAULT_THRESHOLD_PERCENT = 10.0
+
+CATEGORIES = ["Productive", "Studying", "Neutral", "Distraction-Low", "Distraction-Medium",
+              "Productive (AI)", "Distraction-Low (AI)", "Idle"]
+
+# --- Utility Functions ---
+def _per_call_us(func, calls, repeat=3):
+    """
+    Utility: Best-of-'repeat' average microseconds per call, where
+    'calls' is a list of argument tuples.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for args in calls:
+            func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(calls) * 1e6
+
+def _median_ms(func, runs, *args, **kwargs):
+    """
+    Utility: Median milliseconds of 'runs' calls.
+    """
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+def _word(rng):
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 10)))
+
+def make_config(keyword_count, rng):
+    """
+    Utility: The default config with its keyword lists padded (or cut)
+    to 'keyword_count' keywords in total, spread over the five lists.
+    """
+    config = config_manager.get_default_config()
+    levels = config.setdefault("DISTRACTION_LEVELS", {})
+    lists = [config.setdefault("PRODUCTIVE_KEYWORDS", []), config.setdefault("STUDY_KEYWORDS", []),
+             levels.setdefault("High", []), levels.setdefault("Medium", []), levels.setdefault("Low", [])]
+    keywords = [k for lst in lists for k in lst][:keyword_count]
+    while len(keywords) < keyword_count:
+        keywords.append(_word(rng) if rng.random() < 0.7 else f"{_word(rng)} {_word(rng)}")
+    for i, lst in enumerate(lists):
+        lst[:] = keywords[i::len(lists)]
+    return config, keywords
+
+def make_titles(keywords, rng, count=500):
+    """
+    Utility: Window titles: about half contain a keyword, the rest don't.
+    """
+    titles = []
+    for _ in range(count):
+        words = [_word(rng).capitalize() for _ in range(rng.randint(2, 8))]
+        if rng.random() < 0.5:
+            words.insert(rng.randint(0, len(words)), rng.choice(keywords))
+        titles.append(" - ".join([" ".join(words[:3]), " ".join(words[3:]) or "Window"]))
+    return titles
+
+# --- Core Logic: Benchmarks ---
+def bench_classifiers(keyword_counts):
+    """
+    Core Logic: classify_by_title_only / classify_activity throughput
+    for keyword lists of each size (rules only, AI off).
+    """
+    rng = random.Random(SEED)
+    saved_config = activity_classifier.current_config
+    saved_ai = activity_classifier.ai_enabled
+    activity_classifier.ai_enabled = False
+    processes = ["chrome.exe", "Code.exe", "unknown.exe", "msedge.exe"]
+    results = {}
+    try:
+        for count in keyword_counts:
+            config, keywords = make_config(count, rng)
+            started = time.perf_counter()
+            activity_classifier.reload_config(config)
+            compile_ms = (time.perf_counter() - started) * 1000
+            titles = make_titles(keywords, rng)
+            title_us = _per_call_us(activity_classifier.classify_by_title_only, [(t,) for t in titles])
+            activity_us = _per_call_us(activity_classifier.classify_activity,
+                                       [(processes[i % len(processes)], t) for i, t in enumerate(titles)])
+            results[f"keywords_{count}"] = {
+                "compile_ms": round(compile_ms, 3),
+                "title_only_us": round(title_us, 3),
+                "title_only_per_s": round(1e6 / title_us),
+                "activity_us": round(activity_us, 3),
+                "activity_per_s": round(1e6 / activity_us),
+            }
+            print(f"  classifiers, {count} keywords: {title_us:.1f} us / {activity_us:.1f} us per call")
+    finally:
+        activity_classifier.reload_config(saved_config)
+        activity_classifier.ai_enabled = saved_ai
+    return results
+
+def use_app_model_files():
+    """
+    Utility: Points ai_classifier and model_registry at the model files
+    next to this script (ai_classifier resolves them from the working
+    directory when it is imported).
+    """
+    ai_classifier.LINEAR_MODEL_FILE = os.path.join(APP_DIR, 'ai_model.npz')
+    ai_classifier.MODEL_FILE = os.path.join(APP_DIR, 'ai_model.joblib')
+    model_registry.MODELS_DIR = os.path.join(APP_DIR, 'models')
+    model_registry.REGISTRY_FILE = os.path.join(model_registry.MODELS_DIR, 'registry.json')
+
+def bench_predict():
+    """
+    Core Logic: predict_category latency: model load, cold (cache miss)
+    and warm (cache hit).
+    """
+    use_app_model_files()
+    started = time.perf_counter()
+    ai_classifier.start_background_load()
+    ai_classifier.model_ready.wait(120)
+    load_ms = (time.perf_counter() - started) * 1000
+    if not ai_classifier.is_model_ready():
+        print(f"  WARNING: predict_category skipped: no AI model could be loaded from '{APP_DIR}'. "
+              "Run 'python ai_trainer.py' first; compare will report these timings as missing.")
+        return {"available": False}
+
+    rng = random.Random(SEED)
+    titles = make_titles([_word(rng) for _ in range(50)], rng, count=300)
+    ai_classifier.clear_cache()
+    cold_us = _per_call_us(ai_classifier.predict_category, [(t,) for t in titles], repeat=1)
+    warm_us = _per_call_us(ai_classifier.predict_category, [(t,) for t in titles])
+    batch_started = time.perf_counter()
+    ai_classifier.clear_cache()
+    ai_classifier.predict_category_batch(titles)
+    batch_us = (time.perf_counter() - batch_started) / len(titles) * 1e6
+    print(f"  predict_category: load {load_ms:.0f} ms, cold {cold_us:.0f} us, warm {warm_us:.1f} us")
+    return {
+        "available": True,
+        "model": os.path.basename(ai_classifier.get_model_info().get("path", "")),
+        "load_ms": round(load_ms, 1),
+        "cold_us": round(cold_us, 2),
+        "warm_us": round(warm_us, 3),
+        "batch_per_title_us": round(batch_us, 2),
+    }
+
+def bench_log_event(work_dir, events):
+    """
+    Core Logic: log_event insert rate (queue + group commit), per storage mode.
+    """
+    saved_mode = data_manager.STORAGE_MODE
+    rng = random.Random(SEED)
+    results = {}
+    try:
+        for mode in ("sessions", "events"):
+            data_manager.STORAGE_MODE = mode
+            data_manager.init_database(os.path.join(work_dir, f"log_{mode}.db"))
+            start = datetime(2025, 1, 6, 9, 0, 0)
+            rows = [(rng.choice(CATEGORIES[:5]), f"Window {rng.randint(1, 20)}") for _ in range(events)]
+            started = time.perf_counter()
+            for i, (category, title) in enumerate(rows):
+                data_manager.log_event(category, title, timestamp=start + timedelta(seconds=5 * i))
+            queued_s = time.perf_counter() - started
+            data_manager.flush(60.0)
+            total_s = time.perf_counter() - started
+            data_manager.shutdown()
+            results[mode] = {
+                "events": events,
+                "enqueue_us": round(queued_s / events * 1e6, 3),
+                "committed_per_s": round(events / total_s),
+            }
+            print(f"  log_event ({mode}): {events / total_s:,.0f} events/s committed")
+    finally:
+        data_manager.STORAGE_MODE = saved_mode
+    return results
+
+def build_synthetic_db(path, days, last_day, storage="sessions"):
+    """
+    Utility: Fills a new database with 'days' days (ending on 'last_day')
+    of ACTIVE_HOURS_PER_DAY hours of 5-second samples, stored like the
+    app would in 'storage' mode, then builds the daily rollup.
+    Returns the number of samples.
+    """
+    rng = random.Random(SEED)
+    poll_s = data_manager.POLL_INTERVAL_SECONDS
+    samples_per_day = int(ACTIVE_HOURS_PER_DAY * 3600 / poll_s)
+    data_manager.init_database(path)
+    log_rows, session_rows = [], []
+    for d in range(days):
+        t = datetime.combine(last_day - timedelta(days=days - 1 - d), datetime.min.time()) + timedelta(hours=9)
+        left = samples_per_day
+        while left > 0:
+            run = min(left, rng.randint(1, 60))
+            category = rng.choice(CATEGORIES)
+            title = f"Window {rng.randint(1, 200)}"
+            if storage == "events":
+                log_rows += [(str(t + timedelta(seconds=i * poll_s)), category, title) for i in range(run)]
+            else:
+                session_rows.append((str(t), str(t + timedelta(seconds=run * poll_s)), category, title, run))
+            t += timedelta(seconds=run * poll_s)
+            left -= run
+    with data_manager._db_lock:
+        conn = data_manager.get_connection()
+        conn.executemany("INSERT INTO activity_log (timestamp, category, app_name) VALUES (?, ?, ?)", log_rows)
+        conn.executemany("INSERT INTO activity_sessions (start_time, end_time, category, app_name, samples) "
+                         "VALUES (?, ?, ?, ?, ?)", session_rows)
+        conn.commit()
+    data_manager.rebuild_daily_rollup()
+    return days * samples_per_day
+
+def bench_stats(work_dir, db_days, runs, storage):
+    """
+    Core Logic: calculate_daily_stats / get_weekly_stats / live stats
+    latency on synthetic databases of each size.
+    """
+    results = {}
+    last_day = datetime(2025, 12, 31).date()
+    now = datetime.combine(last_day, datetime.min.time()) + timedelta(hours=17)
+    for days in db_days:
+        path = os.path.join(work_dir, f"stats_{days}d_{storage}.db")
+        started = time.perf_counter()
+        samples = build_synthetic_db(path, days, last_day, storage)
+        build_s = time.perf_counter() - started
+        daily_ms = _median_ms(focus_engine.calculate_daily_stats, runs, now=now)
+        weekly_ms = _median_ms(focus_engine.get_weekly_stats, runs, now=now)
+        seed_ms = _median_ms(focus_engine.start_live_stats, 3, now=now)
+        live_us = _median_ms(focus_engine.get_live_stats, runs, now=now) * 1000
+        data_manager.shutdown()
+        results[f"days_{days}"] = {
+            "samples": samples,
+            "db_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+            "build_s": round(build_s, 2),
+            "daily_stats_ms": round(daily_ms, 3),
+            "weekly_stats_ms": round(weekly_ms, 3),
+            "live_seed_ms": round(seed_ms, 3),
+            "live_stats_us": round(live_us, 2),
+        }
+        print(f"  stats, {days} days ({samples:,} samples): daily {daily_ms:.2f} ms, weekly {weekly_ms:.2f} ms")
+    return results
+
+def run_all(quick=False, storage=None):
+    """
+    Core Logic: Runs every benchmark. Returns the results dict.
+    """
+    storage = storage or data_manager.STORAGE_MODE
+    work_dir = tempfile.mkdtemp(prefix="flow_bench_")
+    saved_db = data_manager.DB_FILE
+    print(f"Benchmarking (scratch files in {work_dir})...")
+    try:
+        results = {
+            "meta": {
+                "created_at": datetime.now().isoformat(timespec='seconds'),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "quick": quick,
+                "storage_mode": storage,
+            },
+            "classifiers": bench_classifiers(KEYWORD_COUNTS[:3] if quick else KEYWORD_COUNTS),
+            "predict_category": bench_predict(),
+            "log_event": bench_log_event(work_dir, 2000 if quick else 20000),
+            "stats": bench_stats(work_dir, DB_DAYS[:2] if quick else DB_DAYS, 5 if quick else 20, storage),
+        }
+    finally:
+        data_manager.shutdown()
+        data_manager.DB_FILE = saved_db
+    return results
+
+# --- Feature Logic: Compare ---
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(old, new, threshold=DEFAULT_THRESHOLD_PERCENT):
+    """
+    Feature Logic: Prints every timing/rate that exists in both result
+    sets and how much it changed. Returns the names that got worse by
+    more than 'threshold' percent, plus any timing/rate the old results
+    have and the new ones don't (a section that was skipped or failed).
+    """
+    old_flat, new_flat = _flatten(old), _flatten(new)
+    regressions = []
+    for name in sorted(old_flat.keys() - new_flat.keys()):
+        if name.endswith(("_per_s", "_us", "_ms", "_s")):
+            regressions.append(name)
+            print(f"{name:50} {old_flat[name]:>14,.3f} -> {'missing':>14}  <-- not measured")
+    for name in sorted(old_flat.keys() & new_flat.keys()):
+        if name.endswith("_per_s"):
+            higher_is_better = True
+        elif name.endswith(("_us", "_ms", "_s")):
+            higher_is_better = False
+        else:
+            continue # A count or size, not a measurement
+        before, after = old_flat[name], new_flat[name]
+        if not before:
+            continue
+        change = (after - before) / before * 100
+        worse = change < -threshold if higher_is_better else change > threshold
+        if worse:
+            regressions.append(name)
+        flag = "  <-- slower" if worse else ""
+        print(f"{name:50} {before:>14,.3f} -> {after:>14,.3f} ({change:+6.1f}%){flag}")
+    print(f"{len(regressions)} regression(s) over {threshold:g}% or missing.")
+    return regressions
+
+def parse_args(argv=None):
+    """
+    Utility: Reads the command-line options.
+    """
+    parser = argparse.ArgumentParser(description="FLOW benchmark suite.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Run the benchmarks and save the results as JSON.")
+    run.add_argument("--out", default="benchmark_results.json", help="Results file.")
+    run.add_argument("--quick", action="store_true", help="Smaller sizes (skips 10,000 keywords and 1 year).")
+    run.add_argument("--storage", choices=["sessions", "events"],
+                     help="How the synthetic stats databases are stored (default: STORAGE_MODE).")
+    cmp = sub.add_parser("compare", help="Compare two results files.")
+    cmp.add_argument("old")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD_PERCENT,
+                     help=f"Percent change that counts as a regression (default: {DEFAULT_THRESHOLD_PERCENT:g}).")
+    return parser.parse_args(argv)
+
+# python benchmark.py run --out before.json
+# python benchmark.py compare before.json after.json
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "compare":
+        with open(args.old, 'r', encoding='utf-8') as f:
+            old_results = json.load(f)
+        with open(args.new, 'r', encoding='utf-8') as f:
+            new_results = json.load(f)
+        sys.exit(1 if compare(old_results, new_results, args.threshold) else 0)
+    results = run_all(args.quick, args.storage)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to '{args.out}'.")
@@ -1,88 +1,554 @@
-# data_manager.py (v1.1 - Final V1)
+# data_manager.py (v1.15 - Sample-Based Durations)
 
 # --- Imports ---
 import sqlite3  # Reason: For creating and interacting with the SQL database file.
-from datetime import datetime  # Reason: To create timestamps for each log entry.
+import threading  # Reason: To run the batched writer in the background.
+import queue      # Reason: Bounded hand-off between the tracker and the writer.
+import atexit     # Reason: To flush any pending events when the app exits.
+import time       # Reason: To time the group commits.
+import math       # Reason: Splitting events at midnight (whole samples).
+import sys        # Reason: For the command-line rebuild option.
+from contextlib import contextmanager     # Reason: ReadPool.connection() is a 'with' block.
+from datetime import datetime, timedelta  # Reason: To create timestamps for each log entry.
+import instrumentation  # Reason: The 'db_insert' timing histogram.
 
 # --- Constants ---
 # Defines the database file name.
-DB_FILE = "flow_data.db" 
+DB_FILE = "flow_data.db"
+
+# How often the tracker samples the active window. Every logged event
+# stands for this many seconds of activity.
+POLL_INTERVAL_SECONDS = 5.0
+
+# Storage mode for activity:
+#   "events"   - one activity_log row per sample (the original V1 format).
+#   "sessions" - one activity_sessions row per unbroken run of samples with
+#                the same category and title (start_time -> end_time).
+# Both are read back through the 'activity_intervals' view, so old
+# activity_log history keeps counting after switching modes.
+STORAGE_MODE = "sessions"
+
+# A new sample only extends the open session if it arrives within this
+# many seconds of the session's end (e.g. not after a pause or sleep).
+SESSION_GAP_SECONDS = 2 * POLL_INTERVAL_SECONDS
+
+# Batched writer settings. Events are committed in groups: every
+# FLUSH_EVERY_EVENTS events or every FLUSH_INTERVAL_SECONDS, whichever
+# comes first. At one event per 5s this is at most one fsync per 30s.
+FLUSH_EVERY_EVENTS = 12
+FLUSH_INTERVAL_SECONDS = 30.0
+MAX_PENDING_EVENTS = 1000  # Bounded queue. A full queue blocks the caller.
+
+# How many read-only connections a ReadPool keeps open (e.g. the API's
+# stats requests). Readers never block the writer in WAL mode.
+READ_POOL_SIZE = 4
+
+# --- Writer State ---
+_conn = None                    # The long-lived connection (shared, guarded by _db_lock)
+_db_lock = threading.RLock()    # Serializes all use of _conn between threads
+_event_queue = queue.Queue(maxsize=MAX_PENDING_EVENTS)
+_writer_thread = None
+_writer_lock = threading.Lock() # Guards starting the writer thread once
+_STOP = object()                # Marker put on the queue to stop the writer
+_open_session = None            # The session row currently being extended (sessions mode)
+_event_listeners = []           # Callbacks told about every logged event
+_initialized_db = None          # The DB_FILE init_database() last set up
+_init_lock = threading.Lock()   # Guards ensure_database() (not _db_lock: init may flush)
 
 # --- Utility Function ---
-def init_database():
+def get_connection():
+    """
+    Utility: Returns the long-lived database connection, opening it
+    (in WAL mode) the first time it is needed.
+    Callers must hold _db_lock while using it.
+    """
+    global _conn
+    with _db_lock:
+        if _conn is None:
+            _conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+            # WAL lets readers (stats, API) run while we write, and
+            # synchronous=NORMAL only fsyncs at checkpoints, not every commit.
+            _conn.execute("PRAGMA journal_mode=WAL")
+            _conn.execute("PRAGMA synchronous=NORMAL")
+        return _conn
+
+def init_database(db_file=None):
     """
     Utility: Creates the database file and the 'activity_log' table
-    if they don't already exist.
-    """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS activity_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp DATETIME NOT NULL,
-        category TEXT NOT NULL,
-        app_name TEXT
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS ai_feedback (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        window_title TEXT NOT NULL,
-        category TEXT NOT NULL,
-        timestamp DATETIME NOT NULL
-    )
-    ''')
-
-    conn.commit()
-    conn.close()
+    if they don't already exist. 'db_file' switches to another database
+    file first (e.g. a scratch one for replay.py).
+    """
+    global DB_FILE, _initialized_db
+    if db_file is not None and db_file != DB_FILE:
+        shutdown() # Commit and close the current database first
+        DB_FILE = db_file
+    with _db_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            category TEXT NOT NULL,
+            app_name TEXT
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_time DATETIME NOT NULL,
+            end_time DATETIME NOT NULL,
+            category TEXT NOT NULL,
+            app_name TEXT,
+            samples INTEGER NOT NULL DEFAULT 1
+        )
+        ''')
+
+        # Every stats query filters on a time range, so index the times.
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_log_timestamp ON activity_log(timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_sessions_start ON activity_sessions(start_time)')
+
+        # One row per interval, whichever table it was stored in. Every
+        # sample counts POLL_INTERVAL_SECONDS in both tables (not a
+        # session's end_time - start_time, which also spans the short gaps
+        # a session bridges), the same as the live stats add per event.
+        intervals_sql = f'''CREATE VIEW activity_intervals AS
+            SELECT timestamp AS start_time,
+                   strftime('%Y-%m-%d %H:%M:%f', timestamp, '+{POLL_INTERVAL_SECONDS} seconds') AS end_time,
+                   category, app_name,
+                   1 AS samples,
+                   {POLL_INTERVAL_SECONDS} AS duration_s
+            FROM activity_log
+            UNION ALL
+            SELECT start_time, end_time, category, app_name, samples,
+                   samples * {POLL_INTERVAL_SECONDS} AS duration_s
+            FROM activity_sessions'''
+        old_view = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'activity_intervals'").fetchone()
+        view_changed = old_view is not None and old_view[0] != intervals_sql
+        if old_view is None or view_changed:
+            # Older versions timed sessions by end_time - start_time. Their
+            # rollup used those durations, so it is rebuilt below.
+            cursor.execute('DROP VIEW IF EXISTS activity_intervals')
+            cursor.execute(intervals_sql)
+
+        # Per-day totals, kept up to date by the writer so history views
+        # never have to scan raw activity. 'seconds' is the same duration
+        # the activity_intervals view reports.
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            event_count INTEGER NOT NULL DEFAULT 0,
+            seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, category)
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ai_feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            window_title TEXT NOT NULL,
+            category TEXT NOT NULL,
+            timestamp DATETIME NOT NULL
+        )
+        ''')
+
+        conn.commit()
+
+        # First run with the rollup table: backfill it from existing history.
+        rollup_empty = cursor.execute('SELECT 1 FROM daily_rollup LIMIT 1').fetchone() is None
+        has_activity = (cursor.execute('SELECT 1 FROM activity_log LIMIT 1').fetchone() is not None
+                        or cursor.execute('SELECT 1 FROM activity_sessions LIMIT 1').fetchone() is not None)
+    if (rollup_empty and has_activity) or view_changed:
+        rebuild_daily_rollup()
+    _initialized_db = DB_FILE
     print(f"Database '{DB_FILE}' initialized.")
 
-# --- Core Logic ---
-def log_event(category, app_name):
+def ensure_database():
     """
-    Core Logic: Inserts one "event" (one row) into the activity_log table.
-    This is called by the "slow" thread every 5 seconds.
+    Utility: Runs init_database() unless it already ran for the current
+    DB_FILE. The stats readers call this first, so a database from an
+    older version (e.g. only 'activity_log') gets the new tables, the
+    activity_intervals view and its rollup before anything reads them.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    if _initialized_db == DB_FILE:
+        return
+    with _init_lock:
+        if _initialized_db != DB_FILE:
+            init_database()
 
-    timestamp = datetime.now() 
+def rebuild_daily_rollup():
+    """
+    Utility: Rebuilds the whole daily_rollup table from the raw activity
+    tables. Only needed once for old databases, or to repair the table.
+    """
+    flush() # Include anything still queued
+    with _db_lock:
+        conn = get_connection()
+        try:
+            conn.execute('DELETE FROM daily_rollup')
+            conn.execute('''
+            INSERT INTO daily_rollup (date, category, event_count, seconds)
+            SELECT substr(start_time, 1, 10), category, SUM(samples), SUM(duration_s)
+            FROM activity_intervals
+            GROUP BY substr(start_time, 1, 10), category
+            ''')
+            conn.commit()
+            days = conn.execute('SELECT COUNT(DISTINCT date) FROM daily_rollup').fetchone()[0]
+        except Exception as e:
+            conn.rollback()
+            print(f"Error rebuilding daily rollup: {e}")
+            return
+    print(f"Daily rollup rebuilt for {days} days.")
+
+# --- Core Logic: Batched Writer ---
+def _start_writer():
+    """
+    Utility: Starts the background writer thread (only once).
+    """
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="flow-db-writer", daemon=True)
+            _writer_thread.start()
+
+def _extend_session(conn, timestamp, category, app_name, samples=1):
+    """
+    Core Logic: Adds 'samples' samples (starting at 'timestamp') to the
+    open session, or closes it and opens a new one if the category, title
+    or day changed (or there was a gap, e.g. the app was paused).
+    """
+    global _open_session
+    sample_end = timestamp + timedelta(seconds=samples * POLL_INTERVAL_SECONDS)
+    s = _open_session
+    if (s is not None
+            and s['category'] == category
+            and s['app_name'] == app_name
+            and s['start_time'].date() == timestamp.date()
+            and (timestamp - s['end_time']).total_seconds() <= SESSION_GAP_SECONDS):
+        s['end_time'] = max(s['end_time'], sample_end)
+        s['samples'] += samples
+        return
+
+    # Something changed: write out the old session and start a new one.
+    _save_open_session(conn)
+    _open_session = {
+        'id': None,
+        'start_time': timestamp,
+        'end_time': sample_end,
+        'category': category,
+        'app_name': app_name,
+        'samples': samples,
+    }
 
-    cursor.execute('''
-    INSERT INTO activity_log (timestamp, category, app_name)
-    VALUES (?, ?, ?)
-    ''', (timestamp, category, app_name))
+def _save_open_session(conn):
+    """
+    Utility: Inserts (first time) or updates the open session row.
+    """
+    s = _open_session
+    if s is None:
+        return
+    if s['id'] is None:
+        cursor = conn.execute('''
+        INSERT INTO activity_sessions (start_time, end_time, category, app_name, samples)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (s['start_time'], s['end_time'], s['category'], s['app_name'], s['samples']))
+        s['id'] = cursor.lastrowid
+    else:
+        conn.execute('''
+        UPDATE activity_sessions SET end_time = ?, samples = ? WHERE id = ?
+        ''', (s['end_time'], s['samples'], s['id']))
+
+def _write_batch(batch):
+    """
+    Utility: Writes a list of events in ONE transaction (one commit).
+    """
+    global _open_session
+    if not batch:
+        return
+    with _db_lock, instrumentation.timed("db_insert"):
+        conn = get_connection()
+        try:
+            rollup = {} # (date, category) -> [event_count, seconds]
+            log_rows = [] # "events" mode: one row per sample
+            for timestamp, category, app_name, samples in batch:
+                if STORAGE_MODE == "sessions":
+                    _extend_session(conn, timestamp, category, app_name, samples)
+                else:
+                    log_rows += [(timestamp + timedelta(seconds=i * POLL_INTERVAL_SECONDS), category, app_name)
+                                 for i in range(samples)]
+                totals = rollup.setdefault((timestamp.strftime('%Y-%m-%d'), category), [0, 0.0])
+                totals[0] += samples
+                totals[1] += samples * POLL_INTERVAL_SECONDS
 
-    conn.commit()
-    conn.close()
+            if STORAGE_MODE == "sessions":
+                _save_open_session(conn)
+            else:
+                conn.executemany('''
+                INSERT INTO activity_log (timestamp, category, app_name)
+                VALUES (?, ?, ?)
+                ''', log_rows)
+
+            # Same transaction, so the rollup can never drift from the raw rows.
+            conn.executemany('''
+            INSERT INTO daily_rollup (date, category, event_count, seconds)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(date, category) DO UPDATE SET
+                event_count = event_count + excluded.event_count,
+                seconds = seconds + excluded.seconds
+            ''', [(day, category, count, seconds) for (day, category), (count, seconds) in rollup.items()])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            _open_session = None # Its row may not exist any more; start fresh
+            print(f"Error writing {len(batch)} events: {e}")
+
+def _writer_loop():
+    """
+    Core Logic: The writer thread. Collects events from the queue and
+    group-commits them every FLUSH_EVERY_EVENTS events or
+    FLUSH_INTERVAL_SECONDS, or when asked to flush/stop.
+    """
+    batch = []
+    deadline = None
+    while True:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            item = _event_queue.get(timeout=timeout)
+        except queue.Empty:
+            item = None # Timer expired
+
+        if item is None or isinstance(item, threading.Event) or item is _STOP:
+            _write_batch(batch)
+            batch = []
+            deadline = None
+            if isinstance(item, threading.Event):
+                item.set() # Wake up whoever called flush()
+            if item is _STOP:
+                return
+            continue
+
+        batch.append(item)
+        if deadline is None:
+            deadline = time.monotonic() + FLUSH_INTERVAL_SECONDS
+        if len(batch) >= FLUSH_EVERY_EVENTS:
+            _write_batch(batch)
+            batch = []
+            deadline = None
+
+def flush(timeout=10.0):
+    """
+    Utility: Blocks until every event logged so far has been committed.
+    """
+    if _writer_thread is None or not _writer_thread.is_alive():
+        return
+    done = threading.Event()
+    _event_queue.put(done)
+    done.wait(timeout)
+
+def shutdown():
+    """
+    Utility: Flushes pending events, stops the writer and closes the
+    connection. Called when the app exits.
+    """
+    global _conn, _writer_thread, _open_session
+    if _writer_thread is not None and _writer_thread.is_alive():
+        _event_queue.put(_STOP)
+        _writer_thread.join(10.0)
+    _writer_thread = None
+    with _db_lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+        _open_session = None
+
+atexit.register(shutdown)
+
+# --- Core Logic: Read Connections ---
+def open_read_connection(db_file=None):
+    """
+    Utility: Opens a connection for readers only (stats, API). It can be
+    used from any thread (one at a time) and refuses to write.
+    """
+    conn = sqlite3.connect(db_file or DB_FILE, check_same_thread=False)
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+class ReadPool:
+    """
+    Core Logic: Up to 'size' read-only connections, opened on first use
+    and reused, so readers don't pay for a new connection per request:
+        with pool.connection() as conn:
+            focus_engine.calculate_daily_stats(conn=conn)
+    When every connection is in use, callers wait for one to come back.
+    """
+
+    def __init__(self, size=READ_POOL_SIZE, db_file=None):
+        self.size = size
+        self.db_file = db_file
+        self._idle = queue.LifoQueue() # Most recently used first (warm page cache)
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    opening = True
+                else:
+                    opening = False
+            if opening:
+                try:
+                    conn = open_read_connection(self.db_file)
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        """
+        Utility: Closes the idle connections (call once nothing is reading).
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+# --- Core Logic ---
+def add_event_listener(callback):
+    """
+    Utility: Registers callback(timestamp, category, app_name, samples),
+    which is called for every event passed to log_event (e.g. the live stats in
+    focus_engine). Callbacks run on the caller's thread and must be quick.
+    """
+    if callback not in _event_listeners:
+        _event_listeners.append(callback)
+
+def log_event(category, app_name, samples=1, timestamp=None):
+    """
+    Core Logic: Queues one "event" of activity: 'samples' back-to-back
+    samples of POLL_INTERVAL_SECONDS each, starting at 'timestamp'
+    (default: now). The tracker backs off while nothing changes,
+    so one event can stand for several samples.
+    The background writer stores it in the next group commit, either as
+    activity_log rows or by extending the open session.
+    """
+    _start_writer()
+    if timestamp is None:
+        timestamp = datetime.now()
+    # An event that runs past midnight is split, so each day gets the
+    # samples that started on it (as if they were logged one by one).
+    next_midnight = datetime.combine(timestamp.date() + timedelta(days=1), datetime.min.time())
+    before_midnight = math.ceil((next_midnight - timestamp).total_seconds() / POLL_INTERVAL_SECONDS)
+    if before_midnight < samples:
+        log_event(category, app_name, before_midnight, timestamp)
+        log_event(category, app_name, samples - before_midnight,
+                  timestamp + timedelta(seconds=before_midnight * POLL_INTERVAL_SECONDS))
+        return
+    _event_queue.put((timestamp, category, app_name, samples))
+    for callback in _event_listeners:
+        try:
+            callback(timestamp, category, app_name, samples)
+        except Exception as e:
+            print(f"Error in event listener: {e}")
 
 def log_ai_feedback(window_title, category):
     """
     Log user correction for AI misclassification.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
     timestamp = datetime.now()
-
-    cursor.execute('''
-    INSERT INTO ai_feedback (window_title, category, timestamp)
-    VALUES (?, ?, ?)
-    ''', (window_title, category, timestamp))
-
-    conn.commit()
-    conn.close()
+    with _db_lock:
+        conn = get_connection()
+        conn.execute('''
+        INSERT INTO ai_feedback (window_title, category, timestamp)
+        VALUES (?, ?, ?)
+        ''', (window_title, category, timestamp))
+        conn.commit()
 
 def get_ai_feedback():
     """
     Retrieve all user feedback for re-training.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    with _db_lock:
+        conn = get_connection()
+        feedback = conn.execute('SELECT window_title, category FROM ai_feedback').fetchall()
+    return feedback
+
+def get_ai_feedback_since(last_id):
+    """
+    Utility: Returns (id, window_title, category) feedback rows newer
+    than 'last_id', oldest first. The online learner uses this to pick
+    up only the corrections it hasn't applied yet.
+    """
+    with _db_lock:
+        conn = get_connection()
+        return conn.execute('''
+        SELECT id, window_title, category FROM ai_feedback
+        WHERE id > ? ORDER BY id
+        ''', (last_id,)).fetchall()
+
+def get_daily_rollup(start_date, end_date, conn=None):
+    """
+    Utility: Returns (date, category, event_count, seconds) rows from the
+    daily rollup for dates in [start_date, end_date] ('YYYY-MM-DD').
+    Used by the History window and any monthly/yearly views.
+    """
+    if conn is not None:
+        return conn.execute('''
+        SELECT date, category, event_count, seconds FROM daily_rollup
+        WHERE date >= ? AND date <= ? ORDER BY date
+        ''', (start_date, end_date)).fetchall()
+    with _db_lock:
+        return get_daily_rollup(start_date, end_date, get_connection())
+
+def get_data_version(conn=None):
+    """
+    Utility: A short text token that changes whenever activity is
+    written: the newest activity_log id, plus the newest session's id
+    and sample count (the writer only ever extends the newest session).
+    Both are primary-key lookups, so it is far cheaper than reading the
+    stats. Used by the API for ETags.
+    A missing table (a database init_database() hasn't upgraded) counts
+    as empty, so readers get zero stats instead of an error.
+    """
+    if conn is not None:
+        try:
+            log_id = conn.execute("SELECT MAX(id) FROM activity_log").fetchone()[0]
+        except sqlite3.OperationalError:
+            log_id = None
+        try:
+            session = conn.execute("SELECT id, samples FROM activity_sessions ORDER BY id DESC LIMIT 1").fetchone()
+        except sqlite3.OperationalError:
+            session = None
+        session_id, samples = session if session else (0, 0)
+        return f"{log_id or 0}.{session_id}.{samples}"
+    with _db_lock:
+        return get_data_version(get_connection())
 
-    cursor.execute('SELECT window_title, category FROM ai_feedback')
-    feedback = cursor.fetchall()
-    
-    conn.close()
-    return feedback
\ No newline at end of file
+# --- Command Line ---
+# 'python data_manager.py --rebuild-rollup' backfills daily_rollup.
+if __name__ == "__main__":
+    if "--rebuild-rollup" in sys.argv[1:]:
+        init_database()
+        rebuild_daily_rollup()
+        shutdown()
+    else:
+        print("Usage: python data_manager.py --rebuild-rollup")
@@ -0,0 +1,280 @@
+# flow_daemon.py (v1.3 - Per-Client Socket Writers)
+
+# --- Imports ---
+# No GUI library is imported here: the daemon never loads Tk.
+import os         # Reason: To read our own memory use.
+import sys        # Reason: For stdout and the exit code.
+import json       # Reason: The JSON and socket sinks send JSON lines.
+import time       # Reason: To keep the main thread waiting.
+import queue      # Reason: Each socket client has its own bounded send queue.
+import socket     # Reason: The local socket sink.
+import argparse   # Reason: Command-line options.
+import threading  # Reason: The socket sink accepts clients in the background.
+from datetime import datetime  # Reason: Timestamps on every record.
+import data_manager        # Reason: Handles all database saving/loading
+import focus_engine        # Reason: Handles all stat calculations
+import activity_classifier # Reason: The same classifiers the GUI uses
+import window_sources      # Reason: Tells us when the focused window changes
+import tracker_pipeline    # Reason: Runs the whole tracker (window -> stats)
+import instrumentation     # Reason: Stage timing histograms (--diagnostics-file)
+
+# --- Constants ---
+# The pipeline's GUI event keys, and the record type each becomes.
+EVENT_TYPES = {
+    '-STATS_UPDATE-': "stats",
+    '-UPDATE_APP-': "activity",
+    '-DISTRACTION_EVENT-': "distraction",
+    '-PROMPT_STUDY_MODE-': "lecture",
+}
+
+DEFAULT_SOCKET_PORT = 8765 # Local socket sink (127.0.0.1 only)
+
+# How many records a socket client may fall behind before it is
+# disconnected. The pipeline never waits for a slow client.
+CLIENT_QUEUE_SIZE = 64
+
+# --- Utility Function ---
+def get_rss_mb():
+    """
+    Utility: This process's resident memory in MB (or None).
+    """
+    try:
+        import psutil # Reason: Already loaded by the pipeline.
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+def make_record(event_key, value):
+    """
+    Utility: Turns one pipeline event into a plain dict, or None if the
+    event isn't one we report.
+    """
+    record_type = EVENT_TYPES.get(event_key)
+    if record_type is None:
+        return None
+    record = {"type": record_type, "time": datetime.now().isoformat(timespec='seconds')}
+    if record_type == "stats":
+        record.update(value)
+    elif record_type == "distraction":
+        record["category"], record["title"] = value
+    else:
+        record["value"] = value
+    return record
+
+# --- Core Logic: Sinks ---
+# A sink is called as sink(event_key, value) for every pipeline event
+# (the same signature as TrackerPipeline.subscribe) and has close().
+class StdoutSink:
+    """
+    Core Logic: Prints one readable line per stats update / activity change.
+    """
+
+    def __call__(self, event_key, value):
+        record = make_record(event_key, value)
+        if record is None:
+            return
+        if record["type"] == "stats":
+            print(f"[{record['time']}] Score {record['score']}% | Productive {record['prod_time_s']}s | "
+                  f"Distracted {record['dist_time_s']}s | Neutral {record['neut_time_s']}s", flush=True)
+        elif record["type"] == "distraction":
+            print(f"[{record['time']}] Distraction ({record['category']}): {record['title']}", flush=True)
+        else:
+            print(f"[{record['time']}] {record['value']}", flush=True)
+
+    def close(self):
+        pass
+
+class JsonSink:
+    """
+    Core Logic: Writes one JSON object per line, to a file or stdout.
+    """
+
+    def __init__(self, path=None):
+        self.file = open(path, 'a', encoding='utf-8') if path else sys.stdout
+        self.lock = threading.Lock()
+
+    def __call__(self, event_key, value):
+        record = make_record(event_key, value)
+        if record is None:
+            return
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+class _SocketClient:
+    """
+    Utility: One connected client. Records go into a bounded queue and a
+    writer thread sends them, so a slow client only ever blocks itself.
+    If the queue fills up, the client is disconnected.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.queue = queue.Queue(CLIENT_QUEUE_SIZE)
+        self.closed = False
+        threading.Thread(target=self._write_loop, name="flow-socket-client", daemon=True).start()
+
+    def send(self, line):
+        """
+        Utility: Queues 'line'. Returns False if the client is gone (or was
+        just dropped for falling too far behind).
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(line)
+            return True
+        except queue.Full:
+            print("Socket sink: a client fell too far behind; disconnecting it.")
+            self.close()
+            return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR) # Ends a sendall() in progress
+        except OSError:
+            pass
+        self.sock.close()
+        try:
+            self.queue.put_nowait(None) # Wakes the writer if it is waiting
+        except queue.Full:
+            pass # Then it isn't waiting
+
+    def _write_loop(self):
+        try:
+            while True:
+                line = self.queue.get()
+                if line is None or self.closed:
+                    return
+                self.sock.sendall(line)
+        except OSError:
+            pass # The client went away
+        finally:
+            self.close()
+
+class SocketSink:
+    """
+    Core Logic: A tiny local server (127.0.0.1 only). Every connected
+    client receives each record as a JSON line; new clients first get
+    the latest stats. Sending never blocks the pipeline (see _SocketClient).
+    """
+
+    def __init__(self, port=DEFAULT_SOCKET_PORT):
+        self.server = socket.create_server(("127.0.0.1", port))
+        self.port = self.server.getsockname()[1] # The real port if 'port' was 0
+        self.clients = []
+        self.lock = threading.Lock()
+        self.last_stats = None
+        threading.Thread(target=self._accept_loop, name="flow-socket-sink", daemon=True).start()
+        print(f"Socket sink listening on 127.0.0.1:{self.port}")
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return # Server closed
+            client = _SocketClient(sock)
+            with self.lock:
+                if self.last_stats is not None:
+                    client.send(self.last_stats)
+                self.clients.append(client)
+
+    def __call__(self, event_key, value):
+        record = make_record(event_key, value)
+        if record is None:
+            return
+        line = (json.dumps(record) + "\n").encode('utf-8')
+        with self.lock:
+            if record["type"] == "stats":
+                self.last_stats = line
+            self.clients = [c for c in self.clients if c.send(line)]
+
+    def close(self):
+        self.server.close()
+        with self.lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+
+def create_sink(kind, json_file=None, port=DEFAULT_SOCKET_PORT):
+    """
+    Utility: Creates a sink: "stdout", "json" or "socket".
+    """
+    if kind == "json":
+        return JsonSink(json_file)
+    if kind == "socket":
+        return SocketSink(port)
+    return StdoutSink()
+
+# --- Core Logic: Run ---
+def run(args):
+    """
+    Core Logic: Starts the database, the tracker pipeline and the sink,
+    then runs until Ctrl+C.
+    """
+    activity_classifier.ai_enabled = not args.no_ai
+    activity_classifier.is_studying = args.study
+
+    data_manager.init_database(args.db)
+    focus_engine.start_live_stats()
+
+    sink = create_sink(args.sink, args.json_file, args.port)
+    source = window_sources.create_window_source(args.window_source)
+    # Edits to config.json apply without a restart.
+    activity_classifier.add_reload_listener(source.request_refresh)
+    activity_classifier.start_config_watcher()
+    tracker = tracker_pipeline.TrackerPipeline(
+        source, activity_classifier.classify_by_title_only, activity_classifier.classify_activity,
+        alerts_enabled=lambda: activity_classifier.is_studying, self_pid=os.getpid())
+    tracker.subscribe(sink)
+    tracker.start()
+    tracker_pipeline.register_diagnostics(tracker)
+
+    rss = get_rss_mb()
+    if rss is not None:
+        print(f"FLOW daemon running (RSS {rss:.1f} MB). Press Ctrl+C to stop.", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tracker.stop()
+        source.stop()
+        sink.close()
+        data_manager.shutdown()
+        if args.diagnostics_file:
+            print(f"Diagnostics saved to '{instrumentation.dump_json(args.diagnostics_file)}'.", file=sys.stderr)
+    return 0
+
+def parse_args(argv=None):
+    """
+    Utility: Reads the command-line options.
+    """
+    parser = argparse.ArgumentParser(description="FLOW headless tracker (no GUI).")
+    parser.add_argument("--sink", choices=["stdout", "json", "socket"], default="stdout",
+                        help="Where stats go (default: stdout).")
+    parser.add_argument("--json-file", help="File for the json sink (default: stdout).")
+    parser.add_argument("--port", type=int, default=DEFAULT_SOCKET_PORT,
+                        help=f"Port for the socket sink (default: {DEFAULT_SOCKET_PORT}).")
+    parser.add_argument("--window-source", choices=["auto", "winevent", "polling", "scripted"],
+                        default="auto", help="How to watch the focused window.")
+    parser.add_argument("--db", help=f"Database file (default: {data_manager.DB_FILE}).")
+    parser.add_argument("--study", action="store_true", help="Start in Study Mode.")
+    parser.add_argument("--no-ai", action="store_true",
+                        help="Keyword rules only; never load the AI model (smallest memory use).")
+    parser.add_argument("--diagnostics-file",
+                        help="Save the stage timing histograms to this JSON file on exit.")
+    return parser.parse_args(argv)
+
+# python flow_daemon.py --sink json --json-file flow_stats.jsonl
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
@@ -1,22 +1,31 @@
-# main.py (Version 1.8.2 - Final V1 Package)
+# main.py (Version 2.4 - Config Hot-Reload)
 
 # --- Utility: Import necessary libraries ---
+import time                    # Reason: For all 'sleep' operations (and startup timing)
+_startup_marks = [("start", time.perf_counter())] # Startup timing: (phase, time)
+
 import FreeSimpleGUI as sg     # Reason: The GUI library
-import pygetwindow as gw       # Reason: To get the active window title
-import time                    # Reason: For all 'sleep' operations
-import threading               # Reason: To run trackers in the background
-import psutil                  # Reason: To get the .exe name from a process ID
-import win32process            # Reason: To get the process ID (PID) from a window
+_startup_marks.append(("import GUI library", time.perf_counter()))
 import os                      # Reason: To get our own PID for self-checking
 import sys                     # Reason: To check if we are in "packaged" mode.
-import re                      # Reason: For word-boundary matching
-
+import json                    # Reason: To show the diagnostics as text.
 
 # --- Utility: Import our helper files ---
 import data_manager            # Reason: Handles all database saving/loading
 import focus_engine            # Reason: Handles all stat calculations
 import config_manager          # Reason: Handles reading/writing config.json
 import ai_classifier           # Reason: To get AI predictions on window titles
+import activity_classifier     # Reason: The classifiers and their state (shared with the daemon)
+import online_learner          # Reason: Applies 'Report AI' corrections while the app runs
+import window_sources          # Reason: Tells us when the focused window changes
+import tracker_pipeline        # Reason: Runs the whole tracker (window -> stats) in the background
+import instrumentation         # Reason: Stage timing histograms (Diagnostics window)
+import ui_events               # Reason: Coalesces tracker events; non-modal alert windows
+_startup_marks.append(("import FLOW modules", time.perf_counter()))
+
+# Start loading the AI model now, in the background. The window can open
+# straight away; until the model is ready, only the keyword rules are used.
+ai_classifier.start_background_load()
 
 # --- (THEME REMOVED FOR SPEED) ---
 
@@ -40,26 +49,22 @@ def resource_path(relative_path):
     # Join the base path with our file name to get the full, correct path
     return os.path.join(base_path, relative_path)
 
-# --- Core Logic: Load config from JSON ---
-# This reads config.json on startup and stores it in a
-# global variable. Other functions can "hot-reload" this.
-current_config = config_manager.load_config()
-
 # --- Global App "State" Variables ---
 # These variables control the app's current state.
-is_studying = False            # True if Study Mode is on
-prompt_is_showing = False      # True if the "Start Study?" popup is active
-snoozed_lecture_title = None # Stores the title of a snoozed lecture
+# (Study Mode and the lecture prompt state live in activity_classifier.)
 is_paused = False              # True if the Pause button is active
-pause_lock = threading.Lock()  # A "lock" to prevent threads from
-                               # changing 'is_paused' at the same time.
 
-# --- Shared "Current Activity" Variables ---
-# These are used to pass data from the fast thread (Worker 1)
-# to the slow thread (Worker 2).
-current_app_title = None       # The title of the window
-current_hwnd = None            # The "handle" (unique ID) of the window
-activity_lock = threading.Lock() # A lock to safely write/read these variables
+# --- Utility Function: 'print_startup_report' ---
+def print_startup_report():
+    """
+    Utility: Prints how long each startup phase took.
+    """
+    print("--- Startup timing ---")
+    for (_, previous), (phase, now) in zip(_startup_marks, _startup_marks[1:]):
+        print(f"  {phase:<34} {(now - previous) * 1000:8.1f} ms")
+    total = _startup_marks[-1][1] - _startup_marks[0][1]
+    print(f"  {'total':<34} {total * 1000:8.1f} ms")
+    print(f"  AI model ready: {ai_classifier.is_model_ready()}")
 
 # --- Utility Function: 'format_time' ---
 def format_time(seconds):
@@ -73,353 +78,6 @@ def format_time(seconds):
     if m > 0: return f"{m}m {s}s"
     return f"{s}s"
 
-# --- Core Logic: 'classify_by_title_only' (The "Fast" Classifier) ---
-def classify_by_title_only(window_title):
-    """
-    Core Logic: This is the "Quick-Check" classifier.
-    It's FAST because it *only* looks at the window title.
-    It now uses the AI model as a fallback.
-    """
-    global is_studying, prompt_is_showing, snoozed_lecture_title
-    
-    # Load rules from the global config (fast, in-memory)
-    PRODUCTIVE_KEYWORDS = current_config.get("PRODUCTIVE_KEYWORDS", [])
-    DISTRACTION_LEVELS = current_config.get("DISTRACTION_LEVELS", {})
-    STUDY_KEYWORDS = current_config.get("STUDY_KEYWORDS", [])
-    IGNORE_TITLES = current_config.get("IGNORE_TITLES", [])
-
-    # --- Snooze Fix: Only check for empty title ---
-    if not window_title:
-        return "Idle"
-
-    title_low = window_title.lower()
-    
-    # 1. Check Ignore List (e.g., "task switching")
-    if title_low in IGNORE_TITLES:
-        return "Neutral"
-
-    # --- SAFETY CHECK: High-Severity Distractions First ---
-    # This prevents 'adult videos' from matching 'os' (study) or AI false positives
-    for keyword in DISTRACTION_LEVELS.get("High", []):
-        if keyword in title_low:
-             return "Distraction-High"
-
-    # --- Classification Logic ---
-    # 2. Check Productive Keywords (Using Word Boundaries for short ones)
-    for keyword in PRODUCTIVE_KEYWORDS:
-        if len(keyword) <= 3:
-            if re.search(rf"\b{re.escape(keyword)}\b", title_low):
-                return "Productive"
-        elif keyword in title_low:
-            return "Productive"
-
-    # 3. Check Study Keywords (Using Word Boundaries for 'os', 'ai', etc.)
-    for keyword in STUDY_KEYWORDS:
-        if len(keyword) <= 3:
-            # Word boundary check prevents "videOS" matching "os"
-            if re.search(rf"\b{re.escape(keyword)}\b", title_low):
-                return "Studying"
-        elif keyword in title_low:
-            return "Studying"
-
-    # 4. Check Medium Distractions (e.g., YouTube)
-    is_medium_distraction = False
-    for keyword in DISTRACTION_LEVELS.get("Medium", []):
-        if keyword in title_low:
-            is_medium_distraction = True
-            break
-            
-    if is_medium_distraction:
-        if is_studying:
-            return "Distraction-Medium"
-        else:
-            # Re-check Study words with boundaries for prompt
-            is_lecture = False
-            for study_word in STUDY_KEYWORDS:
-                if len(study_word) <= 3:
-                    if re.search(rf"\b{re.escape(study_word)}\b", title_low):
-                        is_lecture = True; break
-                elif study_word in title_low:
-                    is_lecture = True; break
-            
-            if is_lecture:
-                if not prompt_is_showing and window_title != snoozed_lecture_title:
-                    return "Prompt-Study-Mode"
-                else:
-                    return "Neutral"
-            else:
-                return "Distraction-Medium"
-
-    # 5. Check Low Distractions
-    for keyword in DISTRACTION_LEVELS.get("Low", []):
-        if keyword in title_low:
-            return "Distraction-Low"
-
-    # 6. Final Rule Check: If in Study Mode, all else is a distraction
-    if is_studying:
-        return "Distraction-Low"
-        
-    # --- # AI FIX v2 (INTELLIGENT GATING) ---
-    # 7. Only ask the AI if title is substantial (> 5 chars)
-    if len(title_low.strip()) > 5:
-        ai_prediction = ai_classifier.predict_category(window_title)
-        
-        if ai_prediction == 1:
-            print(f"AI classified '{window_title}' as Productive.")
-            return "Productive"
-        elif ai_prediction == 0:
-            print(f"AI classified '{window_title}' as Distraction.")
-            return "Distraction-Low"
-        elif ai_prediction == 2:
-            # New Neutral class from AI
-            return "Neutral"
-
-    # 8. Default: It's just a neutral app
-    return "Neutral"
-
-# --- Core Logic: 'classify_activity' (The "Slow" Classifier) ---
-def classify_activity(process_name, window_title):
-    """
-    Core Logic: This is the "Full, Accurate" classifier.
-    It's SLOW because it uses the 'process_name' (from psutil)
-    in addition to the 'window_title'.
-    It now also uses the AI as a final fallback for logging.
-    """
-    global is_studying
-    
-    # Load rules from the global config
-    PROCESS_RULES = current_config.get("PROCESS_RULES", {})
-    PRODUCTIVE_KEYWORDS = current_config.get("PRODUCTIVE_KEYWORDS", [])
-    DISTRACTION_LEVELS = current_config.get("DISTRACTION_LEVELS", {})
-    STUDY_KEYWORDS = current_config.get("STUDY_KEYWORDS", [])
-
-    # 1. Handle idle state
-    if process_name is None and window_title is None: return "Idle"
-    
-    # 2. Check Process Rules (Most reliable)
-    if process_name in PROCESS_RULES:
-        category = PROCESS_RULES[process_name]
-        # Return the category immediately if it's definitive
-        if category == "Productive": return "Productive"
-        if category == "Distraction-Low":
-            return "Neutral" if is_studying else "Distraction-Low"
-        if category == "Distraction-Medium": return "Distraction-Medium"
-        if category == "Distraction-High": return "Distraction-High"
-        if category == "Check-Title": pass # Tells logic to check title
-        else: return category # e.g., "Neutral"
-
-    # 3. Handle missing title (but we have a process name)
-    if not window_title:
-        return "Neutral" if not is_studying else "Distraction-Low"
-
-    # 4. Check Title Keywords
-    title_low = window_title.lower()
-    for keyword in PRODUCTIVE_KEYWORDS:
-        if keyword in title_low: return "Productive"
-    
-    # --- # NEW FIX: Check STUDY_KEYWORDS here too ---
-    for keyword in STUDY_KEYWORDS:
-        if keyword in title_low:
-            return "Studying"
-        
-    is_medium_distraction = False
-    for keyword in DISTRACTION_LEVELS.get("Medium", []):
-        if keyword in title_low: is_medium_distraction = True; break
-        
-    if is_medium_distraction:
-        if is_studying:
-            # We already checked for "Studying"
-            return "Distraction-Medium"
-        else:
-            # Score Fix: Log lectures as "Neutral" when not in study mode
-            # We already checked for "Studying", so this is redundant,
-            # but safe to leave.
-            for study_word in STUDY_KEYWORDS:
-                if study_word in title_low: return "Neutral"
-            return "Distraction-Medium"
-            
-    for keyword in DISTRACTION_LEVELS.get("High", []):
-        if keyword in title_low: return f"Distraction-High"
-    for keyword in DISTRACTION_LEVELS.get("Low", []):
-        if keyword in title_low: return "Distraction-Low"
-
-    # 5. Check Study Mode
-    if is_studying: return "Distraction-Low"
-    
-    # 6. AI Classification (for logging)
-    # If no rules matched, ask the AI.
-    ai_prediction = ai_classifier.predict_category(window_title)
-    if ai_prediction == 1:
-        return "Productive (AI)" # Log this as AI-found
-    elif ai_prediction == 0:
-        return "Distraction-Low (AI)" # Log this as AI-found
-
-    # 7. Default
-    return "Neutral"
-
-# --- Core Logic: Helper Worker 1 'fast_tracker_thread' ---
-def fast_tracker_thread(window_object, self_pid):
-    """
-    Core Logic: This is the "Fast" thread (Worker 1). Runs every 0.5s.
-    Its ONLY job is to update the "Live Status" UI instantly.
-    """
-    print("Fast tracker thread (Worker 1) has started.")
-    # Get the global variables this thread needs to communicate
-    global current_app_title, current_hwnd, activity_lock
-    global is_paused, pause_lock 
-    global is_studying # Get the global study state
-    
-    last_distraction_category = None # State variable to prevent popup spam
-    
-    while True:
-        # --- Pause Logic (Deadlock Fix) ---
-        # 1. Check the pause state *without* holding the lock
-        with pause_lock:
-            paused_now = is_paused
-        
-        # 2. If paused, sleep and skip the loop.
-        # This frees the lock for the main thread to "Resume".
-        if paused_now:
-            last_distraction_category = None # Reset state
-            time.sleep(1.0) # Sleep to save CPU
-            continue 
-        
-        # --- Main Tracking Logic ---
-        try:
-            # 1. Get active window
-            app_title = None
-            hwnd = None
-            active_window = gw.getActiveWindow()
-            if active_window:
-                app_title = active_window.title
-                hwnd = active_window._hWnd
-                # Check if the active window is our own app
-                pid = win32process.GetWindowThreadProcessId(hwnd)[1]
-                if pid == self_pid:
-                    continue # It's us, skip this loop
-            
-            # 2. Run the "Fast" classifier
-            category = classify_by_title_only(app_title) 
-            
-            # 3. Handle "Prompt" category
-            if category == "Prompt-Study-Mode":
-                # Send the prompt event to the main UI
-                window_object.write_event_value('-PROMPT_STUDY_MODE-', app_title)
-                category = "Neutral" # Treat it as neutral for now
-            
-            # 4. Share data with the "Slow" thread
-            with activity_lock:
-                current_app_title = app_title
-                current_hwnd = hwnd
-            
-            # 5. Send "Live Status" update to the UI
-            gui_message = f"Cat: {category} | Title: {app_title if app_title else 'None'}"
-            window_object.write_event_value('-UPDATE_APP-', gui_message)
-            
-            # 6. Lag Fix: Send popups *only* on state change
-            current_category = None
-            if category.startswith("Distraction-"):
-                current_category = category
-            
-            if current_category != last_distraction_category:
-                if current_category:
-                    # --- # CRITICAL FIX (Silent Tracking) ---
-                    # Only send a popup event if Study Mode is ON.
-                    if is_studying:
-                        print(f"FAST_THREAD: Sending ONE popup for {current_category}")
-                        window_object.write_event_value('-DISTRACTION_EVENT-', (category, app_title if app_title else "Unknown Distraction"))
-                last_distraction_category = current_category
-                
-            time.sleep(0.5) # This thread is fast
-            
-        except Exception as e:
-            # Catch errors (like window closing)
-            with activity_lock:
-                current_app_title = None
-                current_hwnd = None
-            last_distraction_category = None 
-            time.sleep(0.5)
-
-# --- Core Logic: Helper Worker 2 'slow_logging_thread' ---
-def slow_logging_thread(window_object):
-    """
-    Core Logic: This is the "Slow" thread (Worker 2). Runs every 5s.
-    Its ONLY job is to do the "heavy" work:
-    1. Get the .exe name (slow psutil call).
-    2. Run the "slow" classifier.
-    3. Save the result to the database (slow disk write).
-    4. Calculate stats (slow database read).
-    """
-    print("Slow logging/stats thread (Worker 2) has started.")
-    global current_app_title, current_hwnd, activity_lock
-    global is_paused, pause_lock 
-    
-    last_pid = None
-    last_process_name = None # Cache the last .exe name to speed things up
-    
-    while True:
-        # --- Pause Logic (Deadlock Fix) ---
-        with pause_lock:
-            paused_now = is_paused
-            
-        if paused_now:
-            time.sleep(5.0) 
-            continue 
-
-        # --- Main Logging Logic ---
-        try:
-            # 1. Get window data from the fast thread
-            app_title = None
-            hwnd = None
-            with activity_lock:
-                app_title = current_app_title
-                hwnd = current_hwnd
-            
-            # 2. Get the .exe name (the "slow" part)
-            process_name = None
-            if hwnd:
-                try:
-                    pid = win32process.GetWindowThreadProcessId(hwnd)[1]
-                    if pid > 0: # Check for valid PID
-                        if pid == last_pid:
-                            process_name = last_process_name # Use cache
-                        else:
-                            # The slow call:
-                            process = psutil.Process(pid)
-                            process_name = process.name()
-                            last_pid = pid
-                            last_process_name = process_name
-                    else:
-                        last_pid = None
-                        last_process_name = None
-                except Exception as e:
-                    # Catch errors (e.g., "process PID not found")
-                    print(f"Error during PID lookup: {e}")
-                    last_pid = None
-                    last_process_name = None
-            else:
-                last_pid = None
-                last_process_name = None
-            
-            # 3. Run the "Slow" classifier
-            category = classify_activity(process_name, app_title)
-            
-            # 4. Log the result to the database
-            data_manager.log_event(category, app_title)
-            
-            # 5. Calculate all stats
-            stats = focus_engine.calculate_daily_stats() 
-            
-            # 6. Send stats to the UI
-            window_object.write_event_value('-STATS_UPDATE-', stats)
-            
-            time.sleep(5.0) # This thread is slow
-            
-        except Exception as e:
-            print(f"Error in slow logging thread: {e}")
-            last_pid = None
-            last_process_name = None
-            time.sleep(5.0)
 
 # --- UI Function: 'create_history_window' ---
 def create_history_window():
@@ -475,7 +133,7 @@ def create_settings_window():
     Utility: Creates and shows the multi-tab Settings window.
     This is where users customize the app.
     """
-    global current_config # We need this to "hot-reload"
+    current_config = activity_classifier.current_config
     
     # --- Helper functions to convert lists to/from text blocks
     def list_to_str(lst): return "\n".join(lst)
@@ -603,7 +261,9 @@ def create_settings_window():
                 # 2. Save the new config to config.json
                 if config_manager.save_config(new_config):
                     # 3. "Hot-Reload" the config in the main app
-                    current_config = new_config 
+                    # (The reload listener re-classifies the current window.)
+                    activity_classifier.reload_config(new_config, config_manager.get_config_stamp())
+                    current_config = activity_classifier.current_config
                     window['-SAVE_STATUS-'].update("Saved! Rules hot-reloaded.")
                 else:
                     window['-SAVE_STATUS-'].update("Error saving!", text_color='red')
@@ -612,6 +272,67 @@ def create_settings_window():
                 
     window.close()
     
+# --- UI Function: 'create_diagnostics_window' ---
+def diagnostics_rows():
+    """
+    Utility: One table row per timed stage: count and latencies in ms.
+    """
+    def ms(us):
+        return "-" if us is None else f"{us / 1000:.3f}"
+    rows = []
+    for stage, s in instrumentation.get_snapshot().items():
+        rows.append([stage, s['count'], ms(s['avg_us']), ms(s['p50_us']),
+                     ms(s['p95_us']), ms(s['p99_us']), ms(s['max_us'])])
+    return rows or [["(nothing timed yet)", "", "", "", "", "", ""]]
+
+def diagnostics_details():
+    """
+    Utility: Everything else (schedulers, caches, stage budgets) as text.
+    """
+    diagnostics = instrumentation.collect_diagnostics()
+    diagnostics.pop("stages", None)
+    return json.dumps(diagnostics, indent=2, default=str)
+
+def create_diagnostics_window():
+    """
+    Utility: Shows where the tracker spends its time: a latency table per
+    stage (window probe, PID lookup, rule match, AI predict, DB insert,
+    stats) plus the scheduler and cache numbers. Refreshes every 2s.
+    """
+    headings = ['Stage', 'Count', 'Avg ms', 'p50 ms', 'p95 ms', 'p99 ms', 'Max ms']
+    layout = [
+        [sg.Text("Diagnostics", font=("Helvetica", 16, "bold"))],
+        [sg.Table(values=diagnostics_rows(),
+                  headings=headings,
+                  auto_size_columns=False,
+                  col_widths=[18, 7, 8, 8, 8, 8, 8],
+                  justification='right',
+                  num_rows=12,
+                  key='-DIAG_TABLE-')],
+        [sg.Text("(p50/p95/p99 are histogram bucket bounds)", font=("Helvetica", 8, "italic"))],
+        [sg.Multiline(diagnostics_details(), size=(80, 12), disabled=True, key='-DIAG_DETAILS-')],
+        [sg.Button("Refresh"), sg.Button("Save JSON"), sg.Button("Reset"), sg.Button("Close"),
+         sg.Text("", key='-DIAG_STATUS-', text_color='green')]
+    ]
+    window = sg.Window("Diagnostics", layout, modal=True, finalize=True)
+
+    while True:
+        event, values = window.read(timeout=2000)
+        if event in (sg.WIN_CLOSED, "Close"):
+            break
+        if event == "Save JSON":
+            try:
+                path = instrumentation.dump_json()
+                window['-DIAG_STATUS-'].update(f"Saved to {path}")
+            except Exception as e:
+                sg.popup_error(f"Failed to save diagnostics: {e}")
+        if event == "Reset":
+            instrumentation.reset()
+        window['-DIAG_TABLE-'].update(values=diagnostics_rows())
+        window['-DIAG_DETAILS-'].update(diagnostics_details())
+
+    window.close()
+
 # --- UI Function: 'create_how_to_use_window' ---
 def create_how_to_use_window():
     """
@@ -627,7 +348,9 @@ This app runs in the background to track your productivity.
 
 1. Just Let it Run
 The 'Live Status' shows what app FLOW sees. The timers
-will update every 5 seconds.
+update every 5 seconds while you switch between windows,
+and less often (up to every 30 seconds) while you stay
+on the same one.
 
 2. Use 'Study Mode'
 Click 'Start Study Mode' when you need to focus (like
@@ -675,9 +398,20 @@ productive or distracting. You can add .exe names
 # --- Main App Startup ---
 # 1. Initialize the database (creates flow_data.db if needed)
 data_manager.init_database()
+# 1b. Load today's totals once; after this they update as events are logged
+focus_engine.start_live_stats()
+online_learner.start_online_learning()
+_startup_marks.append(("database + today's stats", time.perf_counter()))
 # 2. Get our own Process ID to ignore ourselves
 self_pid = os.getpid()
 print(f"Main App PID: {self_pid}")
+# 3. Start watching the focused window (window events on Windows,
+# polling as a fallback)
+window_source = window_sources.create_window_source()
+# 4. Re-classify the current window whenever the rules change, and pick
+# up edits to config.json made outside the Settings window.
+activity_classifier.add_reload_listener(window_source.request_refresh)
+activity_classifier.start_config_watcher()
 
 # --- # UPDATED: GUI Layout (Using your new title) ---
 # 1. Title/Logo Row - Using your exact layout
@@ -728,6 +462,7 @@ button_column = [
     ],
     [
         sg.Button("How to Use", key='-SHOW_HOW_TO_USE-', expand_x=True, button_color=('white', '#0073E6')),
+        sg.Button("Diagnostics", key='-SHOW_DIAGNOSTICS-', expand_x=True),
         sg.Button("Exit", expand_x=True, button_color=('white', '#FF0000'))
     ]
 ]
@@ -746,22 +481,128 @@ layout = [
 
 # Create the main window
 window = sg.Window("FLOW Dashboard", layout, finalize=True, size=(400, 600), icon=resource_path(os.path.join('assets', 'logo.ico')))
+_startup_marks.append(("build main window", time.perf_counter()))
+print_startup_report()
+
+# --- Start The Tracker ---
+# One background pipeline: window changes -> title classifier -> process
+# name -> full classifier -> database -> stats. Its output arrives here
+# through the coalescer, which keeps only the newest status/stats update
+# and wakes the GUI with a single event.
+tracker = tracker_pipeline.TrackerPipeline(
+    window_source, activity_classifier.classify_by_title_only, activity_classifier.classify_activity,
+    alerts_enabled=lambda: activity_classifier.is_studying, self_pid=self_pid)
+coalescer = ui_events.EventCoalescer(window)
+alerts = ui_events.AlertWindows()
+tracker.subscribe(coalescer)
+tracker.start()
+tracker_pipeline.register_diagnostics(tracker)
+instrumentation.add_provider("ui_events", coalescer.get_stats)
+instrumentation.add_provider("ai_cache", ai_classifier.get_cache_stats)
+instrumentation.add_provider("online_learning", online_learner.get_online_stats)
+
+# --- Utility Function: 'handle_tracker_event' ---
+def handle_tracker_event(event, value):
+    """
+    Utility: Updates the main window for one event from the tracker
+    (delivered through the coalescer, so status/stats are the latest).
+    """
+    # --- Event: From the tracker (focused window changed) ---
+    if event == '-UPDATE_APP-':
+        # Don't update the status text if the app is paused
+        if not is_paused:
+            window['-APP_TEXT-'].update(value)
 
-# --- Start The Threads ---
-# These run in the background. 'daemon=True' means they will
-# automatically close when the main window closes.
-threading.Thread(target=fast_tracker_thread, args=(window, self_pid), daemon=True).start()
-threading.Thread(target=slow_logging_thread, args=(window,), daemon=True).start()
+    # --- Event: From the tracker (one-time) ---
+    if event == '-DISTRACTION_EVENT-':
+        category, title = value
+        level = category.split('-')[1]
+        
+        # Show different alerts based on severity (none of them block)
+        if level == "Low":
+            alerts.show("distraction", f"FLOW Alert: {title}", "Minor distraction. Stay focused!", auto_close_s=4)
+        elif level == "Medium":
+            alerts.show("distraction", f"FLOW: Major Distraction: {title}", "You're off track! Get back to it!", auto_close_s=4)
+        elif level == "High":
+            # Stays open until the user clicks OK
+            alerts.show("distraction", f"!!! FLOW CRITICAL ALERT: {title} !!!", "HIGH SEVERITY DETECTED.\nReturning to focus.")
+
+    # --- Event: From the tracker (lecture found) ---
+    if event == '-PROMPT_STUDY_MODE-':
+        if not activity_classifier.prompt_is_showing: # Prevent spamming popups
+            activity_classifier.prompt_is_showing = True
+            alerts.show("study_prompt", "Lecture Detected!",
+                        f"Looks like a lecture:\n\n'{value}'\n\nEnable Study Mode?",
+                        buttons=("Yes", "No"), data=value)
+
+    # --- Event: From the tracker (after each log) ---
+    if event == '-STATS_UPDATE-':
+        # This is where the timers get updated
+        stats = value
+        window['-SCORE-'].update(f"{stats['score']}%")
+        window['-PROD_TIME-'].update(format_time(stats['prod_time_s']))
+        window['-DIST_TIME-'].update(format_time(stats['dist_time_s']))
+        window['-NEUT_TIME-'].update(format_time(stats['neut_time_s'])) 
+        window['-PRED_SCORE-'].update(f"Predicted End-of-Day Score: {stats['predicted_score']}%")
+
+# --- Utility Function: 'handle_alert_answer' ---
+def handle_alert_answer(kind, answer, data):
+    """
+    Utility: Acts on the button the user clicked in an alert window.
+    """
+    if kind == "study_prompt":
+        app_title = data
+        if answer == "Yes":
+            # Toggle Study Mode on
+            activity_classifier.is_studying = True
+            window_source.request_refresh()
+            window['-MODE_TEXT-'].update("Mode: Studying 📚")
+            window['-STUDY_TOGGLE-'].update("End Study Mode")
+            activity_classifier.snoozed_lecture_title = None # Clear any snoozes
+        else:
+            # User clicked "No" (or closed it), so snooze this lecture title
+            print(f"Snoozing prompt for: {app_title}")
+            activity_classifier.snoozed_lecture_title = app_title
+        
+        activity_classifier.prompt_is_showing = False # Allow new prompts
+
+    if kind == "report_ai" and answer in ["Productive", "Distraction"]:
+        report_title = data
+        # 2. Log to database
+        data_manager.log_ai_feedback(report_title, answer)
+        # 3. Learn from it in the background (no restart needed)
+        online_learner.request_update()
+        alerts.show("info", "Success",
+                    f"Feedback saved for '{report_title}'!\nThe AI will learn from it in a few seconds.",
+                    auto_close_s=5)
 
 # --- Main GUI Event Loop ---
-# This is the "heart" of the app. It waits for user clicks
-# or messages from the background threads.
+# This is the "heart" of the app. It waits for user clicks, answers in
+# the alert windows, or messages from the tracker (via the coalescer).
+# Nothing in here blocks, so tracker updates never pile up.
 while True:
-    event, values = window.read()
+    win, event, values = sg.read_all_windows(timeout=alerts.next_timeout_ms())
+    alerts.expire()
+
+    # --- Event: An alert window was answered ---
+    if win is not None and win is not window:
+        answer = alerts.handle(win, event)
+        if answer:
+            handle_alert_answer(*answer)
+        continue
+
+    if event == sg.TIMEOUT_EVENT:
+        continue # Only woke up to close an alert
 
     # --- Event: User clicks 'Exit' or 'X' ---
     if event == "Exit" or event == sg.WIN_CLOSED:
         break
+
+    # --- Event: From the tracker (everything pending, newest status only) ---
+    if event == ui_events.TRACKER_EVENT:
+        with instrumentation.timed("ui_handle_tracker_events"):
+            for tracker_event, value in coalescer.drain():
+                handle_tracker_event(tracker_event, value)
         
     # --- Event: User clicks 'History' ---
     if event == '-SHOW_HISTORY-':
@@ -774,12 +615,15 @@ while True:
     # --- Event: User clicks 'How to Use' ---
     if event == '-SHOW_HOW_TO_USE-':
         create_how_to_use_window()
+
+    # --- Event: User clicks 'Diagnostics' ---
+    if event == '-SHOW_DIAGNOSTICS-':
+        create_diagnostics_window()
         
     # --- Event: User clicks 'Pause/Resume' ---
     if event == '-PAUSE_TOGGLE-':
-        # Use the lock to safely change the global variable
-        with pause_lock:
-            is_paused = not is_paused
+        is_paused = not is_paused
+        tracker.set_paused(is_paused)
         
         # Update the UI to show the new state
         if is_paused:
@@ -792,68 +636,15 @@ while True:
             # Use the default text color from the (non-existent) theme
             window['-MODE_TEXT-'].update(text_color=sg.theme_text_color())
 
-
-    # --- Event: From 'fast_tracker_thread' (every 0.5s) ---
-    if event == '-UPDATE_APP-':
-        # Don't update the status text if the app is paused
-        if not is_paused:
-            window['-APP_TEXT-'].update(values[event])
-
-    # --- Event: From 'fast_tracker_thread' (one-time) ---
-    if event == '-DISTRACTION_EVENT-':
-        category, title = values[event]
-        level = category.split('-')[1]
-        
-        # Show different popups based on severity
-        if level == "Low":
-            sg.popup_notify("Minor distraction. Stay focused!", title=f"FLOW Alert: {title}")
-        elif level == "Medium":
-            sg.popup_notify("You're off track! Get back to it!", title=f"FLOW: Major Distraction: {title}")
-        elif level == "High":
-            # This is a *blocking* popup
-            sg.popup("HIGH SEVERITY DETECTED.\nReturning to focus.", title=f"!!! FLOW CRITICAL ALERT: {title} !!!")
-
-    # --- Event: From 'fast_tracker_thread' (lecture found) ---
-    if event == '-PROMPT_STUDY_MODE-':
-        if not prompt_is_showing: # Prevent spamming popups
-            prompt_is_showing = True
-            app_title = values[event]
-            response = sg.popup_yes_no(
-                f"Looks like a lecture:\n\n'{app_title}'\n\nEnable Study Mode?",
-                title="Lecture Detected!"
-            )
-            
-            if response == "Yes":
-                # Toggle Study Mode on
-                is_studying = True
-                window['-MODE_TEXT-'].update("Mode: Studying 📚")
-                window['-STUDY_TOGGLE-'].update("End Study Mode")
-                snoozed_lecture_title = None # Clear any snoozes
-            else:
-                # User clicked "No", so snooze this lecture title
-                print(f"Snoozing prompt for: {app_title}")
-                snoozed_lecture_title = app_title
-            
-            prompt_is_showing = False # Allow new prompts
-
-    # --- Event: From 'slow_logging_thread' (every 5s) ---
-    if event == '-STATS_UPDATE-':
-        # This is where the timers get updated
-        stats = values[event]
-        window['-SCORE-'].update(f"{stats['score']}%")
-        window['-PROD_TIME-'].update(format_time(stats['prod_time_s']))
-        window['-DIST_TIME-'].update(format_time(stats['dist_time_s']))
-        window['-NEUT_TIME-'].update(format_time(stats['neut_time_s'])) 
-        window['-PRED_SCORE-'].update(f"Predicted End-of-Day Score: {stats['predicted_score']}%")
-        
     # --- Event: User clicks 'Start/End Study Mode' ---
     if event == '-STUDY_TOGGLE-':
-        is_studying = not is_studying
+        activity_classifier.is_studying = not activity_classifier.is_studying
+        window_source.request_refresh() # Re-classify the current window
         # --- Snooze Fix: Manually toggling mode ALWAYS clears any snooze. ---
-        snoozed_lecture_title = None 
+        activity_classifier.snoozed_lecture_title = None 
         
         # Update the UI
-        if is_studying:
+        if activity_classifier.is_studying:
             window['-MODE_TEXT-'].update("Mode: Studying 📚")
             window['-STUDY_TOGGLE-'].update("End Study Mode")
         else:
@@ -862,32 +653,24 @@ while True:
 
     # --- Event: User clicks 'Report AI' ---
     if event == '-REPORT_AI-':
-        # Get the latest title safely
-        with activity_lock:
-            report_title = current_app_title
+        # Get the latest title from the tracker
+        report_title = tracker.get_current_title()
         
         if not report_title:
-             sg.popup("No active window to report!", title="Report AI")
+            alerts.show("info", "Report AI", "No active window to report!", auto_close_s=5)
         else:
-            # 1. Ask for the correct category
-            choices = ["Productive", "Distraction", "Cancel"]
-            layout_report = [
-                [sg.Text(f"Current Window:\n'{report_title}'")],
-                [sg.Text("What is the correct category?")],
-                [sg.Button("Productive", button_color=('white', 'green')), 
-                 sg.Button("Distraction", button_color=('white', 'red')),
-                 sg.Button("Cancel")]
-            ]
-            win_report = sg.Window("Report Misclassification", layout_report, modal=True)
-            ev_report, _ = win_report.read()
-            win_report.close()
-
-            if ev_report in ["Productive", "Distraction"]:
-                # 2. Log to database
-                data_manager.log_ai_feedback(report_title, ev_report)
-                sg.popup(f"Feedback saved for '{report_title}'!\nRun ai_trainer.py to update the model.", title="Success")
+            # 1. Ask for the correct category (answered in handle_alert_answer)
+            alerts.show("report_ai", "Report Misclassification",
+                        f"Current Window:\n'{report_title}'\n\nWhat is the correct category?",
+                        buttons=("Productive", "Distraction", "Cancel"), data=report_title)
 
 
 # --- Cleanup ---
-# Once the loop breaks, close the window.
-window.close()
\ No newline at end of file
+# Once the loop breaks, close the windows.
+alerts.close_all()
+window.close()
+online_learner.stop_online_learning()
+tracker.stop()
+window_source.stop()
+# Commit any events still waiting in the batched writer.
+data_manager.shutdown()
\ No newline at end of file
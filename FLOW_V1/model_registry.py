@@ -0,0 +1,179 @@
+# model_registry.py (v1.1 - Writable Registry, Quiet Polling)
+
+# --- Imports ---
+import os        # Reason: For paths and atomic renames.
+import sys       # Reason: For the command-line options.
+import json      # Reason: The registry index is a small JSON file.
+import shutil    # Reason: To copy a trained model into the registry.
+from datetime import datetime  # Reason: To stamp each version.
+
+# --- Constants ---
+# Every trained model is kept here as 'ai_model_v<N>.npz', and
+# 'registry.json' lists them and says which one is active:
+# {"active": "v2",
+#  "versions": [{"version": "v1", "file": "ai_model_v1.npz",
+#                "created_at": "...", "training_size": 180,
+#                "cv_accuracy": 0.91, "feedback_max_id": 12}, ...]}
+# This is app state we write, so it lives in the working directory next
+# to flow_data.db and config.json, NOT under resource_path() (in the
+# packaged .exe that is a temp folder deleted when the app exits).
+MODELS_DIR = os.path.abspath('models')
+REGISTRY_FILE = os.path.join(MODELS_DIR, 'registry.json')
+
+# The app checks the registry every few seconds; a problem is printed
+# once, not on every check (see _warn_once).
+_last_warning = None
+
+# --- Utility Functions ---
+def _registry_stamp():
+    """
+    Utility: registry.json's mtime (None if it doesn't exist).
+    """
+    try:
+        return os.stat(REGISTRY_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def _warn_once(message):
+    """
+    Utility: Prints 'message' unless it was already printed for the
+    current registry.json (it's printed again once the registry changes).
+    """
+    global _last_warning
+    key = (_registry_stamp(), message)
+    if key != _last_warning:
+        print(message)
+        _last_warning = key
+
+def load_registry():
+    """
+    Utility: Reads registry.json. Returns an empty registry if there is none.
+    """
+    try:
+        with open(REGISTRY_FILE, 'r') as f:
+            registry = json.load(f)
+    except FileNotFoundError:
+        return {"active": None, "versions": []}
+    except Exception as e:
+        _warn_once(f"Error reading model registry: {e}")
+        return {"active": None, "versions": []}
+    registry.setdefault("active", None)
+    registry.setdefault("versions", [])
+    return registry
+
+def _save_registry(registry):
+    """
+    Utility: Writes registry.json atomically (temp file + rename), so a
+    running app never reads a half-written file.
+    """
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    tmp_path = REGISTRY_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(registry, f, indent=4)
+    os.replace(tmp_path, REGISTRY_FILE)
+
+def _find_version(registry, version):
+    """
+    Utility: Returns the entry for 'version', or None.
+    """
+    for entry in registry["versions"]:
+        if entry["version"] == version:
+            return entry
+    return None
+
+# --- Core Logic: Reading ---
+def get_active_entry():
+    """
+    Core Logic: Returns the active version's entry (with an absolute
+    'path' added), or None if there is no usable registered model.
+    """
+    registry = load_registry()
+    entry = _find_version(registry, registry["active"])
+    if entry is None:
+        return None
+    path = os.path.join(MODELS_DIR, entry["file"])
+    if not os.path.exists(path):
+        _warn_once(f"Registered model '{path}' is missing.")
+        return None
+    return dict(entry, path=path)
+
+def list_versions():
+    """
+    Utility: Returns every registered version, oldest first.
+    """
+    return load_registry()["versions"]
+
+# --- Core Logic: Writing ---
+def register_model(model_path, training_size, cv_accuracy, feedback_max_id=0):
+    """
+    Core Logic: Copies a freshly trained model file into the registry as
+    the next version and makes it active. Running apps pick it up within
+    a few seconds. Returns the new version name.
+    """
+    registry = load_registry()
+    number = 1 + max([int(e["version"][1:]) for e in registry["versions"]] or [0])
+    version = f"v{number}"
+    filename = f"ai_model_{version}{os.path.splitext(model_path)[1]}"
+
+    # Copy under a temp name first; the app only looks at registered files.
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    target = os.path.join(MODELS_DIR, filename)
+    shutil.copyfile(model_path, target + '.tmp')
+    os.replace(target + '.tmp', target)
+
+    registry["versions"].append({
+        "version": version,
+        "file": filename,
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "training_size": training_size,
+        "cv_accuracy": cv_accuracy,
+        "feedback_max_id": feedback_max_id,
+    })
+    registry["active"] = version
+    _save_registry(registry)
+    print(f"Registered model {version} ({filename}) as the active model.")
+    return version
+
+def set_active(version):
+    """
+    Core Logic: Makes an existing version the active one.
+    Returns True on success.
+    """
+    registry = load_registry()
+    if _find_version(registry, version) is None:
+        print(f"Unknown model version '{version}'.")
+        return False
+    registry["active"] = version
+    _save_registry(registry)
+    print(f"Active model is now {version}.")
+    return True
+
+def rollback(version=None):
+    """
+    Core Logic: Switches back to 'version', or (by default) to the version
+    registered just before the active one. Returns True on success.
+    """
+    registry = load_registry()
+    if version is None:
+        names = [e["version"] for e in registry["versions"]]
+        if registry["active"] not in names or names.index(registry["active"]) == 0:
+            print("There is no earlier model version to roll back to.")
+            return False
+        version = names[names.index(registry["active"]) - 1]
+    return set_active(version)
+
+# --- Command Line ---
+# python model_registry.py list
+# python model_registry.py rollback [version]
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["list"]:
+        active = load_registry()["active"]
+        for entry in list_versions():
+            marker = "*" if entry["version"] == active else " "
+            print(f"{marker} {entry['version']}  {entry['created_at']}  "
+                  f"examples={entry['training_size']}  cv_accuracy={entry['cv_accuracy']:.3f}")
+    elif args[:1] == ["rollback"]:
+        rollback(args[1] if len(args) > 1 else None)
+    else:
+        print("Usage: python model_registry.py list | rollback [version]")
@@ -0,0 +1,332 @@
+# online_learner.py (v1.2 - Binary Score Shapes)
+
+# --- Imports ---
+import os         # Reason: To save the learned corrections atomically.
+import re         # Reason: To split titles into words.
+import time       # Reason: To time each round of updates.
+import zlib       # Reason: crc32 is a fast, stable hash for the feature trick.
+import threading  # Reason: The learner runs in the background.
+import ai_classifier  # Reason: The model we correct, and where we swap it in.
+import data_manager   # Reason: To read new "Report AI" feedback rows.
+
+# --- Constants ---
+# The learned corrections are saved here, next to the database, so they
+# survive restarts. Delete it to forget every online correction.
+ONLINE_MODEL_FILE = "ai_online.npz"
+
+# Words and word pairs are hashed into this many columns (a power of 2).
+# The table has a fixed size, so applying a correction costs the same
+# no matter how many titles the model has seen.
+N_FEATURES = 2 ** 18
+
+# How far a single correction may move the scores (the "C" of the
+# passive-aggressive update). High enough that one report flips the answer.
+AGGRESSIVENESS = 2.0
+
+# How often the background thread looks for new feedback on its own.
+# request_update() wakes it up right away.
+POLL_SECONDS = 30.0
+
+# Same mapping as ai_trainer.py uses for feedback rows.
+FEEDBACK_LABELS = {"Productive": 1, "Distraction": 0, "Neutral": 2}
+
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+# --- Core Logic: Hashed Corrections ---
+class HashedCorrector:
+    """
+    Core Logic: A linear model over hashed words and word pairs that is
+    ADDED to the base model's scores. It is trained one correction at a
+    time with a passive-aggressive update: if the combined model already
+    gets a reported title right (by a margin), nothing changes; otherwise
+    only the columns of that title's words move, just enough to fix it.
+    """
+
+    def __init__(self, classes, weights=None, last_feedback_id=0, updates=0, base_mtime=None):
+        import numpy as np # Reason: Same lazy import as ai_classifier.
+        self.np = np
+        self.classes = list(classes)
+        if weights is None:
+            weights = np.zeros((len(self.classes), N_FEATURES), dtype=np.float32)
+        self.weights = weights
+        self.last_feedback_id = last_feedback_id # Newest ai_feedback id applied
+        self.updates = updates                   # How many reports changed weights
+        self.base_mtime = base_mtime             # Base model file these fit
+
+    def features(self, title):
+        """
+        Utility: Hashed column indexes and (L2-normalized) values for a title.
+        """
+        np = self.np
+        words = _TOKEN_RE.findall(title.lower())
+        terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        cols = sorted({zlib.crc32(term.encode("utf-8")) & (N_FEATURES - 1) for term in terms})
+        cols = np.array(cols, dtype=np.intp)
+        values = np.full(len(cols), 1.0 / np.sqrt(len(cols)) if len(cols) else 0.0)
+        return cols, values
+
+    def scores(self, titles):
+        """
+        Core Logic: The correction scores, shape (len(titles), n_classes).
+        """
+        np = self.np
+        out = np.zeros((len(titles), len(self.classes)))
+        for row, title in enumerate(titles):
+            cols, values = self.features(title)
+            if len(cols):
+                out[row] = self.weights[:, cols] @ values
+        return out
+
+    def partial_fit(self, title, label, base_scores):
+        """
+        Core Logic: Applies one correction ('title' should be 'label').
+        'base_scores' are the base model's scores for the title.
+        Returns True if the weights changed.
+        """
+        if label not in self.classes:
+            return False
+        cols, values = self.features(title)
+        if not len(cols):
+            return False
+
+        right = self.classes.index(label)
+        combined = base_scores + self.weights[:, cols] @ values
+        combined[right] = -float("inf")
+        wrong = int(combined.argmax())
+        combined[right] = base_scores[right] + self.weights[right, cols] @ values
+
+        # Hinge loss: we want the right class ahead by at least 1.
+        loss = 1.0 - (combined[right] - combined[wrong])
+        if loss <= 1e-6:
+            return False # Already right (passive); the slack absorbs float32 rounding
+        # ||x|| is 1, so moving both rows by tau gains 2 * tau of margin.
+        tau = min(AGGRESSIVENESS, loss / 2.0)
+        self.weights[right, cols] += tau * values
+        self.weights[wrong, cols] -= tau * values
+        self.updates += 1
+        return True
+
+    def copy(self):
+        """
+        Utility: An independent copy, so updates never touch a live model.
+        """
+        return HashedCorrector(self.classes, self.weights.copy(), self.last_feedback_id,
+                               self.updates, self.base_mtime)
+
+    def save(self, path):
+        """
+        Utility: Saves the corrections (write to a temp file, then rename,
+        so a crash never leaves a half-written file).
+        """
+        np = self.np
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                weights=self.weights,
+                classes=np.asarray(self.classes),
+                last_feedback_id=np.array(self.last_feedback_id),
+                updates=np.array(self.updates),
+                base_mtime=np.array(self.base_mtime if self.base_mtime is not None else -1.0),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Utility: Loads saved corrections, or returns None.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            import numpy as np
+            with np.load(path, allow_pickle=False) as data:
+                weights = data["weights"]
+                if weights.shape[1] != N_FEATURES:
+                    print(f"'{path}' was saved with a different feature size; ignoring it.")
+                    return None
+                base_mtime = float(data["base_mtime"])
+                return cls(data["classes"].tolist(), weights.astype(np.float32),
+                           int(data["last_feedback_id"]), int(data["updates"]),
+                           base_mtime if base_mtime >= 0 else None)
+        except Exception as e:
+            print(f"Error loading online corrections: {e}")
+            return None
+
+class OnlineModel:
+    """
+    Core Logic: The base model plus the learned corrections. It has the
+    same predict()/decision_function() methods, so ai_classifier can use
+    it exactly like the model it wraps.
+    """
+
+    def __init__(self, base, corrector):
+        self.base = base
+        self.corrector = corrector
+        self.classes = corrector.np.asarray(corrector.classes)
+
+    def decision_function(self, titles):
+        """
+        Core Logic: Same shape as the base model's scores: (len(titles),)
+        for a binary model, (len(titles), n_classes) otherwise.
+        """
+        np = self.corrector.np
+        base_scores = np.asarray(self.base.decision_function(titles), dtype=np.float64)
+        scores = _as_class_scores(np, base_scores) + self.corrector.scores(titles)
+        if base_scores.ndim == 1:
+            # Back to one column. Halved, so it equals the base score when
+            # there are no corrections (the columns are -s and +s).
+            return (scores[:, 1] - scores[:, 0]) / 2.0
+        return scores
+
+    def predict(self, titles):
+        scores = self.decision_function(titles)
+        if scores.ndim == 1:
+            return self.classes[(scores > 0).astype(int)]
+        return self.classes[scores.argmax(axis=1)]
+
+# --- Utility Functions ---
+def _as_class_scores(np, scores):
+    """
+    Utility: Makes a binary model's 1-D scores one column per class
+    (negative class, positive class), like a multi-class model's.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.ndim == 1:
+        return np.column_stack([-scores, scores])
+    return scores
+
+def _model_classes(model):
+    """
+    Utility: The class labels of a loaded model (NumPy export or pipeline).
+    """
+    if hasattr(model, "classes"):
+        return list(model.classes)
+    return list(model.classes_)
+
+# --- Core Logic: Background Learner ---
+_lock = threading.Lock()       # Guards _corrector
+_corrector = None              # The corrections currently swapped in
+_wakeup = threading.Event()
+_stop = threading.Event()
+_thread = None
+
+def _wrap_base_model(base, base_mtime):
+    """
+    Core Logic: Called by ai_classifier for every model it loads from disk.
+    Returns the base model with our corrections on top.
+    """
+    global _corrector
+    with _lock:
+        classes = _model_classes(base)
+        if _corrector is None:
+            _corrector = HashedCorrector.load(ONLINE_MODEL_FILE)
+        if _corrector is None or _corrector.classes != classes:
+            last_id = _corrector.last_feedback_id if _corrector else 0
+            _corrector = HashedCorrector(classes, last_feedback_id=last_id, base_mtime=base_mtime)
+        elif _corrector.base_mtime != base_mtime:
+            # A different model version (retrained, or rolled back): the
+            # old corrections don't fit it. Start over from the reports
+            # newer than the ones the version was trained on.
+            trained_up_to = ai_classifier.get_model_info().get("feedback_max_id")
+            if trained_up_to is None:
+                trained_up_to = _corrector.last_feedback_id
+            print("AI model version changed; starting online corrections from scratch.")
+            _corrector = HashedCorrector(classes, last_feedback_id=trained_up_to, base_mtime=base_mtime)
+            request_update()
+        return OnlineModel(base, _corrector)
+
+def apply_new_feedback():
+    """
+    Core Logic: Applies every feedback row we haven't seen yet, then swaps
+    the updated model into ai_classifier in one step. The work depends
+    only on the number of new rows, never on the size of the training set.
+    Returns how many rows were read.
+    """
+    global _corrector
+    base = ai_classifier.base_model
+    if base is None or _corrector is None:
+        return 0 # No model loaded yet
+
+    started = time.perf_counter()
+    with _lock:
+        rows = data_manager.get_ai_feedback_since(_corrector.last_feedback_id)
+        if not rows:
+            return 0
+        updated = _corrector.copy()
+        changed = 0
+        np = updated.np
+        for feedback_id, title, category in rows:
+            label = FEEDBACK_LABELS.get(category, 2)
+            try:
+                base_scores = _as_class_scores(np, base.decision_function([title]))[0]
+                if updated.partial_fit(title, label, base_scores):
+                    changed += 1
+            except Exception as e:
+                print(f"Online learning error for '{title}': {e}")
+            updated.last_feedback_id = feedback_id
+
+        if ai_classifier.base_model is not base:
+            return 0 # A retrained model arrived meanwhile; try again next round
+        _corrector = updated
+        ai_classifier.swap_model(OnlineModel(base, updated))
+
+    try:
+        updated.save(ONLINE_MODEL_FILE)
+    except Exception as e:
+        print(f"Error saving online corrections: {e}")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Online learning: {len(rows)} new reports, {changed} changed the model ({elapsed_ms:.0f} ms).")
+    return len(rows)
+
+def _learner_loop():
+    """
+    Utility: The learner thread. Waits for a nudge (or POLL_SECONDS),
+    then applies any new feedback.
+    """
+    while not _stop.is_set():
+        _wakeup.wait(POLL_SECONDS)
+        _wakeup.clear()
+        if _stop.is_set():
+            break
+        ai_classifier.model_ready.wait()
+        try:
+            apply_new_feedback()
+        except Exception as e:
+            print(f"Online learning error: {e}")
+
+def start_online_learning():
+    """
+    Core Logic: Hooks into ai_classifier and starts the learner thread.
+    Called once at app startup (after init_database).
+    """
+    global _thread
+    ai_classifier.set_model_wrapper(_wrap_base_model)
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _thread = threading.Thread(target=_learner_loop, name="flow-online-learner", daemon=True)
+        _thread.start()
+    request_update() # Catch up on reports made since the last run
+
+def request_update():
+    """
+    Utility: Asks the learner to look for new feedback now (e.g. right
+    after the user clicks "Report AI").
+    """
+    _wakeup.set()
+
+def stop_online_learning():
+    """
+    Utility: Stops the learner thread.
+    """
+    _stop.set()
+    _wakeup.set()
+
+def get_online_stats():
+    """
+    Utility: Returns {'updates', 'last_feedback_id'} for the current corrections.
+    """
+    with _lock:
+        if _corrector is None:
+            return {"updates": 0, "last_feedback_id": 0}
+        return {"updates": _corrector.updates, "last_feedback_id": _corrector.last_feedback_id}
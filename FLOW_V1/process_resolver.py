@@ -0,0 +1,138 @@
+# process_resolver.py (v1.1 - Instrumented Lookups)
+
+# --- Imports ---
+import threading  # Reason: The tracker stages look names up from worker threads.
+from collections import OrderedDict  # Reason: An LRU is an OrderedDict in use order.
+import psutil     # Reason: To get the .exe name from a process ID.
+import instrumentation  # Reason: The 'pid_lookup' timing histogram.
+
+# --- Constants ---
+# How many processes to remember. Far more than anyone alt-tabs between;
+# the least recently used one is dropped first.
+MAX_ENTRIES = 256
+
+# --- Core Logic: The Resolver ---
+class ProcessResolver:
+    """
+    Core Logic: A bounded LRU cache of process names.
+    - Entries are keyed by (pid, create_time), so when Windows hands a
+      finished process's PID to a new one, the new one gets its own entry
+      instead of the old name.
+    - resolve(pid) is the "slow" path: it asks the OS for the process's
+      start time (cheap) and only calls name() on a cache miss.
+    - peek(pid) is the "fast" path: it never touches the OS and returns
+      the name last resolved for that PID (or None).
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._names = OrderedDict()  # (pid, create_time) -> name, oldest first
+        self._latest = {}            # pid -> its newest (pid, create_time) key
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "errors": 0,
+                       "peeks": 0, "peek_hits": 0}
+
+    def resolve(self, pid):
+        """
+        Core Logic: The .exe name of 'pid'. Raises psutil's errors (e.g.
+        NoSuchProcess) like psutil.Process(pid).name() would.
+        """
+        with instrumentation.timed("pid_lookup"):
+            return self._resolve(pid)
+
+    def _resolve(self, pid):
+        """
+        Utility: resolve() without the timing.
+        """
+        try:
+            process = psutil.Process(pid)
+            key = (pid, process.create_time())
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+                self._latest.pop(pid, None)
+            raise
+
+        with self._lock:
+            name = self._names.get(key)
+            if name is not None:
+                self._names.move_to_end(key)
+                self._latest[pid] = key
+                self._stats["hits"] += 1
+                return name
+            self._stats["misses"] += 1
+
+        # The slow call happens outside the lock, so peek() never waits on it.
+        try:
+            name = process.name()
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+
+        with self._lock:
+            self._names[key] = name
+            self._names.move_to_end(key)
+            self._latest[pid] = key
+            while len(self._names) > self.max_entries:
+                (old_pid, old_time), _ = self._names.popitem(last=False)
+                if self._latest.get(old_pid) == (old_pid, old_time):
+                    del self._latest[old_pid]
+                self._stats["evictions"] += 1
+        return name
+
+    def peek(self, pid):
+        """
+        Utility: The cached name for 'pid' without asking the OS, or None.
+        (A PID reused since the last resolve() can still show the old name
+        here until the slow path resolves it again.)
+        """
+        with self._lock:
+            self._stats["peeks"] += 1
+            key = self._latest.get(pid)
+            if key is None:
+                return None
+            self._stats["peek_hits"] += 1
+            return self._names.get(key)
+
+    def clear(self):
+        """
+        Utility: Forgets every cached name (the counters are kept).
+        """
+        with self._lock:
+            self._names.clear()
+            self._latest.clear()
+
+    def get_stats(self):
+        """
+        Utility: Returns the counters plus 'size' and the hit rates (0-1).
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._names)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        stats["peek_hit_rate"] = round(stats["peek_hits"] / stats["peeks"], 3) if stats["peeks"] else 0.0
+        return stats
+
+# --- Shared Instance ---
+# One cache for the whole app, so the fast and slow paths share it.
+resolver = ProcessResolver()
+
+def resolve_process_name(pid):
+    """
+    Utility: resolver.resolve(pid) on the shared cache.
+    """
+    return resolver.resolve(pid)
+
+def peek_process_name(pid):
+    """
+    Utility: resolver.peek(pid) on the shared cache.
+    """
+    return resolver.peek(pid)
+
+def get_resolver_stats():
+    """
+    Utility: resolver.get_stats() for the shared cache.
+    """
+    return resolver.get_stats()
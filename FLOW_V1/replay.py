@@ -0,0 +1,368 @@
+# replay.py (v1.1 - Replays Through the Tracker Pipeline)
+
+# --- Imports ---
+import os         # Reason: Scratch database location.
+import sys        # Reason: For the exit code.
+import json       # Reason: Timelines are JSON lines; the report is JSON.
+import time       # Reason: Wall-clock timing and throttling.
+import argparse   # Reason: Command-line options.
+import tempfile   # Reason: A scratch database, so replays never touch flow_data.db.
+from contextlib import contextmanager     # Reason: The virtual clock is swapped in and out.
+from datetime import datetime, timedelta  # Reason: The virtual clock.
+import data_manager        # Reason: The real batched database writer
+import focus_engine        # Reason: The real stats code
+import activity_classifier # Reason: The real classifiers
+import scheduler           # Reason: A sink schedule the replay drives itself
+import tracker_pipeline    # Reason: The real tracker (classify -> sink -> stats)
+import window_sources      # Reason: ScriptedWindowSource feeds the timeline in
+
+# --- Constants ---
+# While one window stays focused, its time is logged in chunks of this
+# many seconds (the tracker's slowest logging interval), so long
+# activities still exercise the live stats and midnight rollover.
+LOG_EVERY_SECONDS = 30.0
+
+# Default replay speed (virtual seconds per real second). 0 = as fast
+# as possible.
+DEFAULT_SPEED = 1000.0
+
+# How long to wait for the tracker to handle one change before giving up.
+SINK_TIMEOUT_SECONDS = 30.0
+
+# --- Timeline Format ---
+# One JSON object per line:
+#   {"t": "2025-11-04T09:00:00", "process": "Code.exe", "title": "main.py - Visual Studio Code"}
+# 't' is an ISO timestamp, or seconds since --start. Each window lasts
+# until the next line's 't'. A line with "process" and "title" both null
+# means "away" (nothing is logged, like Pause); the last line only marks
+# the end of the timeline.
+
+def load_timeline(path, start=None):
+    """
+    Utility: Reads a timeline file into a sorted list of
+    (datetime, process_name, title) tuples.
+    """
+    start = start or datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(hours=9)
+    timeline = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                row = json.loads(line)
+                t = row["t"]
+                t = start + timedelta(seconds=float(t)) if isinstance(t, (int, float)) else datetime.fromisoformat(t)
+            except Exception as e:
+                raise ValueError(f"{path}:{line_no}: bad timeline line ({e})")
+            timeline.append((t, row.get("process"), row.get("title")))
+    timeline.sort(key=lambda row: row[0])
+    return timeline
+
+# --- Core Logic: Virtual Clock ---
+class VirtualClock:
+    """
+    Core Logic: Simulated time. now() is the replay's current time;
+    advance_to() moves it forward and, when 'speed' is set, sleeps just
+    long enough to keep the replay at 'speed' times real time.
+    """
+
+    def __init__(self, start, speed=DEFAULT_SPEED):
+        self.start = start
+        self.speed = speed
+        self._now = start
+        self._wall_start = time.perf_counter()
+
+    def now(self):
+        return self._now
+
+    def advance_to(self, t):
+        if t <= self._now:
+            return
+        self._now = t
+        if self.speed:
+            wall_due = self._wall_start + (t - self.start).total_seconds() / self.speed
+            delay = wall_due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+@contextmanager
+def tracker_clock(clock):
+    """
+    Utility: Makes the tracker pipeline's datetime.now() read 'clock'
+    (like the FakeClock in tests/test_tracker_pipeline.py).
+    """
+    class VirtualDateTime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock.now()
+
+    real_datetime = tracker_pipeline.datetime
+    tracker_pipeline.datetime = VirtualDateTime
+    try:
+        yield
+    finally:
+        tracker_pipeline.datetime = real_datetime
+
+class TimelineProcesses:
+    """
+    Utility: Stands in for the process cache. A timeline already has the
+    process names, so each name gets a made-up PID the pipeline resolves.
+    """
+
+    def __init__(self):
+        self.pids = {}  # process name -> made-up PID
+        self.names = {} # made-up PID -> process name
+
+    def pid_for(self, process_name):
+        if process_name is None:
+            return None
+        if process_name not in self.pids:
+            pid = len(self.pids) + 1
+            self.pids[process_name] = pid
+            self.names[pid] = process_name
+        return self.pids[process_name]
+
+    def resolve(self, pid):
+        return self.names[pid]
+
+    def peek(self, pid):
+        return self.names.get(pid)
+
+    def get_stats(self):
+        return {"size": len(self.names)}
+
+# --- Core Logic: Replay ---
+class Replay:
+    """
+    Core Logic: Feeds a timeline through the real TrackerPipeline, with
+    a ScriptedWindowSource for the windows and the virtual clock as the
+    pipeline's time. Every window change (and every LOG_EVERY_SECONDS
+    while a window stays) is one sink round; the replay waits for each
+    round, then times the group commit that writes it (data_manager.flush).
+    """
+
+    def __init__(self, timeline, speed=DEFAULT_SPEED):
+        self.timeline = timeline
+        self.clock = VirtualClock(timeline[0][0], speed)
+        self.latencies = {"round": [], "log": [], "daily_stats": []}
+        self.processes = TimelineProcesses()
+        self.source = None
+        self.pipeline = None
+
+    def _timed(self, stage, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.latencies[stage].append((time.perf_counter() - started) * 1000)
+        return result
+
+    def _sink_round(self, action, *args):
+        """
+        Utility: Calls action(*args), which makes the sink run once, waits
+        for that round and times its database write.
+        """
+        rounds = self.pipeline.sink_rounds
+        started = time.perf_counter()
+        action(*args)
+        if not self.pipeline.wait_for_sink(rounds, SINK_TIMEOUT_SECONDS):
+            raise RuntimeError("The tracker pipeline stopped handling changes.")
+        self.latencies["round"].append((time.perf_counter() - started) * 1000)
+        self._timed("log", data_manager.flush)
+
+    def _is_focused(self, process_name, title):
+        """
+        Utility: True if the window is already the focused one (then
+        showing it again is not a change, and no round would run).
+        """
+        info = window_sources.WindowInfo(title, None, self.processes.pid_for(process_name))
+        return self.source.current() == info
+
+    def _show(self, process_name, title):
+        self.source.push(title, self.processes.pid_for(process_name))
+
+    def _log_until(self, end):
+        """
+        Utility: Moves the clock to 'end' in LOG_EVERY_SECONDS steps and
+        has the sink log at each step, like its own schedule would.
+        """
+        while self.clock.now() < end:
+            self.clock.advance_to(min(end, self.clock.now() + timedelta(seconds=LOG_EVERY_SECONDS)))
+            self._sink_round(self.pipeline.log_now)
+
+    def _replay_windows(self):
+        paused = False
+        for (t, process_name, title), (next_t, _, _) in zip(self.timeline, self.timeline[1:]):
+            self.clock.advance_to(t)
+            if process_name is None and title is None:
+                if not paused: # Away: Pause, so nothing is logged
+                    self._sink_round(self.pipeline.set_paused, True)
+                    paused = True
+                continue
+            if paused:
+                if not self._is_focused(process_name, title):
+                    self._show(process_name, title)
+                self._sink_round(self.pipeline.set_paused, False)
+                paused = False
+            elif not self._is_focused(process_name, title):
+                self._sink_round(self._show, process_name, title)
+            self._log_until(next_t)
+        self.clock.advance_to(self.timeline[-1][0])
+
+    def run(self):
+        """
+        Core Logic: Replays the whole timeline. Returns the report dict.
+        """
+        wall_start = time.perf_counter()
+        focus_engine.start_live_stats(now=self.clock.now())
+        self.source = window_sources.ScriptedWindowSource()
+        self.source.start()
+        self.pipeline = tracker_pipeline.TrackerPipeline(
+            self.source, activity_classifier.classify_by_title_only, activity_classifier.classify_activity,
+            alerts_enabled=lambda: False, resolver=self.processes)
+        # The replay wakes the sink itself (on virtual time), so its own
+        # schedule never fires and no wakeup cap applies.
+        self.pipeline.schedule = scheduler.AdaptiveScheduler(
+            "replay-sink", min_interval=3600.0, max_interval=3600.0, idle_interval=3600.0)
+        with tracker_clock(self.clock):
+            self.pipeline.start()
+            try:
+                self._replay_windows()
+            finally:
+                self.pipeline.stop()
+                self.source.stop()
+
+        end = self.clock.now()
+        data_manager.flush()
+        daily = self._timed("daily_stats", focus_engine.calculate_daily_stats, now=end)
+        live = focus_engine.get_live_stats(now=end)
+        wall_s = time.perf_counter() - wall_start
+        simulated_s = (end - self.timeline[0][0]).total_seconds()
+        stages = self.pipeline.get_stage_stats()
+        return {
+            "timeline": {"start": self.timeline[0][0].isoformat(), "end": end.isoformat(),
+                         "windows": len(self.timeline) - 1, "simulated_s": simulated_s},
+            "throughput": {
+                "wall_s": round(wall_s, 3),
+                "speedup": round(simulated_s / wall_s, 1) if wall_s else None,
+                "windows_per_s": round((len(self.timeline) - 1) / wall_s, 1) if wall_s else None,
+                "sink_rounds": self.pipeline.sink_rounds,
+                "events_logged": stages["sink"]["count"],
+                "samples_logged": count_samples(),
+            },
+            "latency_ms": {stage: summarize(values) for stage, values in self.latencies.items()},
+            "pipeline_stages": stages,
+            "final_stats": daily,
+            "live_stats": live,
+            "live_matches_daily": live == daily,
+            # What the app would show if "today" came from the real clock
+            # (all zeros when the timeline is from another day).
+            "stats_at_wall_clock": focus_engine.calculate_daily_stats(),
+        }
+
+# --- Utility Functions ---
+def count_samples():
+    """
+    Utility: Every sample in the database (sessions plus activity_log rows).
+    """
+    conn = data_manager.open_read_connection()
+    try:
+        sessions = conn.execute("SELECT COALESCE(SUM(samples), 0) FROM activity_sessions").fetchone()[0]
+        rows = conn.execute("SELECT COUNT(*) FROM activity_log").fetchone()[0]
+        return sessions + rows
+    finally:
+        conn.close()
+
+def summarize(values):
+    """
+    Utility: count / avg / p50 / p95 / max of a list of milliseconds.
+    """
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+    return {"count": len(ordered), "avg": round(sum(ordered) / len(ordered), 4),
+            "p50": pick(0.50), "p95": pick(0.95), "max": round(ordered[-1], 4)}
+
+def replay_file(path, db_file=None, speed=DEFAULT_SPEED, start=None, study=False, use_ai=False):
+    """
+    Core Logic: Replays a timeline file into a (scratch) database and
+    returns the report. Used by the command line and the benchmarks.
+    """
+    timeline = load_timeline(path, start)
+    if len(timeline) < 2:
+        raise ValueError(f"{path}: a timeline needs at least two lines (the last one marks the end).")
+    db_file = db_file or os.path.join(tempfile.mkdtemp(prefix="flow_replay_"), "replay.db")
+    activity_classifier.ai_enabled = use_ai
+    activity_classifier.is_studying = study
+    data_manager.init_database(db_file)
+    try:
+        report = Replay(timeline, speed).run()
+    finally:
+        data_manager.shutdown()
+    report["db_file"] = db_file
+    return report
+
+# --- Feature Logic: Recording ---
+def record(path):
+    """
+    Feature Logic: Records the focused window (process and title) to a
+    timeline file until Ctrl+C. Needs a real window source (Windows).
+    """
+    import window_sources   # Reason: Only recording needs a window source.
+    import process_resolver # Reason: The cached .exe lookup.
+    source = window_sources.create_window_source()
+    version = None
+    count = 0
+    print(f"Recording to '{path}'. Press Ctrl+C to stop.")
+    with open(path, 'a', encoding='utf-8') as f:
+        try:
+            while True:
+                change = source.wait_for_change(version, 5.0)
+                if change is None:
+                    continue
+                version, info = change
+                try:
+                    process_name = process_resolver.resolve_process_name(info.pid) if info.pid else None
+                except Exception:
+                    process_name = None
+                f.write(json.dumps({"t": datetime.now().isoformat(timespec='seconds'),
+                                    "process": process_name, "title": info.title}) + "\n")
+                f.flush()
+                count += 1
+        except KeyboardInterrupt:
+            # The end marker, so the last window gets its duration.
+            f.write(json.dumps({"t": datetime.now().isoformat(timespec='seconds'),
+                                "process": None, "title": None}) + "\n")
+        finally:
+            source.stop()
+    print(f"Recorded {count} window changes.")
+
+def parse_args(argv=None):
+    """
+    Utility: Reads the command-line options.
+    """
+    parser = argparse.ArgumentParser(description="Record and replay FLOW window timelines.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="Record the focused window to a timeline file (Windows).")
+    rec.add_argument("timeline")
+    run = sub.add_parser("run", help="Replay a timeline into a scratch database.")
+    run.add_argument("timeline")
+    run.add_argument("--speed", type=float, default=DEFAULT_SPEED,
+                     help=f"Times real time (default: {DEFAULT_SPEED:g}; 0 = as fast as possible).")
+    run.add_argument("--start", type=datetime.fromisoformat,
+                     help="Start time for timelines with numeric 't' (default: today 09:00).")
+    run.add_argument("--db", help="Database file to replay into (default: a new scratch file).")
+    run.add_argument("--study", action="store_true", help="Replay in Study Mode.")
+    run.add_argument("--ai", action="store_true", help="Use the AI model as the last fallback (off by default).")
+    return parser.parse_args(argv)
+
+# python replay.py run session.jsonl --speed 0
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "record":
+        record(args.timeline)
+        sys.exit(0)
+    report = replay_file(args.timeline, args.db, args.speed, args.start, args.study, args.ai)
+    print(json.dumps(report, indent=2))
+    sys.exit(0)
@@ -0,0 +1,158 @@
+# rule_engine.py (v1.3 - Checked Snapshots)
+
+# --- Imports ---
+# The matcher itself is plain Python.
+import copy             # Reason: Snapshots keep their own copy of the config.
+import time             # Reason: To time each match.
+from types import MappingProxyType  # Reason: A read-only PROCESS_RULES view.
+import instrumentation  # Reason: The 'rule_match' timing histogram.
+import config_manager   # Reason: check_config() (the config's expected shape).
+
+# --- Constants ---
+# The keyword classes a title can match. One title can match several.
+PRODUCTIVE = "productive"
+STUDY = "study"
+DIST_HIGH = "high"
+DIST_MEDIUM = "medium"
+DIST_LOW = "low"
+
+# Keywords this short (e.g. 'os', 'ai') need word boundaries in the
+# "strict" results, so "videos" doesn't count as "os".
+SHORT_KEYWORD_LENGTH = 3
+
+# --- Utility Functions ---
+def _is_word_char(ch):
+    """
+    Utility: Same definition of a "word" character as regex '\\w'.
+    """
+    return ch.isalnum() or ch == "_"
+
+def _is_boundary(text, pos):
+    """
+    Utility: True if regex '\\b' would match at text[pos].
+    """
+    left = pos > 0 and _is_word_char(text[pos - 1])
+    right = pos < len(text) and _is_word_char(text[pos])
+    return left != right
+
+# --- Core Logic: The Automaton ---
+class KeywordAutomaton:
+    """
+    Core Logic: An Aho-Corasick automaton over every keyword in the config.
+    It finds ALL keywords in a title in one left-to-right pass, so the
+    cost depends on the title length, not on how many keywords there are.
+    """
+
+    def __init__(self, labelled_keywords):
+        # Each node is a dict {char: next_node}; node 0 is the root.
+        self.goto = [{}]
+        self.fail = [0]
+        # For each node: the (label, keyword_length) pairs that end there.
+        self.out = [[]]
+
+        for keyword, label in labelled_keywords:
+            if not keyword:
+                continue
+            node = 0
+            for ch in keyword:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                node = nxt
+            self.out[node].append((label, len(keyword)))
+
+        # Breadth-first pass to build the failure links.
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                # A node also "ends" every keyword its failure node ends.
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def search(self, text):
+        """
+        Core Logic: Returns two sets of labels found in 'text':
+        - loose:  any keyword found as a plain substring.
+        - strict: like loose, but short keywords must be whole words.
+        """
+        loose = set()
+        strict = set()
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                end = i + 1
+                for label, length in out[node]:
+                    loose.add(label)
+                    if label in strict:
+                        continue
+                    if (length > SHORT_KEYWORD_LENGTH
+                            or (_is_boundary(text, end - length) and _is_boundary(text, end))):
+                        strict.add(label)
+        return loose, strict
+
+# --- Core Logic: Compiled Rules ---
+class CompiledRules:
+    """
+    Core Logic: Everything the classifiers need from the config, prepared
+    once. Build a new one (with compile_rules) whenever the config changes.
+    A snapshot never changes after it is built (read-only PROCESS_RULES,
+    frozen sets, its own copy of the config), so it can be swapped in
+    with one reference assignment and read from any thread.
+    A config with the wrong shape raises ValueError (see
+    config_manager.check_config) before anything is built.
+    """
+
+    def __init__(self, config, stamp=None):
+        config_manager.check_config(config)
+        distraction_levels = config.get("DISTRACTION_LEVELS", {})
+        labelled = []
+        labelled += [(k, PRODUCTIVE) for k in config.get("PRODUCTIVE_KEYWORDS", [])]
+        labelled += [(k, STUDY) for k in config.get("STUDY_KEYWORDS", [])]
+        labelled += [(k, DIST_HIGH) for k in distraction_levels.get("High", [])]
+        labelled += [(k, DIST_MEDIUM) for k in distraction_levels.get("Medium", [])]
+        labelled += [(k, DIST_LOW) for k in distraction_levels.get("Low", [])]
+
+        self.process_rules = MappingProxyType(dict(config.get("PROCESS_RULES", {})))
+        self.ignore_titles = frozenset(config.get("IGNORE_TITLES", []))
+        self.keyword_count = len(labelled)
+        self.automaton = KeywordAutomaton(labelled)
+        self.config = copy.deepcopy(config) # Later edits to 'config' can't leak in
+        self.stamp = stamp                  # config.json's (mtime_ns, size) when read
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("CompiledRules snapshots are read-only; compile a new one")
+        object.__setattr__(self, name, value)
+
+    def match_title(self, title_low):
+        """
+        Core Logic: Returns (loose, strict) label sets for a lower-cased title.
+        """
+        started = time.perf_counter()
+        result = self.automaton.search(title_low)
+        instrumentation.record("rule_match", time.perf_counter() - started)
+        return result
+
+def compile_rules(config, stamp=None):
+    """
+    Utility: Compiles a config dict into a CompiledRules object.
+    """
+    return CompiledRules(config, stamp)
@@ -0,0 +1,167 @@
+# scheduler.py (v1.2 - Interruptible Cap Wait)
+
+# --- Imports ---
+import sys        # Reason: Idle detection is Windows-only.
+import time       # Reason: To measure intervals and wakeups.
+import threading  # Reason: poke() wakes a sleeping thread early.
+from collections import deque  # Reason: Recent wakeup times, for the cap.
+
+# --- Constants ---
+# The user counts as idle after this long without keyboard/mouse input.
+IDLE_AFTER_SECONDS = 120.0
+
+# --- Utility Function ---
+def get_idle_seconds():
+    """
+    Utility: Seconds since the last keyboard/mouse input (Windows), or
+    None if we can't tell on this platform.
+    """
+    if sys.platform != "win32":
+        return None
+    try:
+        import ctypes # Reason: GetLastInputInfo has no pywin32 wrapper we use.
+
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+        info = LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+        if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+            return None
+        # Both are milliseconds since boot (32-bit, so they wrap together).
+        elapsed_ms = (ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+        return elapsed_ms / 1000.0
+    except Exception:
+        return None
+
+# --- Core Logic: Adaptive Scheduler ---
+class AdaptiveScheduler:
+    """
+    Core Logic: Decides how long a polling thread sleeps between wakeups.
+    - mark_changed(): something changed, so go back to 'min_interval'.
+    - mark_stable(): nothing changed, so back off ('backoff' times longer,
+      up to 'max_interval').
+    - While the user is idle, sleep 'idle_interval'.
+    - Never wake more than 'max_wakeups_per_minute' times a minute.
+    - poke() wakes the thread early (e.g. the focused window changed).
+    - interrupt() ends the current wait() at once, even inside the cap
+      (e.g. to stop the thread).
+    """
+
+    def __init__(self, name, min_interval, max_interval, backoff=1.5,
+                 idle_interval=None, max_wakeups_per_minute=None):
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.idle_interval = idle_interval or max_interval
+        self.max_wakeups_per_minute = max_wakeups_per_minute
+        self.interval = min_interval
+        self.idle = False
+        self._poked = threading.Event()
+        self._interrupted = False
+        self._wakeups = deque() # monotonic times of the last minute's wakeups
+        self._lock = threading.Lock()
+        _schedulers.append(self)
+
+    def mark_changed(self):
+        """
+        Utility: Activity changed; poll quickly again.
+        """
+        self.interval = self.min_interval
+
+    def mark_stable(self):
+        """
+        Utility: Nothing changed; poll a bit less often.
+        """
+        self.interval = min(self.max_interval, self.interval * self.backoff)
+
+    def poke(self):
+        """
+        Utility: Wakes the thread now (and resets to the fast interval).
+        """
+        self.mark_changed()
+        self._poked.set()
+
+    def next_delay(self):
+        """
+        Core Logic: How long the next sleep should be, in seconds.
+        """
+        idle_seconds = get_idle_seconds()
+        self.idle = idle_seconds is not None and idle_seconds >= IDLE_AFTER_SECONDS
+        delay = self.idle_interval if self.idle else self.interval
+        return max(delay, self.cap_delay())
+
+    def cap_delay(self):
+        """
+        Utility: How long until another wakeup is allowed by the cap.
+        """
+        if not self.max_wakeups_per_minute:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            while self._wakeups and now - self._wakeups[0] >= 60.0:
+                self._wakeups.popleft()
+            if len(self._wakeups) < self.max_wakeups_per_minute:
+                return 0.0
+            return 60.0 - (now - self._wakeups[0])
+
+    def wait(self):
+        """
+        Core Logic: Sleeps for next_delay() or until poke(). Returns True
+        if it was woken early by poke(). A poke never breaks the cap.
+        """
+        poked = self._poked.wait(self.next_delay())
+        self._poked.clear()
+        if poked:
+            # Over the cap: wait out the rest of it on the same event, so
+            # interrupt() can still end it. Pokes meanwhile fold into this one.
+            while not self._interrupted:
+                cap_delay = self.cap_delay()
+                if cap_delay <= 0:
+                    break
+                self._poked.wait(cap_delay)
+                self._poked.clear()
+        self._interrupted = False
+        self.record_wakeup()
+        return poked
+
+    def interrupt(self):
+        """
+        Utility: Ends the current (or next) wait() right away, cap or not.
+        """
+        self._interrupted = True
+        self._poked.set()
+
+    def record_wakeup(self):
+        """
+        Utility: Counts a wakeup towards the cap. wait() does this itself;
+        callers that sleep on their own (e.g. asyncio) call it directly.
+        """
+        with self._lock:
+            self._wakeups.append(time.monotonic())
+
+    def get_rates(self):
+        """
+        Utility: The effective rates: current interval, idle state and
+        wakeups in the last minute.
+        """
+        self.cap_delay() # Drops wakeups older than a minute
+        with self._lock:
+            wakeups = len(self._wakeups)
+        return {
+            "name": self.name,
+            "interval_s": round(self.interval, 3),
+            "idle": self.idle,
+            "wakeups_last_minute": wakeups,
+            "max_wakeups_per_minute": self.max_wakeups_per_minute,
+        }
+
+# Every scheduler that was created, for get_effective_rates().
+_schedulers = []
+
+def get_effective_rates():
+    """
+    Utility: Returns get_rates() for every scheduler (for diagnostics).
+    """
+    return [s.get_rates() for s in _schedulers]
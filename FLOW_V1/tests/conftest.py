@@ -0,0 +1,8 @@
+# conftest.py - Lets the tests import the FLOW_V1 modules (flat imports, like the app).
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+# The app reads config.json and its model files from the working directory.
+os.chdir(APP_DIR)
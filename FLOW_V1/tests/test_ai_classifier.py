@@ -0,0 +1,113 @@
+# test_ai_classifier.py - The prediction cache and the batch API.
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import make_pipeline
+from sklearn.svm import LinearSVC
+
+import ai_classifier
+import ai_trainer
+
+class CountingModel:
+    """
+    Utility: A stand-in model: 1 if the title mentions code, else 0
+    (or always 'answer'). Records every predict() call.
+    """
+
+    def __init__(self, answer=None):
+        self.answer = answer
+        self.calls = []
+
+    def predict(self, titles):
+        self.calls.append(list(titles))
+        if self.answer is not None:
+            return np.array([self.answer] * len(titles))
+        return np.array([1 if "code" in title.lower() else 0 for title in titles])
+
+@pytest.fixture
+def model(monkeypatch):
+    """
+    Utility: An empty cache and a CountingModel as the loaded model.
+    """
+    monkeypatch.setattr(ai_classifier, "_cache", OrderedDict())
+    monkeypatch.setattr(ai_classifier, "_cache_stats",
+                        {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0})
+    monkeypatch.setattr(ai_classifier, "_load_thread", object()) # No background load
+    counting = CountingModel()
+    monkeypatch.setattr(ai_classifier, "ai_model", counting)
+    return counting
+
+def test_normalized_titles_share_one_entry(model):
+    assert ai_classifier.predict_category("VS Code -  main.py") == 1
+    assert ai_classifier.predict_category("  vs code - MAIN.PY ") == 1
+    assert ai_classifier.predict_category("vs\tcode - main.py") == 1
+    assert len(model.calls) == 1
+    stats = ai_classifier.get_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+
+def test_least_recently_used_title_is_evicted(model, monkeypatch):
+    monkeypatch.setattr(ai_classifier, "CACHE_SIZE", 3)
+    for title in ["a code", "b", "c"]:
+        ai_classifier.predict_category(title)
+    ai_classifier.predict_category("a code") # Now the most recently used
+    ai_classifier.predict_category("d")      # Evicts "b"
+    assert list(ai_classifier._cache) == ["c", "a code", "d"]
+    assert ai_classifier.get_cache_stats()["evictions"] == 1
+
+    calls = len(model.calls)
+    ai_classifier.predict_category("a code")
+    assert len(model.calls) == calls     # Still cached
+    ai_classifier.predict_category("b")
+    assert len(model.calls) == calls + 1 # Asked the model again
+
+def test_swapping_the_model_empties_the_cache(model):
+    assert ai_classifier.predict_category("Some Game") == 0
+    ai_classifier.swap_model(CountingModel(answer=2))
+    assert ai_classifier.get_cache_stats()["size"] == 0
+    assert ai_classifier.predict_category("Some Game") == 2
+    assert ai_classifier.get_cache_stats()["invalidations"] == 1
+
+def test_answer_from_a_replaced_model_is_not_cached(model):
+    class SwappingModel(CountingModel):
+        def predict(self, titles):
+            ai_classifier.swap_model(CountingModel(answer=2)) # A reload finishes mid-prediction
+            return super().predict(titles)
+
+    ai_classifier.swap_model(SwappingModel())
+    assert ai_classifier.predict_category("Some Game") == 0
+    assert ai_classifier.get_cache_stats()["size"] == 0
+    assert ai_classifier.predict_category("Some Game") == 2
+
+def test_batch_uses_the_cache_and_one_model_call(model):
+    ai_classifier.predict_category("main.py - VS Code")
+    calls = len(model.calls)
+    titles = ["main.py - vs code", "Game", "game ", "Docs", "GAME"]
+    assert ai_classifier.predict_category_batch(titles) == [1, 0, 0, 0, 0]
+    assert model.calls[calls:] == [["game", "docs"]] # Each unseen title once
+    assert ai_classifier.predict_category("Docs") == 0
+    assert len(model.calls) == calls + 1 # Batch answers were cached
+
+def test_batch_without_a_model(model, monkeypatch):
+    monkeypatch.setattr(ai_classifier, "ai_model", None)
+    assert ai_classifier.predict_category_batch(["a", "b"]) == [None, None]
+    assert ai_classifier.decision_scores_batch(["a"]) is None
+
+def test_batch_matches_single_predictions(model, tmp_path):
+    data = ai_trainer.TRAIN_DATA
+    pipeline = make_pipeline(TfidfVectorizer(analyzer='word', ngram_range=(1, 3)), LinearSVC(dual=False))
+    pipeline.fit([t for t, _ in data], [l for _, l in data])
+    path = str(tmp_path / "model.npz")
+    ai_trainer.export_linear_model(pipeline, path)
+    ai_classifier.swap_model(ai_classifier.LinearTextScorer(path))
+
+    titles = [t for t, _ in data[:40]] + ["Unknown window", "", "PYTHON   tutorial", "python tutorial",
+                                         "Minecraft - LECTURE", "minecraft:lecture"]
+    batch = ai_classifier.predict_category_batch(titles)
+    ai_classifier.clear_cache()
+    single = [ai_classifier.predict_category(title) for title in titles]
+    assert batch == single == list(pipeline.predict(titles))
+
+    scores = ai_classifier.decision_scores_batch(titles)
+    np.testing.assert_allclose(scores, pipeline.decision_function(titles), rtol=1e-9, atol=1e-9)
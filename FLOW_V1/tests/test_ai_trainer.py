@@ -0,0 +1,55 @@
+# test_ai_trainer.py - The NumPy export must score exactly like the scikit-learn pipeline.
+import os
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import make_pipeline
+from sklearn.svm import LinearSVC
+
+import ai_trainer
+from ai_classifier import LinearTextScorer
+
+# Unseen titles too: unknown words, repeats, punctuation and an empty title.
+UNSEEN = ["Python Python tutorial - YouTube", "Unknown window", "", "minecraft: LECTURE!!",
+          "Settings - Control Panel", "docs docs docs"]
+
+def fit(labels):
+    titles = [title for title, _ in ai_trainer.TRAIN_DATA if _ in labels]
+    y = [label for _, label in ai_trainer.TRAIN_DATA if label in labels]
+    model = make_pipeline(TfidfVectorizer(analyzer='word', ngram_range=(1, 3)), LinearSVC(dual=False))
+    model.fit(titles, y)
+    return model, titles
+
+@pytest.mark.parametrize("labels", [(0, 1), (0, 1, 2)], ids=["binary", "three-class"])
+def test_export_matches_pipeline(tmp_path, labels):
+    model, titles = fit(labels)
+    path = str(tmp_path / "model.npz")
+    ai_trainer.export_linear_model(model, path)
+    scorer = LinearTextScorer(path)
+
+    check = titles + UNSEEN
+    assert list(scorer.predict(check)) == list(model.predict(check))
+    np.testing.assert_allclose(scorer.decision_function(check), model.decision_function(check),
+                               rtol=1e-9, atol=1e-9)
+
+def test_checked_export_keeps_a_matching_export(tmp_path):
+    model, titles = fit((0, 1, 2))
+    path = str(tmp_path / "model.npz")
+    assert ai_trainer.export_checked_linear_model(model, path, titles)
+    assert os.path.exists(path)
+
+def test_checked_export_warns_and_deletes_on_mismatch(tmp_path, monkeypatch, capsys):
+    class WrongScorer(LinearTextScorer):
+        def decision_function(self, titles):
+            return super().decision_function(titles) + 1.0
+
+        def predict(self, titles):
+            return np.full(len(titles), -1)
+
+    monkeypatch.setattr(ai_trainer, "LinearTextScorer", WrongScorer)
+    model, titles = fit((0, 1, 2))
+    path = str(tmp_path / "model.npz")
+    assert not ai_trainer.export_checked_linear_model(model, path, titles)
+    assert not os.path.exists(path)
+    assert "WARNING: NumPy export parity check failed" in capsys.readouterr().out
@@ -0,0 +1,35 @@
+# test_benchmark.py - compare() and where the benchmark finds the model.
+import os
+
+import ai_classifier
+import benchmark
+import model_registry
+
+OLD = {"meta": {"quick": True},
+       "predict_category": {"available": True, "cold_us": 100.0, "warm_us": 2.0},
+       "log_event": {"sessions": {"events": 2000, "committed_per_s": 50000}}}
+
+def test_compare_reports_regressions_and_missing_metrics(capsys):
+    new = {"meta": {"quick": True},
+           "predict_category": {"available": False},                    # Skipped: no model
+           "log_event": {"sessions": {"events": 4000, "committed_per_s": 40000}}} # 20% slower
+    assert benchmark.compare(OLD, new) == ["predict_category.cold_us", "predict_category.warm_us",
+                                           "log_event.sessions.committed_per_s"]
+    out = capsys.readouterr().out
+    assert "not measured" in out and "3 regression(s)" in out
+
+def test_compare_passes_within_the_threshold():
+    new = {"predict_category": {"available": True, "cold_us": 105.0, "warm_us": 1.0},
+           "log_event": {"sessions": {"events": 1, "committed_per_s": 60000}}}
+    assert benchmark.compare(OLD, new) == []
+
+def test_model_files_are_found_from_the_script(tmp_path, monkeypatch):
+    for module, name in [(ai_classifier, "LINEAR_MODEL_FILE"), (ai_classifier, "MODEL_FILE"),
+                         (model_registry, "MODELS_DIR"), (model_registry, "REGISTRY_FILE")]:
+        monkeypatch.setattr(module, name, getattr(module, name))
+    monkeypatch.chdir(tmp_path)
+    benchmark.use_app_model_files()
+    app_dir = os.path.dirname(os.path.abspath(benchmark.__file__))
+    assert ai_classifier.LINEAR_MODEL_FILE == os.path.join(app_dir, "ai_model.npz")
+    assert model_registry.REGISTRY_FILE == os.path.join(app_dir, "models", "registry.json")
+    assert os.path.dirname(ai_classifier.get_model_path()) in (app_dir, os.path.join(app_dir, "models"))
@@ -0,0 +1,71 @@
+# test_config_reload.py - Hot-reload must never replace working rules with a broken config.
+import json
+import time
+
+import pytest
+
+import activity_classifier
+import config_manager
+import rule_engine
+
+def write_config(path, config):
+    with open(path, 'w') as f:
+        json.dump(config, f)
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the config watcher")
+        time.sleep(0.01)
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "config.json")
+    monkeypatch.setattr(config_manager, "CONFIG_FILE", path)
+    monkeypatch.setattr(activity_classifier, "CONFIG_CHECK_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(activity_classifier, "ai_enabled", False)
+    original = activity_classifier.current_rules
+    yield path
+    activity_classifier.current_rules = original
+    activity_classifier.current_config = original.config
+
+@pytest.mark.parametrize("key, value", [
+    ("PRODUCTIVE_KEYWORDS", None),
+    ("STUDY_KEYWORDS", "lecture"),
+    ("IGNORE_TITLES", [1, 2]),
+    ("DISTRACTION_LEVELS", ["porn"]),
+    ("DISTRACTION_LEVELS", {"High": None}),
+    ("PROCESS_RULES", {"Code.exe": 1}),
+    ("PROCESS_RULES", None),
+])
+def test_bad_shapes_are_rejected(config_file, key, value):
+    config = dict(config_manager.get_default_config(), **{key: value})
+    write_config(config_file, config)
+    with pytest.raises(ValueError):
+        config_manager.read_config_file()
+    with pytest.raises(ValueError):
+        rule_engine.compile_rules(config)
+
+def test_watcher_keeps_rules_and_survives_a_bad_config(config_file, capsys):
+    good = config_manager.get_default_config()
+    good["PRODUCTIVE_KEYWORDS"].append("zzqgood")
+    write_config(config_file, good)
+    activity_classifier.reload_config(good, config_manager.get_config_stamp())
+    activity_classifier.start_config_watcher()
+    assert activity_classifier.classify_by_title_only("zzqgood page") == "Productive"
+
+    # Valid JSON, wrong shape: reported once, old rules stay active.
+    rules_before = activity_classifier.current_rules
+    write_config(config_file, dict(good, PRODUCTIVE_KEYWORDS=None))
+    wait_until(lambda: "couldn't be used" in capsys.readouterr().out)
+    time.sleep(0.3)
+    assert "couldn't be used" not in capsys.readouterr().out # Not retried
+    assert activity_classifier.current_rules is rules_before
+    assert activity_classifier.classify_by_title_only("zzqgood page") == "Productive"
+
+    # The watcher is still alive: a fixed file is picked up.
+    fixed = dict(good, PRODUCTIVE_KEYWORDS=good["PRODUCTIVE_KEYWORDS"] + ["zzqfixed"])
+    write_config(config_file, fixed)
+    wait_until(lambda: activity_classifier.classify_by_title_only("zzqfixed page") == "Productive")
+    assert activity_classifier._watch_thread.is_alive()
@@ -0,0 +1,133 @@
+# test_flow_daemon.py - The headless daemon's sinks and command-line options.
+import json
+import socket
+import time
+import types
+
+import pytest
+
+import activity_classifier
+import data_manager
+import flow_daemon
+
+STATS = {"score": 80, "prod_time_s": 400, "dist_time_s": 100, "neut_time_s": 20, "predicted_score": 75}
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the socket sink")
+        time.sleep(0.01)
+
+def read_lines(sock, count):
+    """
+    Utility: Reads 'count' JSON lines from a client socket.
+    """
+    data = b""
+    sock.settimeout(5.0)
+    while data.count(b"\n") < count:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return [json.loads(line) for line in data.splitlines()[:count]]
+
+def test_records():
+    assert flow_daemon.make_record('-UNKNOWN-', None) is None
+    record = flow_daemon.make_record('-DISTRACTION_EVENT-', ("Distraction-High", "YouTube"))
+    assert (record["type"], record["category"], record["title"]) == ("distraction", "Distraction-High", "YouTube")
+    record = flow_daemon.make_record('-STATS_UPDATE-', STATS)
+    assert record["type"] == "stats" and record["score"] == 80
+
+def test_stdout_and_json_sinks(tmp_path, capsys):
+    stdout_sink = flow_daemon.StdoutSink()
+    stdout_sink('-STATS_UPDATE-', STATS)
+    stdout_sink('-UPDATE_APP-', "main.py - Visual Studio Code")
+    stdout_sink('-UNKNOWN-', "ignored")
+    out = capsys.readouterr().out.splitlines()
+    assert len(out) == 2
+    assert "Score 80% | Productive 400s" in out[0] and out[1].endswith("main.py - Visual Studio Code")
+
+    path = str(tmp_path / "stats.jsonl")
+    json_sink = flow_daemon.JsonSink(path)
+    json_sink('-STATS_UPDATE-', STATS)
+    json_sink('-UPDATE_APP-', "Notepad")
+    json_sink.close()
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [r["type"] for r in records] == ["stats", "activity"]
+    assert records[1]["value"] == "Notepad"
+
+@pytest.fixture
+def socket_sink():
+    sink = flow_daemon.SocketSink(port=0)
+    yield sink
+    sink.close()
+
+def connect(sink):
+    client = socket.create_connection(("127.0.0.1", sink.port))
+    wait_until(lambda: len(sink.clients) >= 1)
+    return client
+
+def test_socket_sink_sends_latest_stats_then_records(socket_sink):
+    socket_sink('-STATS_UPDATE-', STATS)
+    client = connect(socket_sink)
+    socket_sink('-UPDATE_APP-', "Notepad")
+    records = read_lines(client, 2)
+    assert [r["type"] for r in records] == ["stats", "activity"]
+    client.close()
+
+def test_socket_sink_drops_a_slow_client_without_blocking(socket_sink, monkeypatch):
+    monkeypatch.setattr(flow_daemon, "CLIENT_QUEUE_SIZE", 4)
+    slow = socket.socket()
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    slow.connect(("127.0.0.1", socket_sink.port)) # Never reads
+    wait_until(lambda: len(socket_sink.clients) == 1)
+    fast = connect(socket_sink)
+    wait_until(lambda: len(socket_sink.clients) == 2)
+
+    big_title = "x" * 256 * 1024
+    started = time.monotonic()
+    for _ in range(100):
+        socket_sink('-UPDATE_APP-', big_title)
+        fast.settimeout(5.0)
+        read_lines(fast, 1) # Keeps up
+    assert time.monotonic() - started < 10.0 # Not stuck behind the slow client
+    assert len(socket_sink.clients) == 1     # The slow one was dropped
+    socket_sink('-UPDATE_APP-', "Notepad")
+    assert read_lines(fast, 1)[0]["value"] == "Notepad"
+    fast.close()
+    slow.close()
+
+def test_parse_args():
+    args = flow_daemon.parse_args([])
+    assert (args.sink, args.port, args.window_source, args.study, args.no_ai) == (
+        "stdout", flow_daemon.DEFAULT_SOCKET_PORT, "auto", False, False)
+    args = flow_daemon.parse_args(["--sink", "json", "--json-file", "out.jsonl", "--port", "9000",
+                                   "--window-source", "scripted", "--db", "x.db", "--study", "--no-ai",
+                                   "--diagnostics-file", "diag.json"])
+    assert (args.sink, args.json_file, args.port, args.window_source, args.db, args.study, args.no_ai,
+            args.diagnostics_file) == ("json", "out.jsonl", 9000, "scripted", "x.db", True, True, "diag.json")
+    with pytest.raises(SystemExit):
+        flow_daemon.parse_args(["--sink", "carrier-pigeon"])
+
+def test_run_applies_the_options(tmp_path, monkeypatch):
+    monkeypatch.setattr(activity_classifier, "ai_enabled", activity_classifier.ai_enabled)
+    monkeypatch.setattr(activity_classifier, "is_studying", activity_classifier.is_studying)
+
+    def stop(seconds):
+        raise KeyboardInterrupt # Ctrl+C as soon as run() starts waiting
+    monkeypatch.setattr(flow_daemon, "time", types.SimpleNamespace(sleep=stop))
+
+    args = flow_daemon.parse_args(["--sink", "json", "--json-file", str(tmp_path / "out.jsonl"),
+                                   "--window-source", "scripted", "--db", str(tmp_path / "flow_test.db"),
+                                   "--study", "--no-ai", "--diagnostics-file", str(tmp_path / "diag.json")])
+    try:
+        assert flow_daemon.run(args) == 0
+    finally:
+        data_manager.shutdown()
+    assert not activity_classifier.ai_enabled
+    assert activity_classifier.is_studying
+    assert (tmp_path / "flow_test.db").exists()
+    with open(tmp_path / "diag.json", encoding='utf-8') as f:
+        assert isinstance(json.load(f), dict)
@@ -0,0 +1,64 @@
+# test_instrumentation.py - Per-thread shards merge into one histogram per stage.
+import json
+import threading
+
+import pytest
+
+import instrumentation
+
+@pytest.fixture(autouse=True)
+def fresh_shards(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_shards", [])
+    monkeypatch.setattr(instrumentation, "_local", threading.local())
+    monkeypatch.setattr(instrumentation, "_providers", {})
+    monkeypatch.setattr(instrumentation, "enabled", True)
+
+def record_in_thread(stage, seconds, times):
+    thread = threading.Thread(target=lambda: [instrumentation.record(stage, seconds) for _ in range(times)])
+    thread.start()
+    thread.join()
+
+def test_shards_merge_with_percentiles():
+    record_in_thread("stage", 3e-6, 90)   # <=5us
+    record_in_thread("stage", 150e-6, 9)  # <=200us
+    instrumentation.record("stage", 10.0) # Over the last bound
+    record_in_thread("other", 1e-3, 1)
+    assert len(instrumentation._shards) == 4 # One per thread
+
+    snapshot = instrumentation.get_snapshot()
+    stage = snapshot["stage"]
+    assert stage["count"] == 100
+    assert stage["avg_us"] == pytest.approx((90 * 3 + 9 * 150 + 10e6) / 100, abs=0.01)
+    assert stage["max_us"] == 10e6
+    assert (stage["p50_us"], stage["p95_us"], stage["p99_us"]) == (5, 200, 200)
+    assert stage["histogram"] == {"<=5us": 90, "<=200us": 9, ">5000000us": 1}
+    assert snapshot["other"]["count"] == 1 and snapshot["other"]["p50_us"] == 1000
+
+def test_overflow_percentile_is_none():
+    instrumentation.record("slow", 10.0)
+    assert instrumentation.get_snapshot()["slow"]["p99_us"] is None
+
+def test_timed_records_even_on_error_and_can_be_disabled():
+    with pytest.raises(ValueError):
+        with instrumentation.timed("block"):
+            raise ValueError
+    assert instrumentation.get_snapshot()["block"]["count"] == 1
+
+    instrumentation.enabled = False
+    with instrumentation.timed("block"):
+        pass
+    assert instrumentation.get_snapshot()["block"]["count"] == 1
+
+    instrumentation.reset()
+    assert instrumentation.get_snapshot() == {}
+
+def test_dump_includes_providers(tmp_path):
+    instrumentation.record("stage", 1e-3)
+    instrumentation.add_provider("cache", lambda: {"hits": 3})
+    instrumentation.add_provider("broken", lambda: 1 / 0)
+    path = instrumentation.dump_json(str(tmp_path / "diagnostics.json"))
+    with open(path, encoding='utf-8') as f:
+        diagnostics = json.load(f)
+    assert diagnostics["stages"]["stage"]["count"] == 1
+    assert diagnostics["cache"] == {"hits": 3}
+    assert "division by zero" in diagnostics["broken"]["error"]
@@ -0,0 +1,70 @@
+# test_legacy_database.py - Databases from before sessions/rollups must still give the same stats.
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import data_manager
+import focus_engine
+
+DAY = datetime(2025, 11, 4)
+
+# (minutes after 09:00, category) - one row per 5 s sample, like the original tracker.
+LEGACY_ROWS = ([(i * 5, "Productive") for i in range(40)]
+               + [(200 + i * 5, "Productive (AI)") for i in range(6)]
+               + [(300 + i * 5, "Studying") for i in range(10)]
+               + [(400 + i * 5, "Distraction-High") for i in range(15)]
+               + [(500 + i * 5, "Distraction-Low") for i in range(3)]
+               + [(600 + i * 5, "Neutral") for i in range(7)]
+               + [(700 + i * 5, "Idle") for i in range(4)])
+
+def baseline_stats(rows):
+    """
+    Utility: The original (pandas) calculate_daily_stats, on plain rows.
+    """
+    categories = [category for _, category in rows]
+    good = sum(c in ("Productive", "Productive (AI)", "Studying") for c in categories)
+    dist = sum(c.startswith("Distraction-") for c in categories)
+    neut = sum(c == "Neutral" for c in categories)
+    focus = good + dist
+    return {
+        "score": int(good / focus * 100) if focus else 0,
+        "prod_time_s": int(good * data_manager.POLL_INTERVAL_SECONDS),
+        "dist_time_s": int(dist * data_manager.POLL_INTERVAL_SECONDS),
+        "neut_time_s": int(neut * data_manager.POLL_INTERVAL_SECONDS),
+        "predicted_score": int(focus_engine.calculate_predicted_score(good, focus)),
+    }
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """
+    Utility: A database with only the original 'activity_log' table, set
+    as the current one WITHOUT calling init_database().
+    """
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            category TEXT NOT NULL,
+            app_name TEXT
+        )""")
+    conn.executemany("INSERT INTO activity_log (timestamp, category, app_name) VALUES (?, ?, ?)",
+                     [(DAY.replace(hour=9) + timedelta(seconds=s), c, "Some Window") for s, c in LEGACY_ROWS])
+    conn.commit()
+    conn.close()
+    data_manager.shutdown()
+    monkeypatch.setattr(data_manager, "DB_FILE", path)
+    yield path
+    data_manager.shutdown()
+
+def test_daily_stats_match_baseline(legacy_db):
+    assert focus_engine.calculate_daily_stats(now=DAY.replace(hour=18)) == baseline_stats(LEGACY_ROWS)
+
+def test_live_stats_and_history_match_baseline(legacy_db):
+    expected = baseline_stats(LEGACY_ROWS)
+    focus_engine.start_live_stats(now=DAY.replace(hour=18))
+    assert focus_engine.get_live_stats(now=DAY.replace(hour=18)) == expected
+    assert focus_engine.get_weekly_stats(now=DAY + timedelta(days=1)) == [
+        {"date": "2025-11-04", "score": expected["score"], "prod_time_s": expected["prod_time_s"]}]
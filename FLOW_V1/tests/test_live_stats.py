@@ -0,0 +1,74 @@
+# test_live_stats.py - The live totals must equal the stats read back from the sessions.
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import data_manager
+import focus_engine
+
+DAY = datetime(2026, 3, 10)
+POLL = data_manager.POLL_INTERVAL_SECONDS
+CODE = "main.py - Visual Studio Code"
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "flow_test.db")
+    data_manager.init_database(path)
+    yield path
+    data_manager.shutdown()
+
+def at(hour, minute=0, second=0):
+    return DAY.replace(hour=hour, minute=minute, second=second)
+
+def test_live_stats_match_extended_sessions(db):
+    focus_engine.start_live_stats(now=at(9))
+    data_manager.log_event("Productive", CODE, 12, at(9))
+    data_manager.log_event("Productive", CODE, 1, at(9, 1, 7))           # Late by 7 s: the gap is bridged
+    data_manager.log_event("Productive", CODE, 3, at(9, 1, 10))          # Overlaps the last sample
+    data_manager.log_event("Distraction-High", "YouTube", 6, at(9, 2))
+    data_manager.log_event("Distraction-High", "YouTube", 2, at(9, 2, 38)) # Bridged again
+    data_manager.log_event("Neutral", "Explorer", 4, at(9, 5))
+    data_manager.log_event("Productive", CODE, 2, at(23, 59, 50))
+    data_manager.flush()
+
+    conn = sqlite3.connect(db)
+    try:
+        sessions = conn.execute("SELECT start_time, end_time, samples FROM activity_sessions ORDER BY id").fetchall()
+        rollup = conn.execute("SELECT SUM(seconds) FROM daily_rollup WHERE date = '2026-03-10'").fetchone()[0]
+    finally:
+        conn.close()
+    # The first session spans 85 s of wall time for 16 samples (80 s).
+    assert sessions[0] == ("2026-03-10 09:00:00", "2026-03-10 09:01:25", 16)
+
+    live = focus_engine.get_live_stats(now=at(23, 59, 59))
+    assert live == focus_engine.calculate_daily_stats(now=at(23, 59, 59))
+    assert (live["prod_time_s"], live["dist_time_s"], live["neut_time_s"]) == (18 * POLL, 8 * POLL, 4 * POLL)
+    assert rollup == (18 + 8 + 4) * POLL
+
+    data_manager.log_event("Productive", CODE, 3, at(23, 59, 59) + timedelta(seconds=1)) # A new day: a new session
+    data_manager.flush()
+    tomorrow = DAY + timedelta(days=1, hours=1)
+    assert focus_engine.get_live_stats(now=tomorrow) == focus_engine.calculate_daily_stats(now=tomorrow)
+    assert focus_engine.get_live_stats(now=tomorrow)["prod_time_s"] == 3 * POLL
+
+def test_old_view_is_replaced_and_rollup_rebuilt(db):
+    data_manager.log_event("Productive", CODE, 1, at(9))
+    data_manager.log_event("Productive", CODE, 1, at(9, 0, 12)) # Bridged: 17 s of wall time
+    data_manager.flush()
+    data_manager.shutdown()
+
+    # The view (and rollup) as an older version left them.
+    conn = sqlite3.connect(db)
+    conn.execute("DROP VIEW activity_intervals")
+    conn.execute("""CREATE VIEW activity_intervals AS
+        SELECT start_time, end_time, category, app_name, samples,
+               ROUND((julianday(end_time) - julianday(start_time)) * 86400.0, 3) AS duration_s
+        FROM activity_sessions""")
+    conn.execute("UPDATE daily_rollup SET seconds = 17")
+    conn.commit()
+    conn.close()
+
+    data_manager.init_database(db)
+    assert focus_engine.calculate_daily_stats(now=at(10))["prod_time_s"] == 2 * POLL
+    assert focus_engine.get_weekly_stats(now=DAY + timedelta(days=1))[0]["prod_time_s"] == 2 * POLL
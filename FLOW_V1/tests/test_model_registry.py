@@ -0,0 +1,95 @@
+# test_model_registry.py - Registered versions, rollback and the background hot-swap.
+import os
+import threading
+import time
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import make_pipeline
+from sklearn.svm import LinearSVC
+
+import ai_classifier
+import ai_trainer
+import data_manager
+import model_registry
+import online_learner
+
+PROBE = "zzq quarterly planning"
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the model watcher")
+        time.sleep(0.02)
+
+def export_model(path, probe_label):
+    """
+    Utility: A small three-class model whose answer for PROBE is 'probe_label'.
+    """
+    data = [(title, label) for title, label in ai_trainer.TRAIN_DATA]
+    data += [(PROBE, probe_label), ("zzq quarterly", probe_label), ("zzq planning", probe_label)] * 3
+    model = make_pipeline(TfidfVectorizer(analyzer='word', ngram_range=(1, 3)), LinearSVC(dual=False))
+    model.fit([t for t, _ in data], [l for _, l in data])
+    ai_trainer.export_linear_model(model, path)
+    return path
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    models_dir = str(tmp_path / "models")
+    monkeypatch.setattr(model_registry, "MODELS_DIR", models_dir)
+    monkeypatch.setattr(model_registry, "REGISTRY_FILE", os.path.join(models_dir, "registry.json"))
+    monkeypatch.setattr(online_learner, "ONLINE_MODEL_FILE", str(tmp_path / "ai_online.npz"))
+    monkeypatch.setattr(online_learner, "_corrector", None)
+    monkeypatch.setattr(ai_classifier, "MODEL_CHECK_INTERVAL_SECONDS", 0.05)
+    # A fresh classifier: nothing loaded, no wrapper.
+    for name, value in [("ai_model", None), ("base_model", None), ("_model_path", None),
+                        ("_model_mtime", None), ("_last_failed", None), ("model_info", {}),
+                        ("_model_wrapper", None), ("model_ready", threading.Event())]:
+        monkeypatch.setattr(ai_classifier, name, value)
+    data_manager.init_database(str(tmp_path / "flow_test.db"))
+    yield tmp_path
+    data_manager.shutdown()
+
+def test_register_and_rollback(registry):
+    v1 = model_registry.register_model(export_model(str(registry / "a.npz"), 1), 100, 0.9, feedback_max_id=1)
+    v2 = model_registry.register_model(export_model(str(registry / "b.npz"), 0), 120, 0.9, feedback_max_id=3)
+    assert (v1, v2) == ("v1", "v2")
+    assert model_registry.get_active_entry()["version"] == "v2"
+    assert model_registry.rollback()
+    assert model_registry.get_active_entry()["version"] == "v1"
+    assert not model_registry.rollback() # Nothing before v1
+    assert not model_registry.set_active("v9")
+
+def test_missing_model_is_reported_once(registry, capsys):
+    model_registry.register_model(export_model(str(registry / "a.npz"), 1), 100, 0.9)
+    os.remove(os.path.join(model_registry.MODELS_DIR, "ai_model_v1.npz"))
+    for _ in range(5):
+        assert model_registry.get_active_entry() is None
+    assert capsys.readouterr().out.count("is missing") == 1
+
+def test_watcher_swaps_model_and_resets_online_corrections(registry):
+    for feedback in ["zzq quarterly planning", "zzq planning notes", "zzq quarterly"]:
+        data_manager.log_ai_feedback(feedback, "Distraction")
+    model_registry.register_model(export_model(str(registry / "a.npz"), 1), 100, 0.9, feedback_max_id=1)
+    # The second version is newer on disk (as it would be after retraining).
+    os.utime(os.path.join(model_registry.MODELS_DIR, "ai_model_v1.npz"), (time.time() - 60,) * 2)
+    model_registry.register_model(export_model(str(registry / "b.npz"), 2), 120, 0.9, feedback_max_id=3)
+
+    ai_classifier.set_model_wrapper(online_learner._wrap_base_model)
+    ai_classifier.start_background_load()
+    wait_until(lambda: ai_classifier.get_model_info().get("version") == "v2")
+    assert ai_classifier.predict_category(PROBE) == 2
+    assert online_learner.get_online_stats()["last_feedback_id"] == 0
+
+    # Roll back: the watcher loads v1, the answer (and cache) follow, and
+    # the corrections restart from the feedback v1 was trained on.
+    model_registry.rollback()
+    wait_until(lambda: ai_classifier.get_model_info().get("version") == "v1")
+    assert ai_classifier.predict_category(PROBE) == 1
+    assert isinstance(ai_classifier.ai_model, online_learner.OnlineModel)
+    assert online_learner.get_online_stats() == {"updates": 0, "last_feedback_id": 1}
+
+    # Only the reports newer than v1's training data are applied.
+    assert online_learner.apply_new_feedback() == 2
+    assert online_learner.get_online_stats()["last_feedback_id"] == 3
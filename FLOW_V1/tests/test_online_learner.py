@@ -0,0 +1,122 @@
+# test_online_learner.py - Online corrections: score shapes, updates, saving and resets.
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import make_pipeline
+from sklearn.svm import LinearSVC
+
+import ai_classifier
+import ai_trainer
+import data_manager
+import online_learner
+
+TITLES = ["main.py - Visual Studio Code", "YouTube - Google Chrome", "Unknown window", ""]
+
+def fit(labels):
+    data = [(title, label) for title, label in ai_trainer.TRAIN_DATA if label in labels]
+    model = make_pipeline(TfidfVectorizer(analyzer='word', ngram_range=(1, 3)), LinearSVC(dual=False))
+    model.fit([t for t, _ in data], [l for _, l in data])
+    return model
+
+@pytest.fixture
+def learner(tmp_path, monkeypatch):
+    """
+    Utility: A fresh learner and classifier with nothing loaded from disk.
+    """
+    monkeypatch.setattr(online_learner, "ONLINE_MODEL_FILE", str(tmp_path / "ai_online.npz"))
+    monkeypatch.setattr(online_learner, "_corrector", None)
+    for name, value in [("ai_model", None), ("base_model", None), ("model_info", {}),
+                        ("_model_wrapper", None), ("_load_thread", object())]: # No background load
+        monkeypatch.setattr(ai_classifier, name, value)
+    data_manager.init_database(str(tmp_path / "flow_test.db"))
+    yield tmp_path
+    data_manager.shutdown()
+
+def report_wrong(base, title):
+    """
+    Utility: Reports 'title' as the opposite of what the base model says.
+    Returns the reported label.
+    """
+    wanted = 1 if base.predict([title])[0] != 1 else 0
+    data_manager.log_ai_feedback(title, "Productive" if wanted == 1 else "Distraction")
+    return wanted
+
+def use_base(base, mtime=1.0):
+    """
+    Utility: Loads 'base' the way ai_classifier does after reading it from disk.
+    """
+    ai_classifier.base_model = base
+    ai_classifier.swap_model(online_learner._wrap_base_model(base, mtime))
+
+@pytest.mark.parametrize("labels", [(0, 1), (0, 1, 2)], ids=["binary", "three-class"])
+def test_wrapped_scores_keep_the_base_shape(learner, labels):
+    base = fit(labels)
+    ai_classifier.swap_model(base)
+    unwrapped = ai_classifier.decision_scores_batch(TITLES)
+    use_base(base)
+    wrapped = ai_classifier.decision_scores_batch(TITLES)
+
+    expected_shape = (len(TITLES),) if len(labels) == 2 else (len(TITLES), len(labels))
+    assert unwrapped.shape == wrapped.shape == expected_shape
+    # No corrections yet: the same scores and answers as the base model.
+    np.testing.assert_allclose(wrapped, unwrapped)
+    assert list(ai_classifier.predict_category_batch(TITLES)) == list(base.predict(TITLES))
+
+@pytest.mark.parametrize("labels", [(0, 1), (0, 1, 2)], ids=["binary", "three-class"])
+def test_one_report_flips_the_answer(learner, labels):
+    base = fit(labels)
+    use_base(base)
+    title = "Minecraft speedrun tutorial"
+    wanted = report_wrong(base, title)
+
+    assert online_learner.apply_new_feedback() == 1
+    assert ai_classifier.predict_category(title) == wanted
+    assert online_learner.get_online_stats() == {"updates": 1, "last_feedback_id": 1}
+    # Already right: a second identical report is passive.
+    data_manager.log_ai_feedback(title, "Productive" if wanted == 1 else "Distraction")
+    online_learner.apply_new_feedback()
+    assert online_learner.get_online_stats() == {"updates": 1, "last_feedback_id": 2}
+
+def test_passive_aggressive_update_reaches_the_margin():
+    corrector = online_learner.HashedCorrector([0, 1, 2])
+    base_scores = np.array([0.5, -0.2, -3.0])
+    assert corrector.partial_fit("some video", 1, base_scores)
+    cols, values = corrector.features("some video")
+    combined = base_scores + corrector.weights[:, cols] @ values
+    assert combined.argmax() == 1
+    assert combined[1] - combined[0] == pytest.approx(1.0, abs=1e-6)
+    assert corrector.weights[2, cols].sum() == 0 # Only the right and the wrong rows move
+    assert not corrector.partial_fit("some video", 1, base_scores)
+    assert not corrector.partial_fit("x", 1, base_scores) # No usable words
+
+def test_corrections_are_saved_and_reloaded(learner):
+    base = fit((0, 1, 2))
+    use_base(base)
+    report_wrong(base, "Minecraft speedrun tutorial")
+    online_learner.apply_new_feedback()
+    saved = online_learner._corrector
+
+    # A restart: the same base model file picks the saved corrections up.
+    online_learner._corrector = None
+    use_base(base)
+    loaded = online_learner._corrector
+    assert loaded is not saved
+    assert (loaded.last_feedback_id, loaded.updates, loaded.base_mtime) == (1, 1, 1.0)
+    np.testing.assert_array_equal(loaded.weights, saved.weights)
+
+def test_new_base_model_resets_the_corrections(learner):
+    base = fit((0, 1, 2))
+    use_base(base, mtime=1.0)
+    report_wrong(base, "Minecraft speedrun tutorial")
+    online_learner.apply_new_feedback()
+    assert online_learner.get_online_stats()["updates"] == 1
+
+    # Retrained (new file mtime), with no registry entry: keep the feedback position.
+    use_base(base, mtime=2.0)
+    assert online_learner.get_online_stats() == {"updates": 0, "last_feedback_id": 1}
+    assert not online_learner._corrector.weights.any()
+
+    # A registered version starts from the feedback it was trained on.
+    ai_classifier.model_info = {"feedback_max_id": 0}
+    use_base(base, mtime=3.0)
+    assert online_learner.get_online_stats() == {"updates": 0, "last_feedback_id": 0}
@@ -0,0 +1,77 @@
+# test_process_resolver.py - Process names cached by (pid, create_time), with a fake OS.
+import types
+
+import psutil
+import pytest
+
+import process_resolver
+
+class FakeOS:
+    """
+    Utility: A process table {pid: (create_time, name)} behind a
+    psutil.Process look-alike. Counts the (slow) name() calls.
+    """
+
+    def __init__(self):
+        self.processes = {}
+        self.name_calls = 0
+        os_ = self
+
+        class Process:
+            def __init__(self, pid):
+                if pid not in os_.processes:
+                    raise psutil.NoSuchProcess(pid)
+                self.pid = pid
+
+            def create_time(self):
+                return os_.processes[self.pid][0]
+
+            def name(self):
+                os_.name_calls += 1
+                return os_.processes[self.pid][1]
+
+        self.Process = Process
+
+@pytest.fixture
+def fake_os(monkeypatch):
+    fake = FakeOS()
+    monkeypatch.setattr(process_resolver, "psutil", types.SimpleNamespace(Process=fake.Process))
+    return fake
+
+def test_recycled_pid_gets_its_own_entry(fake_os):
+    resolver = process_resolver.ProcessResolver()
+    fake_os.processes[1234] = (100.0, "Code.exe")
+    assert resolver.resolve(1234) == "Code.exe"
+    assert resolver.resolve(1234) == "Code.exe"
+    assert fake_os.name_calls == 1
+
+    # The process exits and Windows hands its PID to a new one.
+    fake_os.processes[1234] = (250.0, "chrome.exe")
+    assert resolver.peek(1234) == "Code.exe" # The fast path can't know yet
+    assert resolver.resolve(1234) == "chrome.exe"
+    assert resolver.peek(1234) == "chrome.exe"
+    assert fake_os.name_calls == 2
+    stats = resolver.get_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 2)
+
+def test_finished_process_raises_and_is_forgotten(fake_os):
+    resolver = process_resolver.ProcessResolver()
+    fake_os.processes[7] = (1.0, "notepad.exe")
+    resolver.resolve(7)
+    del fake_os.processes[7]
+    with pytest.raises(psutil.NoSuchProcess):
+        resolver.resolve(7)
+    assert resolver.peek(7) is None
+    assert resolver.get_stats()["errors"] == 1
+
+def test_least_recently_used_process_is_evicted(fake_os):
+    resolver = process_resolver.ProcessResolver(max_entries=2)
+    for pid in (1, 2, 3):
+        fake_os.processes[pid] = (float(pid), f"app{pid}.exe")
+    resolver.resolve(1)
+    resolver.resolve(2)
+    resolver.resolve(1) # 2 is now the least recently used
+    resolver.resolve(3)
+    assert resolver.peek(2) is None
+    assert resolver.peek(1) == "app1.exe" and resolver.peek(3) == "app3.exe"
+    assert resolver.get_stats()["evictions"] == 1
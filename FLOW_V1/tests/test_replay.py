@@ -0,0 +1,48 @@
+# test_replay.py - A timeline replayed through the real tracker pipeline.
+import json
+import sqlite3
+from datetime import datetime
+
+import replay
+
+CODE = "main.py - Visual Studio Code"
+VIDEO = "YouTube - Google Chrome"
+
+def write_timeline(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return str(path)
+
+def test_replay_across_midnight(tmp_path):
+    path = write_timeline(tmp_path / "timeline.jsonl", [
+        {"t": 0, "process": "Code.exe", "title": CODE},
+        {"t": 120, "process": "chrome.exe", "title": VIDEO},
+        {"t": 300, "process": None, "title": None}, # Away over midnight
+        {"t": 420, "process": "Code.exe", "title": CODE},
+        {"t": 900},
+    ])
+    db_file = str(tmp_path / "replay.db")
+    report = replay.replay_file(path, db_file, speed=0, start=datetime(2026, 3, 10, 23, 55))
+
+    assert report["timeline"]["end"] == "2026-03-11T00:10:00"
+    conn = sqlite3.connect(db_file)
+    try:
+        sessions = conn.execute(
+            "SELECT start_time, end_time, app_name, samples FROM activity_sessions ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    assert sessions == [
+        ("2026-03-10 23:55:00", "2026-03-10 23:57:00", CODE, 24),
+        ("2026-03-10 23:57:00", "2026-03-11 00:00:00", VIDEO, 36), # Paused at 00:00
+        ("2026-03-11 00:02:00", "2026-03-11 00:10:00", CODE, 96),
+    ]
+
+    # Only the new day counts, and the live totals saw the same logs.
+    assert report["final_stats"]["prod_time_s"] == 480
+    assert report["final_stats"]["dist_time_s"] == 0
+    assert report["live_matches_daily"]
+    assert report["throughput"]["samples_logged"] == 24 + 36 + 96
+    stages = report["pipeline_stages"]
+    assert stages["sink"]["count"] == report["throughput"]["events_logged"] > 0
+    assert report["latency_ms"]["log"]["count"] == report["throughput"]["sink_rounds"]
@@ -0,0 +1,95 @@
+# test_rule_engine.py - The keyword automaton must match exactly like the original per-keyword checks.
+import random
+import re
+
+import pytest
+
+import config_manager
+import rule_engine
+
+LABELS = {
+    "PRODUCTIVE_KEYWORDS": rule_engine.PRODUCTIVE,
+    "STUDY_KEYWORDS": rule_engine.STUDY,
+    "High": rule_engine.DIST_HIGH,
+    "Medium": rule_engine.DIST_MEDIUM,
+    "Low": rule_engine.DIST_LOW,
+}
+
+def labelled_keywords(config):
+    levels = config.get("DISTRACTION_LEVELS", {})
+    for key in ("PRODUCTIVE_KEYWORDS", "STUDY_KEYWORDS"):
+        for keyword in config.get(key, []):
+            yield keyword, LABELS[key]
+    for level in ("High", "Medium", "Low"):
+        for keyword in levels.get(level, []):
+            yield keyword, LABELS[level]
+
+def baseline_match(config, title_low):
+    """
+    Utility: The original classifiers' checks (baseline main.py): every
+    keyword as a plain substring, and for the "strict" results, keywords
+    of 3 characters or fewer as a \\b-bounded regex instead.
+    """
+    loose, strict = set(), set()
+    for keyword, label in labelled_keywords(config):
+        if keyword in title_low:
+            loose.add(label)
+        if len(keyword) <= 3:
+            if re.search(rf"\b{re.escape(keyword)}\b", title_low):
+                strict.add(label)
+        elif keyword in title_low:
+            strict.add(label)
+    return loose, strict
+
+CONFIG = {
+    # Overlapping keywords (one is a prefix, suffix or middle of another),
+    # regex metacharacters, short keywords, mixed case and non-ASCII.
+    "PRODUCTIVE_KEYWORDS": ["code", "vs code", "c++", "c#", ".net", "git", "github", "(draft)", "a.b", "Docs"],
+    "STUDY_KEYWORDS": ["os", "ai", "lecture", "cours", "course", "[lab]", "ml", "ü", "straße"],
+    "DISTRACTION_LEVELS": {
+        "High": ["porn", "casino*", "tv"],
+        "Medium": ["youtube", "tube", "you", "a|b", "$"],
+        "Low": ["news", "new", "ews", "^", "+1", "_"],
+    },
+}
+
+TITLES = [
+    "", "main.py - visual studio code", "vs code", "videos about os", "os - lecture 3",
+    "c++ primer", "learn c++11", "c#", "ac#d", "asp.net core", "git", "github desktop", "digit",
+    "(draft) essay", "a.b test", "axb", "docs", "Docs", "youtube - the ai course", "bbc news",
+    "new tab", "casino* night", "casino night", "smart tv", "tv", "a|b", "price $5", "^_^", "+1 vote",
+    "snake_case_os", "ml_os", "über straße", "ü", "mü", "[lab] 4", "lab 4", "retube",
+]
+
+def check(config, titles):
+    rules = rule_engine.compile_rules(config)
+    for title in titles:
+        title_low = title.lower()
+        assert rules.match_title(title_low) == baseline_match(config, title_low), title
+
+def test_matches_baseline_on_tricky_keywords():
+    check(CONFIG, TITLES + [title.upper() for title in TITLES])
+
+def test_matches_baseline_on_random_titles():
+    """
+    Utility: Random titles built from keyword fragments and separators,
+    so keywords overlap and sit on and off word boundaries.
+    """
+    rng = random.Random(1234)
+    pieces = [keyword for keyword, _ in labelled_keywords(CONFIG)]
+    pieces += [" ", "-", "_", ".", "x", "1", "é", "|"]
+    titles = ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 8))) for _ in range(2000)]
+    check(CONFIG, titles)
+
+def test_matches_baseline_on_the_default_config():
+    config = config_manager.get_default_config()
+    pieces = [keyword for keyword, _ in labelled_keywords(config)] + [" ", " - ", "s", "x"]
+    rng = random.Random(42)
+    titles = [" ".join(rng.choice(pieces) for _ in range(rng.randint(1, 5))) for _ in range(500)]
+    check(config, titles + TITLES)
+
+@pytest.mark.parametrize("keyword", ["os", "ai"])
+def test_short_keywords_need_word_boundaries(keyword):
+    rules = rule_engine.compile_rules({"STUDY_KEYWORDS": [keyword]})
+    assert rules.match_title(f"video{keyword}") == ({rule_engine.STUDY}, set())
+    assert rules.match_title(f"intro to {keyword}!") == ({rule_engine.STUDY}, {rule_engine.STUDY})
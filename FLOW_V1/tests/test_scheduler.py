@@ -0,0 +1,89 @@
+# test_scheduler.py - AdaptiveScheduler back-off, idle and the wakeup cap, on a fake clock.
+import threading
+import time
+import types
+
+import pytest
+
+import scheduler
+
+class FakeMonotonic:
+    """
+    Utility: The scheduler's time.monotonic(), moved by hand.
+    """
+
+    def __init__(self, monkeypatch):
+        self.value = 1000.0
+        monkeypatch.setattr(scheduler, "time", types.SimpleNamespace(monotonic=lambda: self.value))
+
+    def advance(self, seconds):
+        self.value += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(scheduler, "get_idle_seconds", lambda: 0.0)
+    return FakeMonotonic(monkeypatch)
+
+def test_backs_off_and_resets_on_change(clock):
+    schedule = scheduler.AdaptiveScheduler("test", min_interval=2.0, max_interval=10.0, backoff=2.0)
+    delays = []
+    for _ in range(5):
+        schedule.mark_stable()
+        delays.append(schedule.next_delay())
+    assert delays == [4.0, 8.0, 10.0, 10.0, 10.0]
+    schedule.mark_changed()
+    assert schedule.next_delay() == 2.0
+
+def test_idle_interval(clock, monkeypatch):
+    schedule = scheduler.AdaptiveScheduler("test", min_interval=2.0, max_interval=10.0, idle_interval=60.0)
+    monkeypatch.setattr(scheduler, "get_idle_seconds", lambda: scheduler.IDLE_AFTER_SECONDS)
+    assert schedule.next_delay() == 60.0
+    assert schedule.get_rates()["idle"]
+    monkeypatch.setattr(scheduler, "get_idle_seconds", lambda: None) # Unknown counts as active
+    assert schedule.next_delay() == 2.0
+    assert not schedule.get_rates()["idle"]
+
+def test_cap_delays_the_next_wakeup(clock):
+    schedule = scheduler.AdaptiveScheduler("test", min_interval=1.0, max_interval=1.0, max_wakeups_per_minute=3)
+    for _ in range(3):
+        schedule.record_wakeup()
+        clock.advance(10.0)
+    # Three wakeups at 0, 10 and 20 s; it is now 30 s.
+    assert schedule.cap_delay() == pytest.approx(30.0)
+    assert schedule.next_delay() == pytest.approx(30.0)
+    clock.advance(30.0) # The first one is a minute old
+    assert schedule.cap_delay() == 0.0
+    assert schedule.next_delay() == 1.0
+    assert schedule.get_rates()["wakeups_last_minute"] == 2
+
+def test_poke_over_the_cap_waits_and_interrupt_ends_it(clock):
+    schedule = scheduler.AdaptiveScheduler("test", min_interval=60.0, max_interval=60.0, max_wakeups_per_minute=1)
+    schedule.record_wakeup()
+    results = []
+
+    def waiter():
+        results.append(schedule.wait())
+
+    thread = threading.Thread(target=waiter, daemon=True)
+    thread.start()
+    schedule.poke()
+    time.sleep(0.2)
+    assert thread.is_alive() # Poked, but the cap still holds it
+    schedule.poke()
+    time.sleep(0.2)
+    assert thread.is_alive() # Further pokes don't break the cap either
+
+    clock.advance(60.0) # The cap has passed: the next poke lets it go
+    schedule.poke()
+    thread.join(2.0)
+    assert results == [True]
+
+    thread = threading.Thread(target=waiter, daemon=True)
+    thread.start()
+    schedule.poke()
+    time.sleep(0.2)
+    assert thread.is_alive()
+    schedule.interrupt() # e.g. stop(): no waiting out the cap
+    thread.join(2.0)
+    assert not thread.is_alive()
+    assert results == [True, True]
@@ -0,0 +1,180 @@
+# test_tracker_pipeline.py - Drives the TrackerPipeline with the scripted window source.
+import time
+import types
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import data_manager
+import focus_engine
+import scheduler
+import tracker_pipeline
+import window_sources
+
+CODE = "main.py - Visual Studio Code"
+VIDEO = "YouTube - Google Chrome"
+
+def classify(title):
+    return "Productive" if "Code" in title else "Distraction-High"
+
+class FakeClock:
+    """
+    Utility: The tracker's datetime.now(), moved by hand.
+    """
+    now_value = None
+
+    @classmethod
+    def install(cls, monkeypatch, start):
+        cls.now_value = start
+        class FakeDateTime(datetime):
+            @classmethod
+            def now(klass, tz=None):
+                return cls.now_value
+        monkeypatch.setattr(tracker_pipeline, "datetime", FakeDateTime)
+
+    @classmethod
+    def set(cls, value):
+        cls.now_value = value
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the tracker")
+        time.sleep(0.01)
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    data_manager.init_database(str(tmp_path / "flow_test.db"))
+    FakeClock.install(monkeypatch, datetime(2026, 3, 10, 9, 0, 0))
+    source = window_sources.ScriptedWindowSource()
+    source.start()
+    pipeline = tracker_pipeline.TrackerPipeline(
+        source, lambda title, process_name: classify(title), lambda process_name, title: classify(title),
+        alerts_enabled=lambda: False)
+    pipeline.start()
+    wait_until(lambda: pipeline._wake_sink is not None)
+    yield pipeline
+    pipeline.stop()
+    source.stop()
+    data_manager.shutdown()
+
+def classified(pipeline):
+    return pipeline.get_stage_stats()["classify"]["count"]
+
+def switch_to(pipeline, title, at):
+    """
+    Utility: Focuses 'title' at time 'at' and waits for the sink to get it.
+    """
+    FakeClock.set(at)
+    count = classified(pipeline)
+    pipeline.source.push(title)
+    wait_until(lambda: classified(pipeline) > count)
+    time.sleep(0.2) # classify -> sink is one queue hop
+
+def read_sessions():
+    data_manager.flush()
+    conn = sqlite3.connect(data_manager.DB_FILE)
+    try:
+        return conn.execute(
+            "SELECT category, app_name, start_time, end_time, samples FROM activity_sessions ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+def test_sessions_pause_and_midnight(tracker):
+    day = datetime(2026, 3, 10)
+    switch_to(tracker, CODE, day.replace(hour=9))
+    switch_to(tracker, VIDEO, day.replace(hour=9, minute=1))  # CODE: 60 s
+
+    # Pause 23 s later: the 4 whole samples before the pause are logged.
+    FakeClock.set(day.replace(hour=9, minute=1, second=23))
+    tracker.set_paused(True)
+    FakeClock.set(day.replace(hour=9, minute=3))
+    time.sleep(0.3)
+
+    # Resume: the paused time is not logged.
+    FakeClock.set(day.replace(hour=9, minute=5))
+    count = classified(tracker)
+    tracker.set_paused(False)
+    wait_until(lambda: classified(tracker) > count)
+    time.sleep(0.2)
+    switch_to(tracker, CODE, day.replace(hour=9, minute=5, second=30))  # VIDEO: 30 s
+
+    # A gap over MAX_LOGGED_GAP_SECONDS (sleep) is skipped, then one
+    # event runs across midnight and is split between the two days.
+    switch_to(tracker, VIDEO, day.replace(hour=23, minute=59, second=50))
+    switch_to(tracker, CODE, datetime(2026, 3, 11, 0, 0, 20))  # VIDEO: 30 s
+
+    assert read_sessions() == [
+        ("Productive", CODE, "2026-03-10 09:00:00", "2026-03-10 09:01:00", 12),
+        ("Distraction-High", VIDEO, "2026-03-10 09:01:00", "2026-03-10 09:01:20", 4),
+        ("Distraction-High", VIDEO, "2026-03-10 09:05:00", "2026-03-10 09:05:30", 6),
+        ("Distraction-High", VIDEO, "2026-03-10 23:59:50", "2026-03-11 00:00:00", 2),
+        ("Distraction-High", VIDEO, "2026-03-11 00:00:00", "2026-03-11 00:00:20", 4),
+    ]
+
+    first_day = focus_engine.calculate_daily_stats(now=day)
+    assert (first_day["prod_time_s"], first_day["dist_time_s"]) == (60, 60)
+    second_day = focus_engine.calculate_daily_stats(now=datetime(2026, 3, 11, 12))
+    assert (second_day["prod_time_s"], second_day["dist_time_s"]) == (0, 20)
+    assert data_manager.get_daily_rollup("2026-03-10", "2026-03-11") == [
+        ("2026-03-10", "Distraction-High", 12, 60.0),
+        ("2026-03-10", "Productive", 12, 60.0),
+        ("2026-03-11", "Distraction-High", 4, 20.0),
+    ]
+
+def test_changes_over_the_wakeup_cap_are_coalesced(tracker, monkeypatch):
+    day = datetime(2026, 3, 10)
+    switch_to(tracker, CODE, day.replace(hour=9))
+
+    # Use up the sink's wakeups for this minute (on a fake monotonic clock).
+    fake_now = [time.monotonic()]
+    monkeypatch.setattr(scheduler, "time", types.SimpleNamespace(monotonic=lambda: fake_now[0]))
+    for _ in range(tracker.schedule.max_wakeups_per_minute):
+        tracker.schedule.record_wakeup()
+
+    # Two quick changes: only the newest is kept until the cap allows a
+    # wakeup, and CODE ends when the first of them was seen.
+    switch_to(tracker, VIDEO, day.replace(hour=9, minute=1))
+    switch_to(tracker, CODE, day.replace(hour=9, minute=1, second=2))
+    assert read_sessions() == []
+
+    fake_now[0] += 60.0
+    FakeClock.set(day.replace(hour=9, minute=2))
+    tracker._loop.call_soon_threadsafe(tracker._wake_sink.set)
+    wait_until(lambda: read_sessions() != [])
+    assert read_sessions() == [("Productive", CODE, "2026-03-10 09:00:00", "2026-03-10 09:01:00", 12)]
+
+    # The held CODE continues from 09:01 (the same session, extended).
+    switch_to(tracker, VIDEO, day.replace(hour=9, minute=3))
+    assert read_sessions() == [("Productive", CODE, "2026-03-10 09:00:00", "2026-03-10 09:03:00", 36)]
+
+def test_status_publisher_dedupes_and_sends_heartbeats(monkeypatch):
+    fake_now = [100.0]
+    monkeypatch.setattr(tracker_pipeline, "time", types.SimpleNamespace(monotonic=lambda: fake_now[0]))
+    sent = []
+    status = tracker_pipeline.StatusPublisher(lambda key, value: sent.append((key, value)), heartbeat_seconds=30)
+
+    status.heartbeat() # Nothing sent yet: nothing to repeat
+    assert status.update("Productive", CODE)
+    assert not status.update("Productive", CODE)
+    assert not status.update("Productive", CODE)
+    assert status.update("Distraction-High", VIDEO)
+    assert status.update("Idle", None)
+    assert sent == [('-UPDATE_APP-', f"Cat: Productive | Title: {CODE}"),
+                    ('-UPDATE_APP-', f"Cat: Distraction-High | Title: {VIDEO}"),
+                    ('-UPDATE_APP-', "Cat: Idle | Title: None")]
+
+    fake_now[0] += 29
+    status.heartbeat()
+    assert len(sent) == 3
+    fake_now[0] += 1
+    status.heartbeat()
+    assert sent[-1] == ('-UPDATE_APP-', "Cat: Idle | Title: None")
+    status.heartbeat() # The heartbeat itself restarts the wait
+    assert len(sent) == 4
+
+    status.reset() # e.g. the GUI showed "PAUSED": the same status is sent again
+    assert status.update("Idle", None)
+    assert status.get_stats() == {"sent": 4, "suppressed": 2, "heartbeats": 1}
@@ -0,0 +1,70 @@
+# test_ui_events.py - The EventCoalescer between the tracker and the GUI.
+import threading
+
+import pytest
+
+pytest.importorskip("FreeSimpleGUI")
+import ui_events
+
+class FakeWindow:
+    """
+    Utility: Records write_event_value() calls like the GUI's event queue.
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def write_event_value(self, key, value):
+        self.events.append((key, value))
+
+def test_only_the_latest_status_and_stats_are_kept():
+    window = FakeWindow()
+    coalescer = ui_events.EventCoalescer(window)
+    for i in range(5):
+        coalescer('-UPDATE_APP-', f"Window {i}")
+        coalescer('-STATS_UPDATE-', {"score": i})
+    coalescer('-DISTRACTION_EVENT-', ("Distraction-High", "a"))
+    coalescer('-DISTRACTION_EVENT-', ("Distraction-High", "b"))
+
+    assert window.events == [(ui_events.TRACKER_EVENT, None)] # One wake-up for all 12
+    assert coalescer.drain() == [
+        ('-DISTRACTION_EVENT-', ("Distraction-High", "a")),
+        ('-DISTRACTION_EVENT-', ("Distraction-High", "b")),
+        ('-UPDATE_APP-', "Window 4"),
+        ('-STATS_UPDATE-', {"score": 4}),
+    ]
+    stats = coalescer.get_stats()
+    assert (stats["received"], stats["delivered"], stats["coalesced"], stats["wakeups"], stats["depth"]) == (
+        12, 4, 8, 1, 0)
+
+def test_a_new_wakeup_only_after_drain():
+    window = FakeWindow()
+    coalescer = ui_events.EventCoalescer(window)
+    coalescer('-UPDATE_APP-', "a")
+    coalescer('-UPDATE_APP-', "b")
+    assert len(window.events) == 1
+    assert coalescer.drain() == [('-UPDATE_APP-', "b")]
+    assert coalescer.drain() == []
+    coalescer('-UPDATE_APP-', "c")
+    assert len(window.events) == 2
+    assert coalescer.drain() == [('-UPDATE_APP-', "c")]
+
+def test_many_threads_still_one_pending_wakeup():
+    window = FakeWindow()
+    coalescer = ui_events.EventCoalescer(window)
+    barrier = threading.Barrier(8)
+
+    def post(n):
+        barrier.wait()
+        for i in range(200):
+            coalescer('-STATS_UPDATE-', (n, i))
+
+    threads = [threading.Thread(target=post, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(window.events) == 1
+    events = coalescer.drain()
+    assert len(events) == 1 and events[0][1][1] == 199
+    assert coalescer.get_stats()["received"] == 1600
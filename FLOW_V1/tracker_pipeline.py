@@ -0,0 +1,478 @@
+# tracker_pipeline.py (v1.6 - Sink Rounds for Replays)
+
+# --- Imports ---
+import time       # Reason: To measure each stage against its budget.
+import asyncio    # Reason: Runs every stage on one event loop.
+import threading  # Reason: The event loop lives on one background thread.
+from collections import namedtuple  # Reason: The record passed between stages.
+from datetime import datetime, timedelta  # Reason: Timestamps for logged activity.
+import data_manager  # Reason: The batched database sink.
+import focus_engine  # Reason: The stats updater.
+import scheduler     # Reason: How often to log while nothing changes.
+import process_resolver  # Reason: The cached PID -> .exe name lookup.
+import instrumentation   # Reason: Per-stage timing histograms.
+
+# --- Constants ---
+# The stages, in order. Each one hands its results to the next through a
+# bounded queue; when a queue is full the stage before it waits
+# (backpressure), and meanwhile the window source keeps only the newest
+# window, so changes are coalesced instead of piling up.
+#   window source -> title classifier -> process resolver
+#     -> full classifier -> database sink -> stats updater
+QUEUE_SIZE = 8
+
+# Latency budget per stage (milliseconds). Going over is counted (and
+# printed), see get_stage_stats().
+STAGE_BUDGETS_MS = {
+    "title": 20.0,
+    "process": 50.0,
+    "classify": 50.0,
+    "sink": 20.0,
+    "stats": 50.0,
+}
+
+# A longer gap between two logs means the PC was asleep; it isn't logged.
+MAX_LOGGED_GAP_SECONDS = 120.0
+
+# The Live Status is only re-sent when (category, title) changes, plus
+# once per heartbeat so a missed update is corrected within this time.
+STATUS_HEARTBEAT_SECONDS = 30.0
+
+# One window change as it moves through the stages.
+Activity = namedtuple("Activity", ["title", "pid", "hwnd", "seen_at",
+                                   "title_category", "process_name", "category"])
+
+# --- Core Logic: Status Publisher ---
+class StatusPublisher:
+    """
+    Core Logic: Sends '-UPDATE_APP-' only when (category, title) differs
+    from the last one sent, plus a heartbeat every 'heartbeat_seconds'.
+    Counts the updates it didn't need to send.
+    """
+
+    def __init__(self, publish, heartbeat_seconds=STATUS_HEARTBEAT_SECONDS):
+        self.publish = publish
+        self.heartbeat_seconds = heartbeat_seconds
+        self.last = None        # (category, title) last sent
+        self.last_sent_at = 0.0
+        self.stats = {"sent": 0, "suppressed": 0, "heartbeats": 0}
+
+    def _send(self, status):
+        category, title = status
+        self.publish('-UPDATE_APP-', f"Cat: {category} | Title: {title if title else 'None'}")
+        self.last = status
+        self.last_sent_at = time.monotonic()
+
+    def update(self, category, title):
+        """
+        Core Logic: Sends the status if it changed. Returns True if sent.
+        """
+        status = (category, title)
+        if status == self.last:
+            self.stats["suppressed"] += 1
+            return False
+        self._send(status)
+        self.stats["sent"] += 1
+        return True
+
+    def heartbeat(self):
+        """
+        Utility: Re-sends the current status if nothing was sent for
+        'heartbeat_seconds'.
+        """
+        if self.last is not None and time.monotonic() - self.last_sent_at >= self.heartbeat_seconds:
+            self._send(self.last)
+            self.stats["heartbeats"] += 1
+
+    def reset(self):
+        """
+        Utility: Forgets the last status, so the next one is always sent
+        (e.g. after the GUI showed something else, like "PAUSED").
+        """
+        self.last = None
+
+    def get_stats(self):
+        """
+        Utility: Returns {'sent', 'suppressed', 'heartbeats'}.
+        """
+        return dict(self.stats)
+
+# --- Core Logic: The Pipeline ---
+class TrackerPipeline:
+    """
+    Core Logic: The tracker, as one asyncio pipeline on one thread.
+    - classify_title(title, process_name) is the "fast" classifier (Live
+      Status, alerts). process_name is only given if it is already cached.
+    - classify_activity(process_name, title) is the full one (logged).
+    - alerts_enabled() says if distraction alerts should be sent.
+    Results go to every subscriber as callback(event_key, value), using
+    the same event keys the GUI already handles.
+    """
+
+    def __init__(self, source, classify_title, classify_activity, alerts_enabled=None,
+                 self_pid=None, queue_size=QUEUE_SIZE, resolver=None):
+        self.source = source
+        self.resolver = resolver or process_resolver.resolver # Shared by both classifiers
+        self.classify_title = classify_title
+        self.classify_activity = classify_activity
+        self.alerts_enabled = alerts_enabled or (lambda: True)
+        self.self_pid = self_pid
+        self.queue_size = queue_size
+        # How often the sink logs while the same activity continues.
+        self.schedule = scheduler.AdaptiveScheduler(
+            "tracker-sink", min_interval=data_manager.POLL_INTERVAL_SECONDS, max_interval=30.0,
+            idle_interval=60.0, max_wakeups_per_minute=20)
+        self.current = None     # Latest Activity (read by the GUI, e.g. Report AI)
+        self.paused = False
+        self._paused_at = None  # When Pause was pressed (the sink logs up to here)
+        self._subscribers = []
+        self.status = StatusPublisher(self._publish)
+        self._loop = None
+        self._thread = None
+        self._stopping = None
+        self._wake_sink = None  # Set to make the sink run now (e.g. on Pause)
+        self._ready = threading.Event()  # Set once the event loop is running
+        self.sink_rounds = 0    # Rounds the sink has finished (see wait_for_sink)
+        self._sink_round_done = threading.Condition()
+        self._stage_stats = {name: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "over_budget": 0}
+                             for name in STAGE_BUDGETS_MS}
+
+    # --- Public API ---
+    def subscribe(self, callback):
+        """
+        Utility: Registers callback(event_key, value) for pipeline output.
+        """
+        self._subscribers.append(callback)
+
+    def start(self):
+        """
+        Core Logic: Starts the event loop thread (returns once it runs).
+        """
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="flow-tracker", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+
+    def stop(self):
+        """
+        Core Logic: Stops the pipeline (waits up to 5s for it to finish).
+        """
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join(5.0)
+
+    def set_paused(self, paused):
+        """
+        Utility: Pauses/resumes tracking. Paused time is never logged;
+        the time tracked before the pause is logged right away.
+        """
+        if paused and not self.paused:
+            self._paused_at = datetime.now()
+        self.paused = paused
+        if paused:
+            self.log_now()
+        else:
+            self.status.reset()           # The GUI shows "Watching..." now
+            self.source.request_refresh() # Pick up the current window again
+
+    def log_now(self):
+        """
+        Utility: Makes the sink run now: it logs the current activity up
+        to datetime.now() instead of waiting for its schedule.
+        """
+        if self._loop is not None and self._wake_sink is not None:
+            self._loop.call_soon_threadsafe(self._wake_sink.set)
+
+    def wait_for_sink(self, rounds, timeout=None):
+        """
+        Utility: Blocks until the sink has finished more than 'rounds'
+        rounds. Returns False on timeout. For harnesses with their own
+        clock (replay.py): read sink_rounds, make a change, then wait, so
+        the change is handled before the clock moves on.
+        """
+        with self._sink_round_done:
+            return self._sink_round_done.wait_for(lambda: self.sink_rounds > rounds, timeout)
+
+    def get_current_title(self):
+        """
+        Utility: The title of the window being tracked (or None).
+        """
+        current = self.current
+        return current.title if current else None
+
+    def get_stage_stats(self):
+        """
+        Utility: Per-stage {'count', 'avg_ms', 'max_ms', 'over_budget', 'budget_ms'}.
+        """
+        result = {}
+        for name, stats in self._stage_stats.items():
+            count = stats["count"]
+            result[name] = {
+                "count": count,
+                "avg_ms": round(stats["total_ms"] / count, 3) if count else 0.0,
+                "max_ms": round(stats["max_ms"], 3),
+                "over_budget": stats["over_budget"],
+                "budget_ms": STAGE_BUDGETS_MS[name],
+            }
+        return result
+
+    # --- Utility Functions ---
+    def _publish(self, event_key, value):
+        for callback in self._subscribers:
+            try:
+                callback(event_key, value)
+            except Exception as e:
+                print(f"Error in pipeline subscriber: {e}")
+
+    async def _timed(self, stage, func, *args):
+        """
+        Utility: Runs a (blocking) step on the thread pool, so the loop
+        never stalls, and checks it against the stage's budget.
+        """
+        started = time.perf_counter()
+        result = await self._loop.run_in_executor(None, func, *args)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        instrumentation.record(f"pipeline_{stage}", elapsed_ms / 1000)
+        stats = self._stage_stats[stage]
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        if elapsed_ms > STAGE_BUDGETS_MS[stage]:
+            stats["over_budget"] += 1
+            print(f"Tracker stage '{stage}' took {elapsed_ms:.0f} ms (budget {STAGE_BUDGETS_MS[stage]:.0f} ms).")
+        return result
+
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            print(f"Tracker pipeline stopped: {e}")
+
+    async def _main(self):
+        """
+        Core Logic: Wires the stages together and runs them until stop().
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._wake_sink = asyncio.Event()
+        titled = asyncio.Queue(self.queue_size)
+        resolved = asyncio.Queue(self.queue_size)
+        classified = asyncio.Queue(self.queue_size)
+        logged = asyncio.Queue(1) # Stats only need the latest "something was logged"
+
+        tasks = [
+            asyncio.create_task(self._source_stage(titled)),
+            asyncio.create_task(self._title_stage(titled, resolved)),
+            asyncio.create_task(self._process_stage(resolved, classified)),
+            asyncio.create_task(self._sink_stage(classified, logged)),
+            asyncio.create_task(self._stats_stage(logged)),
+            asyncio.create_task(self._heartbeat_stage()),
+        ]
+        print("Tracker pipeline has started.")
+        self._ready.set()
+        await self._stopping.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # --- Core Logic: Stages ---
+    async def _source_stage(self, out):
+        """
+        Core Logic: Stage 1. Waits for the focused window to change.
+        """
+        last_version = None
+        while True:
+            if self.paused:
+                last_version = None # Re-check the current window on resume
+                await asyncio.sleep(1.0)
+                continue
+            # The timeout only lets us notice a Pause.
+            change = await self._loop.run_in_executor(None, self.source.wait_for_change, last_version, 5.0)
+            if change is None or self.paused:
+                continue
+            last_version, info = change
+            if self.self_pid is not None and info.pid == self.self_pid:
+                continue # It's us
+            await out.put(Activity(info.title, info.pid, info.hwnd, datetime.now(), None, None, None))
+
+    async def _title_stage(self, inbox, out):
+        """
+        Core Logic: Stage 2. The fast title classifier: Live Status,
+        the Study Mode prompt and distraction alerts.
+        """
+        last_distraction_category = None # Prevents alert spam
+        while True:
+            activity = await inbox.get()
+            try:
+                process_name = self.resolver.peek(activity.pid) if activity.pid else None
+                category = await self._timed("title", self.classify_title, activity.title, process_name)
+            except Exception as e:
+                print(f"Error classifying title: {e}")
+                category = "Neutral"
+            if category == "Prompt-Study-Mode":
+                self._publish('-PROMPT_STUDY_MODE-', activity.title)
+                category = "Neutral" # Treat it as neutral for now
+            activity = activity._replace(title_category=category)
+            self.current = activity
+
+            self.status.update(category, activity.title)
+
+            current_category = category if category.startswith("Distraction-") else None
+            if current_category != last_distraction_category:
+                if current_category and self.alerts_enabled():
+                    print(f"PIPELINE: Sending ONE popup for {current_category}")
+                    self._publish('-DISTRACTION_EVENT-', (category, activity.title if activity.title else "Unknown Distraction"))
+                last_distraction_category = current_category
+            await out.put(activity)
+
+    async def _process_stage(self, inbox, out):
+        """
+        Core Logic: Stages 3 and 4. Resolves the .exe name (through the
+        shared process cache), then runs the full classifier once per change.
+        """
+        while True:
+            activity = await inbox.get()
+            process_name = None
+            if activity.pid and activity.pid > 0:
+                try:
+                    process_name = await self._timed("process", self.resolver.resolve, activity.pid)
+                except Exception as e:
+                    # e.g. "process PID not found"
+                    print(f"Error during PID lookup: {e}")
+            try:
+                category = await self._timed("classify", self.classify_activity, process_name, activity.title)
+            except Exception as e:
+                print(f"Error classifying activity: {e}")
+                category = "Neutral"
+            await out.put(activity._replace(process_name=process_name, category=category))
+
+    async def _sink_stage(self, inbox, out):
+        """
+        Core Logic: Stage 5. Logs each activity for as long as it lasted,
+        in whole samples of POLL_INTERVAL_SECONDS (the remainder is logged
+        with the next activity). While nothing changes it still logs
+        on the schedule's (backing-off) interval, so the stats keep moving.
+        Changes count towards the schedule's wakeup cap too: over the cap,
+        only the newest change is kept until the next allowed wakeup, and
+        the activity before it is logged up to when the first one was seen.
+        The database writes themselves are batched by data_manager.
+        """
+        activity = None       # What is being logged now
+        unlogged_since = None # Start of the time not logged yet
+        getter = None         # The pending inbox.get() (kept across timeouts)
+        waker = None          # The pending self._wake_sink.wait()
+        held = None           # The newest change not handled yet (over the cap)
+        held_since = None     # When the first of the held changes was seen
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(inbox.get())
+            if waker is None:
+                waker = asyncio.ensure_future(self._wake_sink.wait())
+            done, _ = await asyncio.wait({getter, waker}, timeout=self.schedule.next_delay(),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                if held is None:
+                    held_since = getter.result().seen_at
+                held = getter.result()
+                getter = None
+            if waker in done:
+                self._wake_sink.clear()
+                waker = None
+            if done and self.schedule.cap_delay() > 0:
+                continue # Woken early, but over the cap: wait for the timeout
+            self.schedule.record_wakeup()
+            now = datetime.now()
+            new_activity, held = held, None
+
+            if self.paused:
+                if activity is not None:
+                    # Log what was tracked before the pause (in whole samples);
+                    # the paused time itself is never logged.
+                    until = min(now, self._paused_at or now)
+                    await self._log_elapsed(activity, unlogged_since, until, out)
+                activity = None
+                self._finish_sink_round()
+                continue
+
+            # The current activity ended when the change was seen.
+            until = now if new_activity is None else min(now, held_since)
+            if activity is not None:
+                unlogged_since = await self._log_elapsed(activity, unlogged_since, until, out)
+            else:
+                unlogged_since = until
+
+            if new_activity is not None:
+                if activity is None or (new_activity.category, new_activity.title) != (activity.category, activity.title):
+                    self.schedule.mark_changed()
+                activity = new_activity
+            else:
+                self.schedule.mark_stable()
+            self._finish_sink_round()
+
+    def _finish_sink_round(self):
+        """
+        Utility: Counts one finished sink round and wakes wait_for_sink().
+        """
+        with self._sink_round_done:
+            self.sink_rounds += 1
+            self._sink_round_done.notify_all()
+
+    async def _log_elapsed(self, activity, unlogged_since, until, out):
+        """
+        Utility: Logs 'activity' from 'unlogged_since' to 'until' in whole
+        samples and tells the stats stage. Returns the start of the time
+        not logged yet. A gap over MAX_LOGGED_GAP_SECONDS (sleep) is skipped.
+        """
+        poll_s = data_manager.POLL_INTERVAL_SECONDS
+        elapsed = (until - unlogged_since).total_seconds()
+        if elapsed > MAX_LOGGED_GAP_SECONDS:
+            return until
+        samples = int(elapsed // poll_s)
+        if samples > 0:
+            await self._timed("sink", _log_samples, activity, samples, unlogged_since)
+            unlogged_since += timedelta(seconds=samples * poll_s)
+            if out.empty():
+                out.put_nowait(True)
+        return unlogged_since
+
+    async def _heartbeat_stage(self):
+        """
+        Core Logic: Re-sends the Live Status now and then (see StatusPublisher).
+        """
+        while True:
+            due_in = self.status.last_sent_at + self.status.heartbeat_seconds - time.monotonic()
+            await asyncio.sleep(max(1.0, due_in))
+            if not self.paused:
+                self.status.heartbeat()
+
+    async def _stats_stage(self, inbox):
+        """
+        Core Logic: Stage 6. Sends fresh stats to the subscribers after
+        every log (and once at startup).
+        """
+        while True:
+            try:
+                stats = await self._timed("stats", focus_engine.get_live_stats, datetime.now())
+                self._publish('-STATS_UPDATE-', stats)
+            except Exception as e:
+                print(f"Error updating stats: {e}")
+            await inbox.get()
+
+# --- Utility Functions ---
+def register_diagnostics(tracker):
+    """
+    Utility: Adds the tracker's own numbers (stage budgets, window source,
+    polling rates, process cache) to instrumentation.collect_diagnostics().
+    """
+    instrumentation.add_provider("tracker_stages", tracker.get_stage_stats)
+    instrumentation.add_provider("status_updates", tracker.status.get_stats)
+    instrumentation.add_provider("window_source", tracker.source.get_stats)
+    instrumentation.add_provider("schedulers", scheduler.get_effective_rates)
+    instrumentation.add_provider("process_cache", tracker.resolver.get_stats)
+
+def _log_samples(activity, samples, timestamp):
+    """
+    Utility: Hands one multi-sample event to the batched writer.
+    """
+    data_manager.log_event(activity.category, activity.title, samples=samples, timestamp=timestamp)
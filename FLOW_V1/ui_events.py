@@ -0,0 +1,161 @@
+# ui_events.py (v1.0 - Event Coalescing and Non-Modal Alerts)
+
+# --- Imports ---
+import time       # Reason: To measure how long events wait for the GUI.
+import threading  # Reason: The tracker posts from its own thread.
+from collections import deque  # Reason: The one-shot events, in order.
+import FreeSimpleGUI as sg     # Reason: The alert windows.
+import instrumentation         # Reason: The 'ui_event_lag' timing histogram.
+
+# --- Constants ---
+# The single window event that tells the GUI "tracker output is waiting".
+TRACKER_EVENT = '-TRACKER_EVENTS-'
+
+# Only the newest of these matters: an older status or stats update is
+# out of date as soon as a newer one exists.
+COALESCED_EVENTS = ('-UPDATE_APP-', '-STATS_UPDATE-')
+
+# --- Core Logic: Event Coalescer ---
+class EventCoalescer:
+    """
+    Core Logic: Sits between the tracker and the GUI. Subscribe it to the
+    tracker instead of window.write_event_value:
+    - COALESCED_EVENTS keep only their latest value (a newer one replaces
+      the pending one), so the GUI never replays a backlog.
+    - Every other event (alerts, prompts) is kept, in order.
+    - At most ONE TRACKER_EVENT is waiting in the GUI's queue at a time;
+      the GUI calls drain() when it arrives and gets everything pending.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latest = {}          # event key -> newest value (coalesced events)
+        self._queue = deque()      # (event key, value) one-shot events
+        self._waiting_since = None # When the pending TRACKER_EVENT was posted
+        self._stats = {"received": 0, "delivered": 0, "coalesced": 0, "wakeups": 0,
+                       "max_depth": 0, "last_lag_ms": 0.0, "max_lag_ms": 0.0}
+
+    def __call__(self, event_key, value):
+        """
+        Core Logic: Called by the tracker (any thread) for every event.
+        """
+        with self._lock:
+            self._stats["received"] += 1
+            if event_key in COALESCED_EVENTS:
+                if event_key in self._latest:
+                    self._stats["coalesced"] += 1
+                self._latest[event_key] = value
+            else:
+                self._queue.append((event_key, value))
+            depth = len(self._latest) + len(self._queue)
+            self._stats["max_depth"] = max(self._stats["max_depth"], depth)
+            if self._waiting_since is not None:
+                return # The GUI has already been told
+            self._waiting_since = time.perf_counter()
+            self._stats["wakeups"] += 1
+        self.window.write_event_value(TRACKER_EVENT, None)
+
+    def drain(self):
+        """
+        Core Logic: Returns every pending (event key, value), one-shot
+        events first. Called by the GUI thread on TRACKER_EVENT.
+        """
+        with self._lock:
+            events = list(self._queue) + list(self._latest.items())
+            self._queue.clear()
+            self._latest.clear()
+            if self._waiting_since is not None:
+                lag = time.perf_counter() - self._waiting_since
+                instrumentation.record("ui_event_lag", lag)
+                self._stats["last_lag_ms"] = round(lag * 1000, 3)
+                self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], self._stats["last_lag_ms"])
+            self._waiting_since = None
+            self._stats["delivered"] += len(events)
+        return events
+
+    def get_stats(self):
+        """
+        Utility: Counters, the current queue depth and event-loop lag.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["depth"] = len(self._latest) + len(self._queue)
+        return stats
+
+# --- Core Logic: Non-Modal Alerts ---
+class AlertWindows:
+    """
+    Core Logic: Small alert windows that never block the main loop.
+    The main loop reads every window with sg.read_all_windows() and
+    hands events from our windows to handle(). Only one window per
+    'kind' is open at a time; a new alert of the same kind replaces it.
+    """
+
+    def __init__(self):
+        self._open = {} # kind -> {'window', 'data', 'close_at'}
+
+    def show(self, kind, title, message, buttons=("OK",), auto_close_s=None, data=None):
+        """
+        Utility: Opens (or replaces) the alert for 'kind'. 'data' comes
+        back from handle() with the answer. With 'auto_close_s' the
+        alert closes by itself (as if closed with X).
+        """
+        self.close(kind)
+        layout = [
+            [sg.Text(message)],
+            [sg.Button(b) for b in buttons],
+        ]
+        window = sg.Window(title, layout, keep_on_top=True, finalize=True)
+        close_at = time.monotonic() + auto_close_s if auto_close_s else None
+        self._open[kind] = {"window": window, "data": data, "close_at": close_at}
+
+    def is_open(self, kind):
+        return kind in self._open
+
+    def close(self, kind):
+        """
+        Utility: Closes the alert for 'kind' (if open).
+        """
+        alert = self._open.pop(kind, None)
+        if alert:
+            alert["window"].close()
+
+    def close_all(self):
+        for kind in list(self._open):
+            self.close(kind)
+
+    def owns(self, window):
+        return any(alert["window"] is window for alert in self._open.values())
+
+    def handle(self, window, event):
+        """
+        Core Logic: Handles an event from one of our windows. Returns
+        (kind, button, data) once the alert is answered (button is None
+        if it was closed with X), or None.
+        """
+        for kind, alert in list(self._open.items()):
+            if alert["window"] is window:
+                # The only elements are buttons, so any event answers it.
+                self.close(kind)
+                return kind, (None if event == sg.WIN_CLOSED else event), alert["data"]
+        return None
+
+    def expire(self):
+        """
+        Utility: Closes alerts whose auto-close time has passed.
+        """
+        now = time.monotonic()
+        for kind, alert in list(self._open.items()):
+            if alert["close_at"] is not None and now >= alert["close_at"]:
+                self.close(kind)
+
+    def next_timeout_ms(self):
+        """
+        Utility: How long the main loop may wait before an alert needs
+        closing (ms), or None to wait for the next event.
+        """
+        times = [a["close_at"] for a in self._open.values() if a["close_at"] is not None]
+        if not times:
+            return None
+        return max(0, int((min(times) - time.monotonic()) * 1000))
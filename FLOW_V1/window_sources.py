@@ -0,0 +1,368 @@
+# window_sources.py (v1.3 - Stop Skips the Wakeup Cap)
+
+# --- Imports ---
+import sys        # Reason: To pick the right backend for this platform.
+import threading  # Reason: Each source runs on its own background thread.
+from collections import namedtuple  # Reason: A small, read-only window record.
+import scheduler  # Reason: The polling backend backs off while nothing changes.
+import instrumentation  # Reason: The 'window_probe' timing histogram.
+
+# --- Constants ---
+# What the tracker needs to know about the focused window.
+# 'hwnd' is the window handle (None for the fake backend), 'pid' its process.
+WindowInfo = namedtuple("WindowInfo", ["title", "hwnd", "pid"])
+
+# Polling backend: look every 0.5s right after a change, backing off to
+# every 2s while the same window stays in front (5s while the user is idle).
+POLL_INTERVAL_SECONDS = 0.5
+POLL_MAX_INTERVAL_SECONDS = 2.0
+POLL_IDLE_INTERVAL_SECONDS = 5.0
+
+# Win32 constants for the event-driven backend.
+EVENT_SYSTEM_FOREGROUND = 0x0003   # A different window came to the front
+EVENT_OBJECT_NAMECHANGE = 0x800C   # A window's title changed (e.g. new tab)
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+WM_QUIT = 0x0012
+
+# --- Core Logic: Base Source ---
+class WindowSource:
+    """
+    Core Logic: Tells the tracker which window has focus. Backends call
+    _publish() with what they see; the tracker calls wait_for_change(),
+    which blocks until something actually changed. So nothing downstream
+    (classifying, UI updates) runs while the user stays on one window.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._current = None   # The latest WindowInfo
+        self._version = 0      # Goes up by one for every change
+        self.probes = 0        # How many times the OS was asked
+        self.changes = 0       # How many real changes were published
+
+    def start(self):
+        """
+        Core Logic: Starts watching. Override in backends.
+        """
+
+    def stop(self):
+        """
+        Core Logic: Stops watching. Override in backends.
+        """
+
+    def _publish(self, info):
+        """
+        Utility: Records 'info' and wakes the waiters, but only if it is
+        different from the last window.
+        """
+        with self._cond:
+            if info == self._current:
+                return
+            self._current = info
+            self._version += 1
+            self.changes += 1
+            self._cond.notify_all()
+
+    def current(self):
+        """
+        Utility: The latest WindowInfo (or None before the first one).
+        """
+        with self._cond:
+            return self._current
+
+    def wait_for_change(self, last_version, timeout=None):
+        """
+        Core Logic: Blocks until the window differs from 'last_version'
+        (pass None to get the current one right away). Returns
+        (version, WindowInfo), or None if 'timeout' seconds passed first.
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._version > 0 and self._version != last_version, timeout)
+            if not ready:
+                return None
+            return self._version, self._current
+
+    def request_refresh(self):
+        """
+        Utility: Makes the next wait_for_change return the current window
+        even if it didn't change (e.g. Study Mode or the rules changed,
+        so the same window must be classified again).
+        """
+        with self._cond:
+            if self._version > 0:
+                self._version += 1
+                self._cond.notify_all()
+
+    def get_stats(self):
+        """
+        Utility: Returns {'backend', 'probes', 'changes'}.
+        """
+        return {"backend": self.name, "probes": self.probes, "changes": self.changes}
+
+# --- Core Logic: Polling Backend ---
+class PollingWindowSource(WindowSource):
+    """
+    Core Logic: The original method: ask pygetwindow for the active window
+    every POLL_INTERVAL_SECONDS. Used when window events are unavailable.
+    It only publishes real changes, and polls less often while the same
+    window stays in front.
+    """
+
+    name = "polling"
+
+    def __init__(self, interval=POLL_INTERVAL_SECONDS):
+        super().__init__()
+        self.interval = interval
+        self.schedule = scheduler.AdaptiveScheduler(
+            "window-poll", min_interval=interval, max_interval=POLL_MAX_INTERVAL_SECONDS,
+            idle_interval=POLL_IDLE_INTERVAL_SECONDS)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _probe(self):
+        """
+        Utility: Reads the active window once.
+        """
+        import pygetwindow as gw   # Reason: Only this backend needs them.
+        import win32process
+        self.probes += 1
+        with instrumentation.timed("window_probe"):
+            active_window = gw.getActiveWindow()
+            if not active_window:
+                return WindowInfo(None, None, None)
+            hwnd = active_window._hWnd
+            pid = win32process.GetWindowThreadProcessId(hwnd)[1]
+            return WindowInfo(active_window.title, hwnd, pid)
+
+    def _run(self):
+        while not self._stop.is_set():
+            changes = self.changes
+            try:
+                self._publish(self._probe())
+            except Exception:
+                # e.g. the window closed while we were reading it
+                self._publish(WindowInfo(None, None, None))
+            if self.changes != changes:
+                self.schedule.mark_changed()
+            else:
+                self.schedule.mark_stable()
+            self.schedule.wait()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="flow-window-poll", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.schedule.interrupt() # Don't wait out the current sleep (or the cap)
+
+    def request_refresh(self):
+        self.schedule.poke() # Look again right away
+        super().request_refresh()
+
+# --- Core Logic: Event-Driven Backend (Windows) ---
+class WinEventWindowSource(WindowSource):
+    """
+    Core Logic: Asks Windows to call us when the foreground window changes
+    or its title changes (SetWinEventHook), so there is no polling at all
+    and changes arrive within a few milliseconds. Uses ctypes only.
+    """
+
+    name = "winevent"
+
+    def __init__(self):
+        super().__init__()
+        import ctypes                     # Reason: Direct calls into user32.
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        # Our own handle on user32, so these signatures don't change the
+        # shared ctypes.windll one that pygetwindow uses.
+        self.user32 = ctypes.WinDLL("user32", use_last_error=True)
+        self._thread = None
+        self._thread_id = None
+        self._started = threading.Event()
+        self.error = None
+        # The callback type Windows calls (kept on self so it isn't freed).
+        self._proc_type = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        self._proc = self._proc_type(self._on_win_event)
+        self._set_signatures(wintypes)
+
+    def _set_signatures(self, wintypes):
+        """
+        Utility: Declares the user32 functions we call, so 64-bit handles
+        are passed and returned correctly.
+        """
+        ctypes = self.ctypes
+        user32 = self.user32
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE,
+                                           self._proc_type, wintypes.DWORD, wintypes.DWORD,
+                                           wintypes.DWORD]
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        user32.GetForegroundWindow.restype = wintypes.HWND
+        user32.GetWindowTextLengthW.argtypes = [wintypes.HWND]
+        user32.GetWindowTextW.argtypes = [wintypes.HWND, wintypes.LPWSTR, ctypes.c_int]
+        user32.GetWindowThreadProcessId.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.DWORD)]
+        user32.GetMessageW.argtypes = [ctypes.POINTER(wintypes.MSG), wintypes.HWND,
+                                       wintypes.UINT, wintypes.UINT]
+        user32.PostThreadMessageW.argtypes = [wintypes.DWORD, wintypes.UINT,
+                                              wintypes.WPARAM, wintypes.LPARAM]
+
+    def _probe(self, hwnd=None):
+        """
+        Utility: Reads the title and process of the foreground window.
+        """
+        ctypes = self.ctypes
+        from ctypes import wintypes
+        self.probes += 1
+        with instrumentation.timed("window_probe"):
+            if hwnd is None:
+                hwnd = self.user32.GetForegroundWindow()
+            if not hwnd:
+                return WindowInfo(None, None, None)
+            length = self.user32.GetWindowTextLengthW(hwnd)
+            buffer = ctypes.create_unicode_buffer(length + 1)
+            self.user32.GetWindowTextW(hwnd, buffer, length + 1)
+            pid = wintypes.DWORD()
+            self.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            return WindowInfo(buffer.value, hwnd, pid.value)
+
+    def _on_win_event(self, hook, event, hwnd, id_object, id_child, thread, time_ms):
+        """
+        Core Logic: Called by Windows on our hook thread.
+        """
+        try:
+            if event == EVENT_OBJECT_NAMECHANGE:
+                # Title changes fire for every control; only the
+                # foreground window itself matters.
+                if id_object != OBJID_WINDOW or hwnd != self.user32.GetForegroundWindow():
+                    return
+            self._publish(self._probe(hwnd))
+        except Exception as e:
+            print(f"Window event error: {e}")
+
+    def _run(self):
+        """
+        Utility: The hook thread. Hooks must be set up and pumped by the
+        same thread, so it runs a message loop until stop().
+        """
+        from ctypes import wintypes
+        ctypes = self.ctypes
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+        flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+        hooks = [
+            self.user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND,
+                                        0, self._proc, 0, 0, flags),
+            self.user32.SetWinEventHook(EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE,
+                                        0, self._proc, 0, 0, flags),
+        ]
+        if not all(hooks):
+            self.error = "SetWinEventHook failed"
+            self._started.set()
+            return
+        self._publish(self._probe()) # The window that has focus right now
+        self._started.set()
+
+        msg = wintypes.MSG()
+        while self.user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            self.user32.TranslateMessage(ctypes.byref(msg))
+            self.user32.DispatchMessageW(ctypes.byref(msg))
+        for hook in hooks:
+            self.user32.UnhookWinEvent(hook)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="flow-window-events", daemon=True)
+        self._thread.start()
+        self._started.wait(5.0)
+        if self.error:
+            raise OSError(self.error)
+
+    def stop(self):
+        if self._thread_id:
+            self.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+
+    def request_refresh(self):
+        # Re-read too, in case a change was missed.
+        try:
+            self._publish(self._probe())
+        except Exception as e:
+            print(f"Window refresh error: {e}")
+        super().request_refresh()
+
+# --- Core Logic: Scripted Backend (tests, Linux) ---
+class ScriptedWindowSource(WindowSource):
+    """
+    Core Logic: A fake backend that plays back a script of windows, so the
+    tracker can be run without Windows. 'script' is a list of
+    (delay_seconds, title, pid) steps; push() adds a window by hand.
+    """
+
+    name = "scripted"
+
+    def __init__(self, script=None, loop=False):
+        super().__init__()
+        self.script = list(script or [])
+        self.loop = loop
+        self._stop = threading.Event()
+        self._thread = None
+
+    def push(self, title, pid=None, hwnd=None):
+        """
+        Utility: Makes 'title' the focused window right now.
+        """
+        self.probes += 1
+        self._publish(WindowInfo(title, hwnd, pid))
+
+    def _run(self):
+        while not self._stop.is_set():
+            for delay, title, pid in self.script:
+                if self._stop.wait(delay):
+                    return
+                self.push(title, pid)
+            if not self.loop:
+                return
+
+    def start(self):
+        self._stop.clear()
+        if self.script:
+            self._thread = threading.Thread(target=self._run, name="flow-window-script", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+# --- Utility Function ---
+def create_window_source(kind="auto"):
+    """
+    Utility: Creates and starts a window source.
+    'kind' is "auto", "winevent", "polling" or "scripted".
+    "auto" uses window events on Windows and falls back to polling.
+    """
+    if kind == "scripted":
+        source = ScriptedWindowSource()
+        source.start()
+        return source
+
+    if kind in ("auto", "winevent") and sys.platform == "win32":
+        try:
+            source = WinEventWindowSource()
+            source.start()
+            print("Window tracking: event-driven (SetWinEventHook).")
+            return source
+        except Exception as e:
+            if kind == "winevent":
+                raise
+            print(f"Window events unavailable ({e}); falling back to polling.")
+
+    source = PollingWindowSource()
+    source.start()
+    print(f"Window tracking: polling every {source.interval}-{POLL_MAX_INTERVAL_SECONDS}s.")
+    return source
@@ -1,13 +1,115 @@
-from fastapi import FastAPI
-from core.focus_engine import get_today_data, calculate_daily_stats
+# main.py (v2.3 - Per-Lifespan Read State)
 
-app = FastAPI()
+# --- Imports ---
+import asyncio  # Reason: Requests wait for the stats without holding a worker.
+from collections import OrderedDict                  # Reason: The small per-version stats cache.
+from contextlib import asynccontextmanager           # Reason: FastAPI's startup/shutdown hook.
+from concurrent.futures import ThreadPoolExecutor    # Reason: SQLite reads are blocking calls.
+from datetime import datetime                        # Reason: "Today" is part of the version.
+from fastapi import FastAPI, Request, Response
+from core import data_manager
+from core.focus_engine import calculate_daily_stats
 
+# --- Constants ---
+# How many versions of the stats to keep. Only the newest is normally
+# asked for; a few more cover requests that raced a new write.
+STATS_CACHE_ENTRIES = 4
+
+# --- Read State ---
+# The database reads run on a small thread pool, each with its own
+# pooled read-only connection, so the event loop never blocks on SQLite.
+# The pool and its threads are created at startup, once the schema is
+# up to date, and closed at shutdown (so the app can be started again).
+_read_pool = None
+_executor = None
+_stats_cache = OrderedDict() # version -> stats, oldest first
+_stats_inflight = {}         # version -> the read every waiting request shares
+
+@asynccontextmanager
+async def lifespan(app):
+    global _read_pool, _executor
+    # The pooled connections are read-only, so an older database must get
+    # its new tables and views here, before any request reads it.
+    data_manager.init_database()
+    _read_pool = data_manager.ReadPool(data_manager.READ_POOL_SIZE)
+    _executor = ThreadPoolExecutor(max_workers=data_manager.READ_POOL_SIZE, thread_name_prefix="flow-api-read")
+    _stats_cache.clear() # Versions are only unique within one database
+    yield
+    _executor.shutdown(wait=True)
+    _read_pool.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# --- Core Logic: Versioned Stats ---
+def _read_version():
+    """
+    Utility: Returns (version, now). The version changes when the date
+    changes or new activity is written (see data_manager.get_data_version).
+    """
+    now = datetime.now()
+    with _read_pool.connection() as conn:
+        return f"{now.date()}.{data_manager.get_data_version(conn)}", now
+
+def _read_today_stats(now):
+    """
+    Utility: One stats read on a pooled connection (runs on _executor).
+    """
+    with _read_pool.connection() as conn:
+        return calculate_daily_stats(now, conn)
+
+async def get_shared_stats(version, now):
+    """
+    Core Logic: Today's stats for 'version', read at most once however
+    many requests ask. Requests that come in while a read is running
+    wait for that same read instead of starting their own.
+    """
+    stats = _stats_cache.get(version)
+    if stats is not None:
+        return stats
+
+    future = _stats_inflight.get(version)
+    if future is None:
+        future = asyncio.get_running_loop().run_in_executor(_executor, _read_today_stats, now)
+
+        def on_done(done):
+            _stats_inflight.pop(version, None)
+            if not done.cancelled() and done.exception() is None:
+                _stats_cache[version] = done.result()
+                while len(_stats_cache) > STATS_CACHE_ENTRIES:
+                    _stats_cache.popitem(last=False)
+
+        future.add_done_callback(on_done)
+        _stats_inflight[version] = future
+    # shield(): a client disconnecting must not cancel everyone else's read.
+    return await asyncio.shield(future)
+
+def etag_matches(if_none_match, etag):
+    """
+    Utility: True if an If-None-Match header names 'etag' (or is '*').
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+# --- API Routes ---
 @app.get("/")
-def home():
+async def home():
     return {"message": "FLOW API is running"}
 
 @app.get("/stats/today")
-def get_today_stats():
-    stats = calculate_daily_stats()
-    return stats
\ No newline at end of file
+async def get_today_stats(request: Request, response: Response):
+    # One indexed lookup. If nothing was written since the client's copy,
+    # that is all this request costs.
+    version, now = await asyncio.get_running_loop().run_in_executor(_executor, _read_version)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} # no-cache: always revalidate
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    stats = await get_shared_stats(version, now)
+    response.headers.update(headers)
+    return dict(stats)
@@ -1,13 +1,17 @@
-# config_manager.py (v1.1 - The "Correct Default" Fix)
+# config_manager.py (v1.3 - Config Shape Checks)
 
 # --- Imports ---
 import json  # Reason: To read and write the .json file.
-import os    # Reason: To check if the config.json file exists.
+import os    # Reason: To check if the config.json file exists (and its mtime).
 
 # --- Constants ---
 # Defines the constant name for the configuration file.
 CONFIG_FILE = "config.json"
 
+# Rule keys and the type their value must have (when present).
+KEYWORD_LIST_KEYS = ("PRODUCTIVE_KEYWORDS", "STUDY_KEYWORDS", "IGNORE_TITLES")
+RULE_DICT_KEYS = ("DISTRACTION_LEVELS", "PROCESS_RULES")
+
 # --- Utility Function ---
 def get_default_config():
     """ 
@@ -130,15 +134,69 @@ def load_config():
         print(f"Failed to load config: {e}")
         return get_default_config()
 
+def read_config_file():
+    """
+    Utility: Reads config.json as-is. Unlike load_config() it never
+    falls back to defaults: errors (missing, half-written, bad JSON) are
+    raised, so the hot-reload can keep the rules it already has.
+    """
+    with open(CONFIG_FILE, 'r') as f:
+        config_data = json.load(f)
+    check_config(config_data)
+    return config_data
+
+def _check_string_list(value, name):
+    """
+    Utility: Raises ValueError unless 'value' is a list of strings.
+    """
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"'{name}' must be a list of strings, not {json.dumps(value)[:60]}")
+
+def check_config(config_data):
+    """
+    Utility: Raises ValueError if the config (or one of its rule keys)
+    has the wrong shape, e.g. "PRODUCTIVE_KEYWORDS": null. Keyword keys
+    must be lists of strings, DISTRACTION_LEVELS a dict of such lists and
+    PROCESS_RULES a dict of process name -> category.
+    """
+    if not isinstance(config_data, dict):
+        raise ValueError(f"{CONFIG_FILE} must contain a JSON object")
+    for key in KEYWORD_LIST_KEYS:
+        if key in config_data:
+            _check_string_list(config_data[key], key)
+    for key in RULE_DICT_KEYS:
+        if key in config_data and not isinstance(config_data[key], dict):
+            raise ValueError(f"'{key}' must be an object, not {json.dumps(config_data[key])[:60]}")
+    for level, keywords in config_data.get("DISTRACTION_LEVELS", {}).items():
+        _check_string_list(keywords, f"DISTRACTION_LEVELS.{level}")
+    for process_name, category in config_data.get("PROCESS_RULES", {}).items():
+        if not isinstance(category, str):
+            raise ValueError(f"'PROCESS_RULES.{process_name}' must be a category name")
+
+def get_config_stamp():
+    """
+    Utility: (mtime_ns, size) of config.json, or None if it's missing.
+    Changes whenever the file is rewritten (by us or any other tool).
+    """
+    try:
+        st = os.stat(CONFIG_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
 # --- Utility Function ---
 def save_config(config_data):
     """
     Utility: Saves the given dictionary to the config.json file.
     This is called by the "Save" button in the Settings window.
+    Writes a temp file and renames it over config.json, so nobody (the
+    hot-reload, another tool) ever reads a half-written file.
     """
     try:
-        with open(CONFIG_FILE, 'w') as f:
+        tmp_file = CONFIG_FILE + ".tmp"
+        with open(tmp_file, 'w') as f:
             json.dump(config_data, f, indent=2) 
+        os.replace(tmp_file, CONFIG_FILE)
         print("Config saved successfully.")
         return True
     except Exception as e:
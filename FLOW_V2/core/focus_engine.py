@@ -1,74 +1,117 @@
-# focus_engine.py (Version 2.7 - Added AI Category Support)
+# focus_engine.py (Version 3.6 - Schema Before Reads)
     
 # --- Imports ---
 import sqlite3
-import pandas as pd
+import threading
 from datetime import datetime, timedelta
 from core import data_manager
+from core import instrumentation
 
 # --- Core Constant ---
-POLL_INTERVAL_SECONDS = 5.0 
+POLL_INTERVAL_SECONDS = data_manager.POLL_INTERVAL_SECONDS
 
-# --- Database Function ---
-def get_today_data():
+# --- Database Functions ---
+# All queries filter on a start_time range, which SQLite pushes into both
+# halves of the activity_intervals view and answers from the timestamp
+# indexes. Only the small GROUP BY result comes back to Python.
+def get_category_totals(conn, start, end):
     """
-    Utility: Reads all of today's log entries from the database
-    and returns them as a pandas DataFrame (a data table).
+    Utility: Returns {category: total seconds} for activity that
+    started in [start, end).
     """
-    conn = sqlite3.connect(data_manager.DB_FILE)
-    today_start = datetime.now().strftime("%Y-%m-%d 00:00:00")    
+    rows = conn.execute(
+        "SELECT category, SUM(duration_s) FROM activity_intervals "
+        "WHERE start_time >= ? AND start_time < ? GROUP BY category",
+        (start, end)).fetchall()
+    return {category: total or 0.0 for category, total in rows}
+
+def sum_buckets(totals):
+    """
+    Utility: Folds {category: seconds} into the three timers.
+    """
+    seconds = {'good': 0.0, 'dist': 0.0, 'neut': 0.0}
+    for category, total in totals.items():
+        bucket = category_bucket(category)
+        if bucket:
+            seconds[bucket] += total
+    return seconds
+
+def get_latest_activity_time(conn):
+    """
+    Utility: Returns the newest start timestamp (as text) in either
+    activity table, or None if there is no data. Each MAX() is a single
+    index lookup.
+    """
+    latest_log = conn.execute("SELECT MAX(timestamp) FROM activity_log").fetchone()[0]
+    latest_session = conn.execute("SELECT MAX(start_time) FROM activity_sessions").fetchone()[0]
+    candidates = [ts for ts in (latest_log, latest_session) if ts is not None]
+    return max(candidates) if candidates else None
+
+def get_today_data(now=None, conn=None):
+    """
+    Utility: Returns today's total seconds per category, e.g.
+    {'Productive': 1200.0, 'Neutral': 85.0}.
+    'now' (default: datetime.now()) decides what "today" is.
+    'conn' is an open connection to use (e.g. from a ReadPool); by
+    default one is opened and closed just for this call (after making
+    sure the schema is up to date; pass 'conn' only once it is).
+    If today has no data yet, returns the latest day that has some.
+    """
+    own_conn = conn is None
+    if own_conn:
+        data_manager.ensure_database() # Old databases need the view first
+        conn = sqlite3.connect(data_manager.DB_FILE)
+    today_start = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
     try:
-        df = pd.read_sql_query(
-            "SELECT * FROM activity_log WHERE timestamp>= ?",
-            conn, params=(today_start,))
-        if df.empty:
+        totals = get_category_totals(conn, today_start, today_start + timedelta(days=1))
+        if not totals:
             print("No data for today - using last available date")
-            latest = pd.read_sql_query(
-                "SELECT MAX(timestamp) as max_ts FROM activity_log",
-                conn)
-            max_ts = latest["max_ts"][0]
+            max_ts = get_latest_activity_time(conn)
 
             if max_ts is not None:
-                latest_date = max_ts.split(" ")[0]
-                df = pd.read_sql_query(
-                    "SELECT * FROM activity_log WHERE date(timestamp) = ?",
-                    conn, params=(latest_date,))
+                # A range on start_time (not date(start_time) = ?) so the index is used
+                latest_start = datetime.strptime(max_ts[:10], "%Y-%m-%d")
+                totals = get_category_totals(conn, latest_start, latest_start + timedelta(days=1))
         
-        return df
+        return totals
     except Exception as e:
         print(f"Error reading database: {e}")
-        return pd.DataFrame() 
+        return {}
     finally:
-        conn.close()
+        if own_conn:
+            conn.close()
 
 # --- Core Logic ---
-def calculate_daily_stats():
+def calculate_daily_stats(now=None, conn=None):
     """
     Core Logic: Reads today's data and calculates all scores and times.
-    This is called by the "slow" thread every 5 seconds.
+    The "slow" thread uses the cheaper get_live_stats() instead.
+    'now' is for replays (see replay.py); default: datetime.now().
+    'conn' is passed on to get_today_data (e.g. the API's pooled ones).
     """
-    df = get_today_data()
-    
-    if df.empty:
-        return { 
-            "score": 0, 
-            "prod_time_s": 0, 
-            "dist_time_s": 0, 
-            "neut_time_s": 0,
-            "predicted_score": 0 
-        } 
-
-    # --- Calculation Logic ---
-    prod_events = len(df[df['category'] == 'Productive']) + len(df[df['category'] == 'Productive (AI)'])
-    study_events = len(df[df['category'] == 'Studying'])
-    dist_events = len(df[df['category'].str.startswith('Distraction-')])
-    neut_events = len(df[df['category'] == 'Neutral'])
-    
-    total_good_events = prod_events + study_events
-    
-    prod_time_s = total_good_events * POLL_INTERVAL_SECONDS
-    dist_time_s = dist_events * POLL_INTERVAL_SECONDS
-    neut_time_s = neut_events * POLL_INTERVAL_SECONDS
+    with instrumentation.timed("stats_daily"):
+        seconds = sum_buckets(get_today_data(now, conn))
+        return build_stats(seconds['good'], seconds['dist'], seconds['neut'])
+
+def category_bucket(category):
+    """
+    Utility: Says which timer a logged category counts towards:
+    'good' (Productive/Studying), 'dist', 'neut', or None (e.g. Idle).
+    """
+    if category in ('Productive', 'Productive (AI)', 'Studying'):
+        return 'good'
+    if category.startswith('Distraction-'):
+        return 'dist'
+    if category == 'Neutral':
+        return 'neut'
+    return None
+
+def build_stats(prod_time_s, dist_time_s, neut_time_s):
+    """
+    Utility: Turns the three timers into the stats dict the UI shows.
+    """
+    total_good_events = prod_time_s / POLL_INTERVAL_SECONDS
+    dist_events = dist_time_s / POLL_INTERVAL_SECONDS
     
     total_focus_events = total_good_events + dist_events
     
@@ -81,12 +124,89 @@ def calculate_daily_stats():
         
     return {
         "score": int(score),
-        "prod_time_s": prod_time_s,
-        "dist_time_s": dist_time_s,
-        "neut_time_s": neut_time_s,
+        "prod_time_s": int(round(prod_time_s)),
+        "dist_time_s": int(round(dist_time_s)),
+        "neut_time_s": int(round(neut_time_s)),
         "predicted_score": int(predicted_score)
     }
 
+# --- Core Logic: Live Stats ---
+# The slow thread asks for stats every 5 seconds. Instead of re-reading
+# the whole day each time, we read it ONCE (at startup or when the date
+# changes) and then add every event data_manager logs to these totals.
+_live_lock = threading.Lock()
+_live_date = None
+_live_seconds = {'good': 0.0, 'dist': 0.0, 'neut': 0.0}
+_live_listening = False
+
+def _read_day_seconds(day):
+    """
+    Utility: Reads the timer totals for one calendar day from the database.
+    """
+    day_start = datetime.combine(day, datetime.min.time())
+    data_manager.ensure_database()
+    conn = sqlite3.connect(data_manager.DB_FILE)
+    try:
+        return sum_buckets(get_category_totals(conn, day_start, day_start + timedelta(days=1)))
+    except Exception as e:
+        print(f"Error reading database: {e}")
+        return {'good': 0.0, 'dist': 0.0, 'neut': 0.0}
+    finally:
+        conn.close()
+
+def _seed_live_stats(day):
+    """
+    Utility: (Re)loads the live totals from the database for 'day'.
+    Must be called with _live_lock held.
+    """
+    global _live_date, _live_seconds
+    data_manager.flush() # Make sure queued events are in the database
+    _live_seconds = _read_day_seconds(day)
+    _live_date = day
+
+def _on_event_logged(timestamp, category, app_name, samples=1):
+    """
+    Core Logic: Called by data_manager.log_event for every event.
+    Adds its samples to the matching timer (O(1)).
+    """
+    with _live_lock:
+        if timestamp.date() != _live_date:
+            # Midnight rollover: the new day's totals come from the
+            # database, which (after the flush) already has this event.
+            _seed_live_stats(timestamp.date())
+            return
+        bucket = category_bucket(category)
+        if bucket:
+            _live_seconds[bucket] += samples * POLL_INTERVAL_SECONDS
+
+def start_live_stats(now=None):
+    """
+    Core Logic: Seeds today's totals from the database and starts
+    following data_manager.log_event. Called once at app startup.
+    """
+    global _live_listening
+    with _live_lock:
+        _seed_live_stats((now or datetime.now()).date())
+        if not _live_listening:
+            data_manager.add_event_listener(_on_event_logged)
+            _live_listening = True
+
+def get_live_stats(now=None):
+    """
+    Core Logic: Returns today's stats from the live totals, in the same
+    shape as calculate_daily_stats(). This is called by the "slow"
+    thread every 5 seconds.
+    """
+    with instrumentation.timed("stats_live"):
+        with _live_lock:
+            today = (now or datetime.now()).date()
+            if today != _live_date:
+                _seed_live_stats(today)
+            good_s = _live_seconds['good']
+            dist_s = _live_seconds['dist']
+            neut_s = _live_seconds['neut']
+        return build_stats(good_s, dist_s, neut_s)
+
 # --- Core Logic: Prediction ---
 def calculate_predicted_score(total_good_events, total_focus_events):
     """
@@ -119,54 +239,48 @@ def calculate_predicted_score(total_good_events, total_focus_events):
         print(f"Score prediction error: {e}")
         return 0 
 
-# --- Feature Logic: Weekly Stats ---
-def get_weekly_stats():
+# --- Feature Logic: History (from the daily rollup) ---
+def get_daily_stats_range(start_date, end_date):
     """
-    Feature Logic: Fetches and calculates stats for the past 7 days.
-    This is called by the "History" window.
+    Feature Logic: Returns one {'date', 'score', 'prod_time_s'} dict per
+    day with data in [start_date, end_date]. Reads the pre-aggregated
+    daily_rollup table, so the cost depends on the number of days, not
+    on how much activity was logged. Weekly, monthly and yearly views
+    should all go through this.
     """
+    data_manager.ensure_database()
     conn = sqlite3.connect(data_manager.DB_FILE)
-    
-    seven_days_ago = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=7)
-    
     try:
-        df = pd.read_sql_query(
-            "SELECT timestamp, category FROM activity_log WHERE timestamp >= ?",
-            conn,
-            params=(seven_days_ago,)
-        )
+        rows = data_manager.get_daily_rollup(start_date.strftime('%Y-%m-%d'),
+                                             end_date.strftime('%Y-%m-%d'), conn)
     except Exception as e:
-        print(f"Error reading weekly database: {e}")
+        print(f"Error reading history database: {e}")
         return []
     finally:
         conn.close()
 
-    if df.empty:
-        return []
-
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
-    
-    def calculate_score(group):
-        prod_events = len(group[group['category'] == 'Productive']) + len(df[df['category'] == 'Productive (AI)'])
-        study_events = len(group[group['category'] == 'Studying'])
-        dist_events = len(group[group['category'].str.startswith('Distraction-')])
-        total_good = prod_events + study_events
-        total_focus = total_good + dist_events
-        score = (total_good / total_focus) * 100 if total_focus > 0 else 0
-        return pd.Series({
-            'score': int(score),
-            'prod_time_s': total_good * POLL_INTERVAL_SECONDS
-        })
-
-    daily_stats = df.groupby('date').apply(calculate_score).reset_index()
+    daily_totals = {}
+    for day, category, event_count, seconds in rows:
+        daily_totals.setdefault(day, {})[category] = seconds or 0.0
 
     stats_list = []
-    for _, row in daily_stats.iterrows():
+    for day, totals in sorted(daily_totals.items()):
+        seconds = sum_buckets(totals)
+        total_focus_s = seconds['good'] + seconds['dist']
+        score = (seconds['good'] / total_focus_s) * 100 if total_focus_s > 0 else 0
         stats_list.append({
-            'date': row['date'].strftime('%Y-%m-%d'),
-            'score': row['score'],
-            'prod_time_s': row['prod_time_s']
+            'date': day,
+            'score': int(score),
+            'prod_time_s': int(round(seconds['good']))
         })
         
-    return stats_list
\ No newline at end of file
+    return stats_list
+
+# --- Feature Logic: Weekly Stats ---
+def get_weekly_stats(now=None):
+    """
+    Feature Logic: Fetches and calculates stats for the past 7 days.
+    This is called by the "History" window.
+    """
+    today = (now or datetime.now()).date()
+    return get_daily_stats_range(today - timedelta(days=7), today)
@@ -0,0 +1,179 @@
+# instrumentation.py (v1.0 - Hot-Path Timing Histograms)
+
+# --- Imports ---
+import os         # Reason: To save the JSON dump atomically.
+import json       # Reason: The dump format.
+import time       # Reason: perf_counter timings.
+import threading  # Reason: One shard per thread.
+from bisect import bisect_left  # Reason: Finding a timing's bucket.
+from datetime import datetime   # Reason: Timestamp on the dump.
+
+# --- Constants ---
+# The stages the app records (any other name works too):
+#   window_probe  - reading the focused window (window_sources)
+#   pid_lookup    - PID -> .exe name (process_resolver)
+#   rule_match    - keyword matching (rule_engine)
+#   ai_predict    - one AI model call (ai_classifier, cache misses only)
+#   db_insert     - one group commit (data_manager)
+#   stats_live / stats_daily - the stats calculations (focus_engine)
+#   pipeline_*    - each tracker pipeline stage, end to end
+
+# Histogram bucket upper bounds, in microseconds (roughly 1-2-5 steps).
+# Timings above the last bound go in one extra "overflow" bucket.
+BUCKET_BOUNDS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500,
+                    1000, 2000, 5000, 10000, 20000, 50000,
+                    100000, 200000, 500000, 1000000, 5000000)
+
+DIAGNOSTICS_FILE = "flow_diagnostics.json"
+
+# Set to False to make record() (and timed) do nothing.
+enabled = True
+
+# --- Core Logic: Per-Thread Shards ---
+# Every thread records into its OWN shard, so recording never takes a
+# lock and never waits on another thread. Readers merge all the shards;
+# a reading taken while a thread is mid-update may be off by one sample.
+_local = threading.local()
+_shards = []                     # Every thread's shard: {stage: [count, total_us, max_us, *buckets]}
+_shards_lock = threading.Lock()  # Only taken once per thread (to register its shard)
+_providers = {}                  # name -> callable returning extra diagnostics
+_started_at = time.time()
+
+def _get_shard():
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+def record(stage, seconds):
+    """
+    Core Logic: Records one timing (in seconds) for 'stage'.
+    """
+    if not enabled:
+        return
+    shard = getattr(_local, "shard", None) or _get_shard()
+    stats = shard.get(stage)
+    if stats is None:
+        stats = shard[stage] = [0, 0.0, 0.0] + [0] * (len(BUCKET_BOUNDS_US) + 1)
+    us = seconds * 1e6
+    stats[0] += 1
+    stats[1] += us
+    if us > stats[2]:
+        stats[2] = us
+    stats[3 + bisect_left(BUCKET_BOUNDS_US, us)] += 1
+
+class timed:
+    """
+    Utility: Times a block of code for 'stage':
+        with instrumentation.timed("db_insert"):
+            ...
+    The time is recorded even if the block raises.
+    """
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, time.perf_counter() - self.started)
+        return False
+
+# --- Core Logic: Reading ---
+def _percentile_us(buckets, count, q):
+    """
+    Utility: The bucket bound that the q-th fraction of timings fall under.
+    """
+    target = q * count
+    running = 0
+    for i, n in enumerate(buckets):
+        running += n
+        if running >= target and n:
+            return BUCKET_BOUNDS_US[i] if i < len(BUCKET_BOUNDS_US) else None # Overflow
+    return 0.0
+
+def get_snapshot():
+    """
+    Core Logic: Merges every thread's shard. Returns {stage: {'count',
+    'avg_us', 'max_us', 'p50_us', 'p95_us', 'p99_us', 'histogram'}}.
+    Percentiles are bucket upper bounds (so 'at most'; None means over
+    the last bound).
+    """
+    with _shards_lock:
+        shards = list(_shards)
+    merged = {}
+    for shard in shards:
+        for stage, stats in list(shard.items()):
+            stats = list(stats) # A copy, so the owner can keep writing
+            total = merged.get(stage)
+            if total is None:
+                merged[stage] = stats
+            else:
+                total[0] += stats[0]
+                total[1] += stats[1]
+                total[2] = max(total[2], stats[2])
+                for i in range(3, len(stats)):
+                    total[i] += stats[i]
+
+    snapshot = {}
+    for stage, stats in sorted(merged.items()):
+        count, total_us, max_us, buckets = stats[0], stats[1], stats[2], stats[3:]
+        labels = [f"<={b}us" for b in BUCKET_BOUNDS_US] + [f">{BUCKET_BOUNDS_US[-1]}us"]
+        snapshot[stage] = {
+            "count": count,
+            "avg_us": round(total_us / count, 2) if count else 0.0,
+            "max_us": round(max_us, 2),
+            "p50_us": _percentile_us(buckets, count, 0.50),
+            "p95_us": _percentile_us(buckets, count, 0.95),
+            "p99_us": _percentile_us(buckets, count, 0.99),
+            "histogram": {label: n for label, n in zip(labels, buckets) if n},
+        }
+    return snapshot
+
+def reset():
+    """
+    Utility: Clears every shard (e.g. from the Diagnostics window).
+    """
+    with _shards_lock:
+        for shard in _shards:
+            shard.clear()
+
+# --- Feature Logic: Diagnostics ---
+def add_provider(name, callback):
+    """
+    Utility: Registers callback() -> dict/list, included under 'name' in
+    collect_diagnostics() (e.g. scheduler rates, cache hit rates).
+    """
+    _providers[name] = callback
+
+def collect_diagnostics():
+    """
+    Feature Logic: The stage histograms plus every provider's data.
+    """
+    diagnostics = {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "uptime_s": round(time.time() - _started_at, 1),
+        "stages": get_snapshot(),
+    }
+    for name, callback in list(_providers.items()):
+        try:
+            diagnostics[name] = callback()
+        except Exception as e:
+            diagnostics[name] = {"error": str(e)}
+    return diagnostics
+
+def dump_json(path=DIAGNOSTICS_FILE):
+    """
+    Feature Logic: Saves collect_diagnostics() to 'path' (temp file, then
+    rename). Returns the path.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(collect_diagnostics(), f, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return path
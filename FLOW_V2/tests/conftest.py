@@ -0,0 +1,7 @@
+# conftest.py - Lets the tests import 'core' and 'backend' (as when the API runs from FLOW_V2).
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.chdir(APP_DIR)
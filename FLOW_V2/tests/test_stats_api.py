@@ -0,0 +1,101 @@
+# test_stats_api.py - /stats/today: ETags, 304s and one shared read per data version.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+from backend import main
+from core import data_manager
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """
+    Utility: The API on a fresh database, with the stats reads counted.
+    """
+    data_manager.init_database(str(tmp_path / "flow_test.db"))
+    reads = []
+    real_stats = main.calculate_daily_stats
+
+    def counted_stats(now=None, conn=None):
+        reads.append(now)
+        time.sleep(getattr(counted_stats, "delay", 0.0))
+        return real_stats(now, conn)
+
+    monkeypatch.setattr(main, "calculate_daily_stats", counted_stats)
+    with TestClient(main.app) as test_client:
+        test_client.reads = reads
+        test_client.stats_function = counted_stats
+        yield test_client
+    data_manager.shutdown()
+
+def today_at(seconds):
+    """
+    Utility: A time early today (always before "now").
+    """
+    return datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(seconds=seconds)
+
+def log_code(samples=1, at=None):
+    data_manager.log_event("Productive", "main.py - Visual Studio Code", samples, at or today_at(1))
+    data_manager.flush()
+
+def test_stats_have_an_etag(client):
+    log_code(12)
+    response = client.get("/stats/today")
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"') and response.headers["Cache-Control"] == "no-cache"
+    assert response.json()["prod_time_s"] == 12 * data_manager.POLL_INTERVAL_SECONDS
+    assert len(client.reads) == 1
+
+def test_matching_etag_is_304_without_a_stats_read(client):
+    log_code()
+    etag = client.get("/stats/today").headers["ETag"]
+    assert len(client.reads) == 1
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/stats/today", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+    assert len(client.reads) == 1
+
+    # A stale ETag gets the full stats (from the cache: same version).
+    response = client.get("/stats/today", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert len(client.reads) == 1
+
+def test_etag_changes_when_the_newest_session_is_extended(client):
+    start = today_at(1)
+    log_code(1, start)
+    first = client.get("/stats/today")
+    sessions_before = data_manager.get_data_version()
+
+    # Same activity, straight after: the open session grows in place.
+    log_code(1, start + timedelta(seconds=data_manager.POLL_INTERVAL_SECONDS))
+    assert data_manager.get_data_version().split(".")[1] == sessions_before.split(".")[1]
+
+    second = client.get("/stats/today", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.json()["prod_time_s"] == first.json()["prod_time_s"] + data_manager.POLL_INTERVAL_SECONDS
+    assert len(client.reads) == 2
+
+def test_concurrent_requests_share_one_read(client):
+    log_code(3)
+    client.stats_function.delay = 0.5 # Keep the first read running while the others arrive
+    barrier = threading.Barrier(8)
+
+    def get():
+        barrier.wait()
+        return client.get("/stats/today")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: get(), range(8)))
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.headers["ETag"] for r in responses}) == 1
+    assert len({r.content for r in responses}) == 1
+    assert len(client.reads) == 1